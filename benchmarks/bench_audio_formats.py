@@ -0,0 +1,79 @@
+"""
+Compare compact audio output formats for typical report lengths.
+
+Each sample MP3 in assets/ (or the files given with --inputs) is transcoded
+to every profile in src/audio_transcode.py. The table lists the encoded
+size, the ratio to the original, transcoding time and the estimated
+download time on slow mobile links. Requires ffmpeg (set FFMPEG_BINARY if
+it is not on PATH).
+
+    python benchmarks/bench_audio_formats.py
+    python benchmarks/bench_audio_formats.py --inputs report.mp3 --bitrate 12k
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import audio_transcode
+
+# Effective downlink throughput in bits per second
+NETWORKS = {
+    '2G': 50_000,
+    '3G': 400_000,
+}
+
+
+def download_seconds(size, bits_per_second):
+    return size * 8 / bits_per_second
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--inputs", nargs="+", default=sorted(glob.glob(os.path.join(root, "assets", "*.mp3"))))
+    parser.add_argument("--bitrate", default=None, help="Override the profile bitrate (e.g. 12k)")
+    args = parser.parse_args()
+
+    if not audio_transcode.ffmpeg_available():
+        print("ERROR: ffmpeg not found. Install it or set FFMPEG_BINARY.")
+        sys.exit(1)
+
+    header = f"{'file':<34} {'format':<8} {'bytes':>9} {'ratio':>6} {'encode ms':>10}"
+    header += "".join(f" {name + ' s':>7}" for name in NETWORKS)
+    print(header)
+    print("-" * len(header))
+
+    totals = {}
+    for path in args.inputs:
+        with open(path, 'rb') as f:
+            original = f.read()
+        if not original:
+            continue
+        for profile in audio_transcode.PROFILES:
+            start = time.perf_counter()
+            try:
+                encoded = audio_transcode.transcode_bytes(original, profile, args.bitrate)
+            except RuntimeError as e:
+                print(f"✗ {os.path.basename(path)} {profile}: {e}")
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            totals[profile] = totals.get(profile, 0) + len(encoded)
+
+            row = f"{os.path.basename(path)[:34]:<34} {profile:<8} {len(encoded):>9} "
+            row += f"{len(encoded) / len(original):>6.2f} {elapsed:>10.1f}"
+            row += "".join(f" {download_seconds(len(encoded), bps):>7.1f}" for bps in NETWORKS.values())
+            print(row)
+
+    if totals.get('mp3'):
+        print("\nTotal bytes by format:")
+        for profile, size in totals.items():
+            print(f"  {profile:<8} {size:>10}  ({size / totals['mp3']:.0%} of MP3)")
+
+
+if __name__ == "__main__":
+    main()
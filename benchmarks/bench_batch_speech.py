@@ -0,0 +1,63 @@
+"""
+Benchmark batch_generate_speech at different concurrency limits.
+
+By default the Edge TTS service is replaced by a stub with a fixed per-item
+latency so the numbers only reflect scheduling. Pass --live to hit the real
+service.
+
+    python benchmarks/bench_batch_speech.py --items 100 --concurrency 1 4 16
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import doctor_voice
+
+
+class StubCommunicate:
+    latency = 0.2
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+
+    async def save(self, path):
+        await asyncio.sleep(StubCommunicate.latency)
+        with open(path, "wb") as f:
+            f.write(self.text.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency per item (seconds)")
+    parser.add_argument("--live", action="store_true", help="Use the real Edge TTS service")
+    args = parser.parse_args()
+
+    if not args.live:
+        StubCommunicate.latency = args.latency
+        doctor_voice.edge_tts.Communicate = StubCommunicate
+
+    texts = {f"rx_{i}.mp3": f"Take Paracetamol 500mg twice daily, dose {i}." for i in range(args.items)}
+
+    print(f"{'concurrency':>12} {'wall (s)':>10} {'ok':>5} {'mean item (s)':>14}")
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as out_dir:
+            start = time.perf_counter()
+            results = doctor_voice.batch_generate_speech(
+                texts, output_dir=out_dir, concurrency=concurrency, return_results=True
+            )
+            wall = time.perf_counter() - start
+        ok = sum(1 for r in results if r['success'])
+        mean_item = sum(r['elapsed'] for r in results) / max(len(results), 1)
+        print(f"{concurrency:>12} {wall:>10.2f} {ok:>5} {mean_item:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
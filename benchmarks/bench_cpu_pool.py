@@ -0,0 +1,123 @@
+"""
+Measure a mixed workload with and without the CPU process pool.
+
+Heavy clients upload large photos (decoded, and downscaled when
+IMAGE_MAX_SIDE is set) and PDFs
+(text extracted); light clients send small images and serialize a report,
+like ordinary analysis requests. All clients are threads of one process,
+as in a gunicorn worker. With the pool the heavy stages run in worker
+processes and copy their buffers through shared memory; without it they
+run inline and hold this process's GIL.
+
+Reported per mode: heavy operations/s, light requests/s and light request
+latency. The pool can only help when the machine has spare cores.
+
+    python benchmarks/bench_cpu_pool.py --heavy 2 --light 4 --seconds 10
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageFilter
+
+from bench_pdf_extract import write_pdf
+from src import cpu_pool, document_extract
+
+REPORT = {"analysis": "Mild allergic contact dermatitis. Apply hydrocortisone 1% cream twice daily. " * 20,
+          "language": "English"}
+
+
+def photo(size, quality=90):
+    """JPEG with photo-like noise (smooth areas and detail)"""
+    image = Image.effect_noise(size, 60).convert("RGB").filter(ImageFilter.GaussianBlur(2))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def run(mode, args, large_photo, small_photo, pdf_path):
+    pooled = mode == "pool"
+    min_bytes = 0 if pooled else 10 ** 12
+    stop = threading.Event()
+    heavy_ops = []
+    light_latency = []
+
+    def heavy(index):
+        count = 0
+        while not stop.is_set():
+            if index % 2 == 0:
+                cpu_pool.decode_image(large_photo, min_bytes=min_bytes)
+            else:
+                document_extract.extract_pdf_text(pdf_path, parallel=pooled)
+            count += 1
+        heavy_ops.append(count)
+
+    def light():
+        samples = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            cpu_pool.decode_image(small_photo)
+            json.dumps(REPORT)
+            samples.append(time.perf_counter() - start)
+        light_latency.extend(samples)
+
+    # Warm the pool so process start-up is not measured
+    if pooled:
+        cpu_pool.decode_image(large_photo, min_bytes=0)
+        document_extract.extract_pdf_text(pdf_path, parallel=True)
+
+    threads = [threading.Thread(target=heavy, args=(i,)) for i in range(args.heavy)]
+    threads += [threading.Thread(target=light) for _ in range(args.light)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    light_latency.sort()
+    p99 = light_latency[max(0, int(len(light_latency) * 0.99) - 1)] if light_latency else 0
+    p50 = statistics.median(light_latency) if light_latency else 0
+    print(f"{mode:<7} {sum(heavy_ops) / elapsed:>9.2f} {len(light_latency) / elapsed:>9.1f} "
+          f"{p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--heavy", type=int, default=2, help="clients uploading large photos and PDFs")
+    parser.add_argument("--light", type=int, default=4, help="clients sending small images")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--photo", type=int, nargs=2, default=[4000, 3000], metavar=("W", "H"))
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=max(2, min(4, os.cpu_count() or 1)))
+    args = parser.parse_args()
+    cpu_pool.CPU_POOL_WORKERS = args.workers
+
+    large_photo = photo(tuple(args.photo))
+    small_photo = photo((320, 240))
+    print(f"cores {os.cpu_count()}, pool workers {args.workers}, photo {len(large_photo) / 2 ** 20:.1f} MiB, "
+          f"PDF {args.pages} pages")
+    print(f"{'mode':<7} {'heavy/s':>9} {'light/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "report.pdf")
+        write_pdf(pdf_path, args.pages)
+        for mode in ("inline", "pool"):
+            run(mode, args, large_photo, small_photo, pdf_path)
+
+    cpu_pool.shutdown_cpu_pool(wait=True)
+
+
+if __name__ == "__main__":
+    main()
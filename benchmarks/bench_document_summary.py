@@ -0,0 +1,73 @@
+"""
+Measure map-reduce document summary wall time against document length.
+
+The LLM is a stub with a fixed latency per call. Documents of 10, 50 and
+200 pages (about 2,500 characters per page) are summarized with one call
+at a time and with --concurrency calls in flight. A second pass over the
+same document shows the effect of the chunk cache.
+
+    python benchmarks/bench_document_summary.py --latency 0.5 --concurrency 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.document_summary import DocumentSummarizer, SummaryCache
+
+PARAGRAPH = ("Haemoglobin 10.2 g/dL, below the normal range. Continue ferrous sulphate 200 mg twice daily "
+             "after food and repeat the blood count in four weeks. ")
+
+
+class StubLLM:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        return "Low haemoglobin. Take iron tablets twice a day after food."
+
+
+def document(pages):
+    return [(f"Page {i}", f"Page {i}. " + PARAGRAPH * 15) for i in range(1, pages + 1)]
+
+
+def run(sections, latency, concurrency, cache):
+    llm = StubLLM(latency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        summarizer = DocumentSummarizer(llm, "stub", executor=executor, cache=cache)
+        start = time.perf_counter()
+        _, chunks = summarizer.summarize(sections, "English")
+        return chunks, llm.calls, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per LLM call")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'pages':>5} {'chunks':>6} {'mode':<12} {'calls':>5} {'seconds':>8}")
+    for pages in args.pages:
+        sections = document(pages)
+        with tempfile.TemporaryDirectory() as tmp:
+            modes = [
+                ('sequential', 1, None),
+                (f'parallel x{args.concurrency}', args.concurrency, SummaryCache(tmp)),
+                ('cached', args.concurrency, SummaryCache(tmp)),
+            ]
+            for mode, concurrency, cache in modes:
+                chunks, calls, elapsed = run(sections, args.latency, concurrency, cache)
+                print(f"{pages:>5} {chunks:>6} {mode:<12} {calls:>5} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure how long importing the app takes (the cold-start cost before the first request).
+
+Each run imports the module in a fresh interpreter with `python -X importtime`
+and reads the cumulative time of the module itself, so interpreter startup
+is not counted. Reported: the best and median of --runs, and the slowest
+direct imports of the best run. Provider SDKs (Gemini, Groq, gTTS) and
+document libraries are loaded on first use (src/providers.py), so they
+should not appear.
+
+    python benchmarks/bench_import_time.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module="src.gradio_app_advanced"):
+    """
+    Import module in a new interpreter
+
+    Returns:
+        tuple: ({imported module: (self us, cumulative us, depth)}, stdout of the import)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        profile[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return profile, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="src.gradio_app_advanced")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports to list")
+    args = parser.parse_args()
+
+    runs = [import_profile(args.module)[0] for _ in range(args.runs)]
+    totals = [profile[args.module][1] / 1000 for profile in runs]
+    best = runs[totals.index(min(totals))]
+    print(f"import {args.module}: best {min(totals):.0f} ms, median {statistics.median(totals):.0f} ms "
+          f"over {args.runs} runs")
+
+    depth = best[args.module][2] + 1
+    direct = sorted(((cumulative, name) for name, (_, cumulative, d) in best.items() if d == depth), reverse=True)
+    print(f"{'module':<40} {'ms':>8}")
+    for cumulative, name in direct[:args.top]:
+        print(f"{name:<40} {cumulative / 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
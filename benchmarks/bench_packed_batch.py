@@ -0,0 +1,87 @@
+"""
+Compare packed Edge TTS batches against one request per item.
+
+Short prescription texts are synthesized for 10, 50 and 200 items in both
+modes. By default the service is replaced by a stub that charges a fixed
+session handshake plus a per-character streaming cost, which is where the
+packed mode saves time. Pass --live to use the real Edge TTS service.
+
+    python benchmarks/bench_packed_batch.py --sizes 10 50 200 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import doctor_voice
+
+FRAME = b"\xff\xf3\x64\xc0" + b"\x00" * 140  # 24 ms of MPEG-2 Layer III audio
+
+PRESCRIPTIONS = [
+    "Take Paracetamol 500mg twice daily after food for 3 days.",
+    "Apply ice pack on affected area for 15 minutes, 3 times daily.",
+    "Drink plenty of water and get adequate rest.",
+    "Take Cetirizine 10mg once at night for 5 days.",
+    "Apply Mupirocin cream on the wound two times daily.",
+]
+
+
+class StubCommunicate:
+    handshake = 0.25
+    seconds_per_char = 0.0004
+
+    def __init__(self, text, voice, boundary="SentenceBoundary", **kwargs):
+        self.text = text
+
+    async def stream(self):
+        await asyncio.sleep(self.handshake + self.seconds_per_char * len(self.text))
+        t = 0.1
+        for word in self.text.split():
+            yield {"type": "WordBoundary", "offset": int(t * 1e7), "duration": int(0.25 * 1e7), "text": word.strip(".,")}
+            t += 0.3
+            if word.endswith("."):
+                t += 0.4
+        yield {"type": "audio", "data": FRAME * (int(t / 0.024) + 1)}
+
+    async def save(self, path):
+        data = b"".join([chunk["data"] async for chunk in self.stream() if chunk["type"] == "audio"])
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def run(texts, packed, concurrency):
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        results = doctor_voice.batch_generate_speech(
+            texts, output_dir=out_dir, concurrency=concurrency, packed=packed, return_results=True
+        )
+        wall = time.perf_counter() - start
+    return wall, sum(1 for r in results if r['success'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--live", action="store_true", help="Use the real Edge TTS service")
+    args = parser.parse_args()
+
+    if not args.live:
+        doctor_voice.edge_tts.Communicate = StubCommunicate
+
+    print(f"{'items':>6} {'per-item (s)':>13} {'packed (s)':>11} {'speedup':>8} {'ok':>9}")
+    for size in args.sizes:
+        texts = {f"rx_{i}.mp3": PRESCRIPTIONS[i % len(PRESCRIPTIONS)] for i in range(size)}
+        single_wall, single_ok = run(texts, False, args.concurrency)
+        packed_wall, packed_ok = run(texts, True, args.concurrency)
+        print(f"{size:>6} {single_wall:>13.2f} {packed_wall:>11.2f} {single_wall / packed_wall:>7.1f}x "
+              f"{single_ok:>4}/{packed_ok:<4}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Measure PDF text extraction throughput and peak memory.
+
+Synthetic text PDFs of 10, 100 and 500 pages (about 2,000 characters per
+page) are extracted with:
+
+  legacy    the old `text += page.extract_text() + "\\n"` loop
+  stream    the page generator, whole document
+  budget    the page generator stopping at --budget characters
+  parallel  page ranges on the process pool
+
+Peak memory is the tracemalloc peak of this process (measured in a second,
+untimed pass); pool workers report their maximum RSS separately.
+
+    python benchmarks/bench_pdf_extract.py --pages 10 100 500 --workers 4
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2
+
+from src import cpu_pool, document_extract
+
+LINE = "Haemoglobin 13.5 g/dL normal range 13 to 17. Platelets 250000 per microlitre."
+
+
+def write_pdf(path, page_count, lines_per_page=26):
+    """Write a text-only PDF with the same block of lines on every page"""
+    content = " ".join(f"({LINE} {i}) Tj T*" for i in range(lines_per_page))
+    stream = f"BT /F1 9 Tf 12 TL 36 760 Td {content} ET"
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+               f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"]
+    kids = []
+    for _ in range(page_count):
+        objects.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       "/Resources << /Font << /F1 3 0 R >> >> /Contents 4 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    with open(path, 'wb') as f:
+        offsets = []
+        position = f.write(b"%PDF-1.4\n")
+        for number, body in enumerate(objects, start=1):
+            offsets.append(position)
+            position += f.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        f.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n".encode())
+
+
+def legacy_extract(path):
+    with open(path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        text = ""
+        for page in reader.pages:
+            text += page.extract_text() + "\n"
+        return text.strip()
+
+
+def measure(fn):
+    # Timed without tracing (tracemalloc slows this process but not pool workers)
+    start = time.perf_counter()
+    chars = len(fn())
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chars, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--budget", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=cpu_pool.CPU_POOL_WORKERS)
+    args = parser.parse_args()
+    cpu_pool.CPU_POOL_WORKERS = args.workers
+
+    print(f"{'pages':>5} {'mode':<9} {'chars':>9} {'seconds':>8} {'pages/s':>8} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for page_count in args.pages:
+            path = os.path.join(tmp, f"report_{page_count}.pdf")
+            write_pdf(path, page_count)
+            modes = {
+                'legacy': lambda: legacy_extract(path),
+                'stream': lambda: document_extract.extract_pdf_text(path, parallel=False),
+                'budget': lambda: document_extract.extract_pdf_text(path, args.budget, parallel=False),
+                'parallel': lambda: document_extract.extract_pdf_text(path, parallel=True),
+            }
+            for mode, fn in modes.items():
+                chars, elapsed, peak = measure(fn)
+                print(f"{page_count:>5} {mode:<9} {chars:>9} {elapsed:>8.3f} "
+                      f"{page_count / elapsed:>8.0f} {peak / 2 ** 20:>9.1f}")
+
+    cpu_pool.shutdown_cpu_pool(wait=True)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"\nPool workers: {args.workers}, max worker RSS {children:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
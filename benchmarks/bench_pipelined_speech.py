@@ -0,0 +1,103 @@
+"""
+Compare sequential and pipelined analyze_and_speak end-to-end latency.
+
+Gemini and gTTS are replaced by stubs: the model streams the report a few
+words at a time at a fixed token rate, and synthesis costs a fixed request
+overhead plus a per-character time. Caches and the audio store live in a
+temporary directory and are cleared between runs so every run synthesizes.
+
+    python benchmarks/bench_pipelined_speech.py --runs 3 --tokens-per-second 40
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from src import audio_store as audio_store_module
+from src import sentence_cache
+from src import gradio_app_advanced as app
+
+REPORT = (
+    "MEDICAL REPORT:\n"
+    "1. SYMPTOMS: A red, itchy rash about 4 cm wide on the left forearm with mild swelling. "
+    "The edges are well defined and there is no visible pus.\n"
+    "2. DIAGNOSIS: Allergic contact dermatitis (75% confidence). Irritant dermatitis is also possible.\n"
+    "3. TREATMENT: Apply hydrocortisone 1% cream twice daily for 7 days. "
+    "Take cetirizine 10 mg once at night for 5 days.\n"
+    "4. URGENCY: Routine. The rash is localized and there are no signs of infection.\n"
+    "5. ADVICE: Avoid the suspected trigger, keep the area dry and see a doctor if it spreads or blisters."
+)
+
+
+class StubChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    def __init__(self, tokens_per_second, words_per_chunk=4):
+        self.delay = words_per_chunk / tokens_per_second
+        self.words_per_chunk = words_per_chunk
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        words = REPORT.split(" ")
+        chunks = [" ".join(words[i:i + self.words_per_chunk]) + " "
+                  for i in range(0, len(words), self.words_per_chunk)]
+        if not stream:
+            time.sleep(self.delay * len(chunks))
+            return StubChunk("".join(chunks))
+
+        def iterate():
+            for chunk in chunks:
+                time.sleep(self.delay)
+                yield StubChunk(chunk)
+        return iterate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--tts-overhead", type=float, default=0.3, help="Seconds per synthesis request")
+    parser.add_argument("--tts-per-char", type=float, default=0.002, help="Seconds per synthesized character")
+    args = parser.parse_args()
+
+    def stub_synthesize(text, lang_code):
+        time.sleep(args.tts_overhead + args.tts_per_char * len(text))
+        return b"\xff\xf3" + text.encode("utf-8")
+
+    app.GEMINI_API_KEY = "stub"
+    app.get_gemini_model = lambda name: StubModel(args.tokens_per_second)
+    app.synthesize_speech_bytes = stub_synthesize
+    image = Image.new("RGB", (64, 64))
+
+    print(f"{'mode':<11} {'run':>3} {'seconds':>8}")
+    results = {}
+    for pipelined in (False, True):
+        mode = "pipelined" if pipelined else "sequential"
+        for run in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmp:
+                sentence_cache._default_cache = sentence_cache.SentenceAudioCache(os.path.join(tmp, "tts"))
+                audio_store_module._default_store = audio_store_module.AudioStore(os.path.join(tmp, "audio"))
+                start = time.perf_counter()
+                text, audio_path = app.analyze_and_speak(image, "Full Analysis", "English", "Male", pipelined=pipelined)
+                elapsed = time.perf_counter() - start
+            if not audio_path:
+                print(f"✗ {mode} run {run + 1} produced no audio")
+            results.setdefault(mode, []).append(elapsed)
+            print(f"{mode:<11} {run + 1:>3} {elapsed:>8.2f}")
+
+    sequential = min(results["sequential"])
+    pipelined = min(results["pipelined"])
+    print(f"\nBest sequential: {sequential:.2f}s, best pipelined: {pipelined:.2f}s "
+          f"({(1 - pipelined / sequential):.0%} faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Measure detailed-report read/write latency for the JSON file and SQLite stores.
+
+Each store is filled with N reports (50, 10,000 and 1,000,000 by default),
+then timed over --ops random reads and --ops writes. The old
+detailed_reports.json implementation rewrites and re-parses the whole file
+on every call, so it is only run up to --legacy-max reports.
+
+    python benchmarks/bench_report_store.py --sizes 50 10000 1000000 --ops 200
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.report_store import ReportStore
+
+ANALYSIS = ("MEDICAL REPORT: Mild allergic contact dermatitis on the left forearm. Apply hydrocortisone 1% cream "
+            "twice daily for 7 days and take cetirizine 10 mg at night. See a doctor if it spreads. ") * 4
+
+
+def make_report(i):
+    return {"analysis": f"{ANALYSIS} Report {i}.", "language": "English", "question_type": "Full Analysis"}
+
+
+class LegacyJsonStore:
+    """The previous detailed_reports.json implementation"""
+
+    def __init__(self, path, max_reports):
+        self.path = path
+        self.max_reports = max_reports
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def fill(self, count):
+        now = time.time()
+        reports = {f"r{i}": {"data": make_report(i), "timestamp": now, "language": "English"} for i in range(count)}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    def put(self, key, data):
+        reports = self.load()
+        reports[key] = {"data": data, "timestamp": time.time(), "language": "English"}
+        if len(reports) > self.max_reports:
+            reports = dict(sorted(reports.items(), key=lambda x: x[1]["timestamp"])[-self.max_reports:])
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    def get(self, key):
+        report = self.load().get(key)
+        return report["data"] if report and time.time() - report["timestamp"] < 86400 else None
+
+
+class SqliteStore:
+    def __init__(self, path, max_reports):
+        self.store = ReportStore(path, max_reports=max_reports)
+
+    def fill(self, count, batch=50000):
+        now = time.time()
+        for start in range(0, count, batch):
+            self.store.put_many((f"r{i}", make_report(i), now) for i in range(start, min(start + batch, count)))
+
+    def put(self, key, data):
+        self.store.put(key, data)
+
+    def get(self, key):
+        return self.store.get(key)
+
+
+def timed(fn, ops):
+    samples = []
+    for i in range(ops):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 10000, 1000000])
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'reports':>8} {'store':<7} {'fill s':>7} {'read ms':>8} {'p99':>7} {'write ms':>9} {'p99':>7} {'disk MiB':>9}")
+    for size in args.sizes:
+        for name, cls, suffix in (("json", LegacyJsonStore, ".json"), ("sqlite", SqliteStore, ".sqlite3")):
+            if name == "json" and size > args.legacy_max:
+                continue
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "reports" + suffix)
+                # Retention above the fill size so that writes do not evict the data set
+                store = cls(path, max_reports=size + args.ops)
+                start = time.perf_counter()
+                store.fill(size)
+                fill = time.perf_counter() - start
+                ops = min(args.ops, 20) if name == "json" and size >= 10000 else args.ops
+                read, read_p99 = timed(lambda i: store.get(f"r{random.randrange(size)}"), ops)
+                write, write_p99 = timed(lambda i: store.put(f"new{i}", make_report(i)), ops)
+                disk = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 2 ** 20
+                print(f"{size:>8} {name:<7} {fill:>7.2f} {read:>8.3f} {read_p99:>7.3f} {write:>9.3f} {write_p99:>7.3f} {disk:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measure characters and synthesis time before and after the speech script.
+
+Typical analyses in English, Hindi, Telugu and Hinglish are synthesized as
+written and as their spoken script. By default synthesis is a stub that
+charges a fixed request overhead plus a per-character time (gTTS cost grows
+with text length); pass --live to call gTTS for real.
+
+    python benchmarks/bench_speech_script.py
+    python benchmarks/bench_speech_script.py --live --max-seconds 120
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sentence_cache import split_sentences
+from src.speech_script import estimate_seconds, make_speech_script
+
+GTTS_CODES = {'English': 'en', 'Hindi': 'hi', 'Telugu': 'te', 'Hinglish': 'en'}
+
+SAMPLES = {
+    'English': """## MEDICAL REPORT:
+1. **SYMPTOMS**: Red, itchy rash about 4-5 cm wide on the left forearm. Mild swelling, no pus.
+2. **DIAGNOSIS**: Allergic contact dermatitis (75% confidence). Irritant dermatitis is also possible.
+3. **TREATMENT**:
+| Medicine | Dose | Frequency | Duration |
+|---|---|---|---|
+| Hydrocortisone 1% cream | thin layer | BID | 7 days |
+| Cetirizine | 10mg | HS | 5 days |
+| Paracetamol | 500mg | PRN, max 3/day | 3 days |
+4. **URGENCY**: Routine -> see a doctor if it spreads or blisters.
+5. **ADVICE**: Avoid the trigger, e.g. new detergent. Keep the area dry.
+This is an AI-generated analysis. Please consult a licensed doctor before taking any medicine.
+*Disclaimer: This analysis is not a substitute for professional medical advice.*""",
+    'Hindi': """## मेडिकल रिपोर्ट:
+1. **लक्षण**: बाएं हाथ पर 4-5 cm का लाल, खुजली वाला दाना।
+2. **निदान**: एलर्जिक कॉन्टैक्ट डर्मेटाइटिस (75% विश्वास)।
+3. **इलाज**:
+- Cetirizine 10mg HS x 5 days
+- Paracetamol 500mg BID x 3 days
+4. **सलाह**: इलाके को सूखा रखें।
+यह AI द्वारा तैयार किया गया विश्लेषण है। कोई भी दवा लेने से पहले कृपया डॉक्टर से सलाह लें।
+*यह AI द्वारा तैयार जानकारी केवल सूचना के लिए है।*""",
+    'Telugu': """## వైద్య నివేదిక:
+1. **లక్షణాలు**: ఎడమ చేతిపై 4-5 cm ఎర్రటి దద్దుర్లు.
+2. **నిర్ధారణ**: అలెర్జీ డెర్మటైటిస్ (75% నమ్మకం).
+3. **చికిత్స**:
+- Cetirizine 10mg HS x 5 days
+- Paracetamol 500mg TID x 3 days
+4. **సలహా**: ఆ ప్రాంతాన్ని పొడిగా ఉంచండి.
+ఇది AI ద్వారా తయారైన విశ్లేషణ. మందులు తీసుకునే ముందు వైద్యుడిని సంప్రదించండి.
+*ఈ AI విశ్లేషణ సమాచారం కోసం మాత్రమే.*""",
+    'Hinglish': """## MEDICAL REPORT:
+1. **SYMPTOMS**: Left forearm par 4-5 cm ka laal, khujli wala rash hai.
+2. **DIAGNOSIS**: Allergic contact dermatitis (75% confidence).
+3. **TREATMENT**:
+- Cetirizine 10mg HS x 5 days
+- Paracetamol 500mg BID x 3 days
+4. **ADVICE**: Area ko dry rakhein, e.g. tight kapde na pehnein.
+Yeh AI analysis hai. Koi bhi medicine lene se pehle doctor se zaroor consult karein.
+*Yeh AI analysis sirf jaankari ke liye hai.*""",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="Synthesize with gTTS instead of the stub")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat each sample (repeats count as duplicated text)")
+    parser.add_argument("--max-seconds", type=int, default=None, help="Speech script duration cap")
+    parser.add_argument("--tts-overhead", type=float, default=0.15, help="Stub seconds per synthesis request")
+    parser.add_argument("--tts-per-char", type=float, default=0.0015, help="Stub seconds per character")
+    args = parser.parse_args()
+
+    def synthesize(text, lang_code):
+        if args.live:
+            from gtts import gTTS
+            buffer = io.BytesIO()
+            gTTS(text, lang=lang_code, slow=False, lang_check=False).write_to_fp(buffer)
+            return
+        time.sleep(args.tts_overhead + args.tts_per_char * len(text))
+
+    def timed(text, lang_code):
+        # One request per sentence, as the sentence cache sends them on a cold cache
+        start = time.perf_counter()
+        for sentence in split_sentences(text):
+            synthesize(sentence, lang_code)
+        return time.perf_counter() - start
+
+    print(f"{'language':<9} {'chars':>7} {'script':>7} {'saved':>6} {'est s':>6} {'est s':>6} {'tts s':>6} {'tts s':>6}")
+    print(f"{'':<9} {'before':>7} {'after':>7} {'':>6} {'before':>6} {'after':>6} {'before':>6} {'after':>6}")
+    for language, sample in SAMPLES.items():
+        text = "\n".join([sample] * args.repeat)
+        script = make_speech_script(text, language, args.max_seconds)
+        before_seconds = timed(text, GTTS_CODES[language])
+        after_seconds = timed(script, GTTS_CODES[language])
+        print(f"{language:<9} {len(text):>7} {len(script):>7} {1 - len(script) / len(text):>6.0%} "
+              f"{estimate_seconds(text, language):>6.0f} {estimate_seconds(script, language):>6.0f} "
+              f"{before_seconds:>6.2f} {after_seconds:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Load test /api/analyze-image above capacity, with and without load shedding.
+
+Requests arrive open-loop (Poisson) at --rate per second against the app
+in-process. The model and TTS are replaced by a stub whose service time
+depends on the quality tier (full, reduced, minimal), so the offered load
+can be set to a multiple of the full-quality capacity:
+slots / full service time.
+
+Reported per mode: completed requests, 503 rejections, latency percentiles
+of completed requests and the mix of tiers served.
+
+    python benchmarks/load_test_shedding.py --rate 12 --seconds 30
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from PIL import Image
+
+from src import gradio_app_advanced as app_module
+from src.admission import AdmissionController
+from src.load_shedding import QualityGovernor
+
+SERVICE_SECONDS = {'full': 1.0, 'reduced': 0.4, 'minimal': 0.15}
+
+
+def stub_analyze_and_speak(image, question_type, language, gender, additional_context='', pipelined=None, tier='full',
+                          deadline=None):
+    time.sleep(SERVICE_SECONDS[tier] * random.uniform(0.8, 1.2))
+    return f"{tier} analysis", None
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)] if values else 0
+
+
+async def run(shedding, args, image):
+    app_module.LOAD_SHEDDING = shedding
+    executor = ThreadPoolExecutor(max_workers=args.slots)
+    app_module.admission = AdmissionController(executor, name="load-test", max_in_flight=args.slots,
+                                               max_queue=args.queue, queue_timeout=args.queue_timeout)
+    app_module.quality_governor = QualityGovernor(lambda: app_module.admission.pressure(), cooldown=args.cooldown)
+
+    latencies = []
+    outcomes = Counter()
+    tiers = Counter()
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        async def one():
+            start = time.perf_counter()
+            response = await client.post("/api/analyze-image", files={"image": ("scan.png", image, "image/png")})
+            elapsed = time.perf_counter() - start
+            outcomes[response.status_code] += 1
+            if response.status_code == 200:
+                latencies.append(elapsed)
+                tiers[response.json()["quality_tier"]] += 1
+
+        tasks = []
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            tasks.append(asyncio.create_task(one()))
+            await asyncio.sleep(random.expovariate(args.rate))
+        await asyncio.gather(*tasks)
+    executor.shutdown(wait=True)
+
+    mix = " ".join(f"{tier}={tiers[tier]}" for tier in SERVICE_SECONDS if tiers[tier])
+    p50 = statistics.median(latencies) if latencies else 0
+    print(f"{'on' if shedding else 'off':<8} {len(tasks):>5} {outcomes[200]:>5} {outcomes[503]:>5} "
+          f"{p50:>7.2f} {percentile(latencies, 0.95):>7.2f} {percentile(latencies, 0.99):>7.2f}  {mix}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=12, help="requests per second offered")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--slots", type=int, default=6)
+    parser.add_argument("--queue", type=int, default=12)
+    parser.add_argument("--queue-timeout", type=float, default=20)
+    parser.add_argument("--cooldown", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(out, format="PNG")
+    app_module.analyze_and_speak = stub_analyze_and_speak
+    capacity = args.slots / SERVICE_SECONDS['full']
+    print(f"full-quality capacity {capacity:.1f} req/s, offered {args.rate:.1f} req/s "
+          f"({args.rate / capacity:.1f}x) for {args.seconds:.0f}s")
+    print(f"{'shedding':<8} {'sent':>5} {'ok':>5} {'503':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}  tiers")
+    for shedding in (False, True):
+        random.seed(args.seed)
+        asyncio.run(run(shedding, args, out.getvalue()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# ADMISSION CONTROL
+# Heavy requests (image analysis, document narration) run on a fixed pool of
+# worker threads. At most ADMISSION_MAX_IN_FLIGHT run at once per process;
+# up to ADMISSION_MAX_QUEUE more wait in FIFO order, each for at most its own
+# queue deadline. Beyond that requests are rejected immediately with a 503
+# and a Retry-After estimate, so overload shows up as fast rejections instead
+# of timeouts for everyone. Limits are per gunicorn worker.
+
+import asyncio
+import collections
+import math
+import os
+import time
+
+from src import metrics
+
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "6"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "12"))
+# Longest a request waits for a slot before it is rejected
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "20"))
+# Retry-After used until service times have been measured; estimates are capped at the max
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "5"))
+ADMISSION_RETRY_AFTER_MAX = int(os.environ.get("ADMISSION_RETRY_AFTER_MAX", "60"))
+
+# Weight of the newest sample in the service time average
+_EWMA_ALPHA = 0.2
+
+IN_FLIGHT = metrics.gauge("admission_in_flight", "Admitted requests currently running")
+QUEUE_DEPTH = metrics.gauge("admission_queue_depth", "Requests waiting for a slot")
+REJECTIONS = metrics.counter("admission_rejections_total", "Requests rejected by admission control")
+QUEUE_WAIT_SECONDS = metrics.histogram("admission_queue_wait_seconds", "Time admitted requests waited for a slot")
+
+
+class Overloaded(Exception):
+    """The request was not admitted; retry after retry_after seconds"""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounded in-flight limit and wait queue in front of a thread pool"""
+
+    def __init__(self, executor, name="analysis", max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+                 max_queue=ADMISSION_MAX_QUEUE, queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        """
+        Args:
+            executor: Pool that runs admitted work (sized to max_in_flight)
+            name: Label of this controller's metrics
+            max_in_flight: Requests running at once
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Default seconds a request may wait
+        """
+        self.executor = executor
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = collections.deque()
+        self._service_seconds = None
+        self._publish()
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def pressure(self):
+        """Running plus queued requests per slot (1.0: every slot busy)"""
+        return (self.in_flight + len(self._waiters)) / max(self.max_in_flight, 1)
+
+    def _publish(self):
+        IN_FLIGHT.set(self.in_flight, pool=self.name)
+        QUEUE_DEPTH.set(len(self._waiters), pool=self.name)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from the measured service time"""
+        if self._service_seconds is None:
+            return ADMISSION_RETRY_AFTER
+        wait = self._service_seconds * (len(self._waiters) + 1) / max(self.max_in_flight, 1)
+        return max(1, min(ADMISSION_RETRY_AFTER_MAX, math.ceil(wait)))
+
+    def _reject(self, route, reason):
+        REJECTIONS.inc(pool=self.name, route=route, reason=reason)
+        return Overloaded(self.retry_after(), reason)
+
+    async def acquire(self, route="", queue_timeout=None):
+        """Wait for a slot; raises Overloaded if the queue is full or the deadline passes"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            QUEUE_WAIT_SECONDS.observe(0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(route, "queue_full")
+
+        timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+        if timeout <= 0:
+            raise self._reject(route, "queue_timeout")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        start = time.monotonic()
+        try:
+            # release() hands its slot to the waiter, so in_flight already counts it
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            raise self._reject(route, "queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        QUEUE_WAIT_SECONDS.observe(time.monotonic() - start)
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._publish()
+
+    def release(self):
+        """Free a slot, handing it to the oldest waiter still waiting"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def _record(self, seconds):
+        if self._service_seconds is None:
+            self._service_seconds = seconds
+        else:
+            self._service_seconds += _EWMA_ALPHA * (seconds - self._service_seconds)
+
+    async def run(self, fn, *args, route="", queue_timeout=None):
+        """
+        Run fn(*args) on the executor once admitted
+
+        Args:
+            fn: Blocking callable
+            route: Route name for the rejection metric
+            queue_timeout: Seconds this request may wait (default: controller's)
+
+        Returns:
+            The result of fn
+
+        Raises:
+            Overloaded: The request was not admitted
+        """
+        await self.acquire(route, queue_timeout)
+        start = time.monotonic()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        except BaseException:
+            self.release()
+            raise
+
+        def finished(_):
+            # The slot is held until the thread is done, even if the client went away
+            self._record(time.monotonic() - start)
+            self.release()
+
+        future.add_done_callback(finished)
+        return await asyncio.shield(future)
@@ -0,0 +1,177 @@
+# HTTP DELIVERY FOR IMMUTABLE AUDIO ARTIFACTS
+# Strong ETags, long-lived immutable caching, conditional GET (304) and
+# single byte-range requests (206) so players can seek without re-downloading.
+# Short audio can also travel in the same response as the analysis (inline
+# base64 JSON or multipart/mixed) to save a round trip on slow links.
+
+import base64
+import json
+import os
+import re
+import uuid
+
+from fastapi.responses import Response, StreamingResponse
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+# Audio up to this size is embedded in single-round-trip responses; larger
+# audio is referenced by URL instead (0 disables embedding)
+INLINE_AUDIO_MAX_BYTES = int(os.environ.get("INLINE_AUDIO_MAX_BYTES", str(256 * 1024)))
+
+RESPONSE_MODES = ('reference', 'inline', 'multipart')
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Weak comparison for If-None-Match (RFC 9110 13.1.2)
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header
+
+    Returns:
+        tuple: (start, end) inclusive, None to serve the full body, or
+               'unsatisfiable' when the range lies outside the file
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None  # multi-range or unknown unit: serve the whole file
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or (last and end < start):
+        return 'unsatisfiable'
+    return start, min(end, size - 1)
+
+
+def _iter_file(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def immutable_file_response(request, path, etag, media_type, extra_headers=None):
+    """
+    Build a response for a content-addressed file
+
+    Args:
+        request: Incoming request (for conditional and Range headers)
+        path: File to serve
+        etag: Strong entity tag, already quoted
+        media_type: Content type
+        extra_headers: Optional additional headers (e.g. Vary)
+
+    Returns:
+        Response: 200, 206, 304 or 416 response
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        **(extra_headers or {}),
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    byte_range = parse_range(request.headers.get("range"), size)
+
+    # A stale If-Range validator means the client must get the whole new body
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range == 'unsatisfiable':
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_file(path, 0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(_iter_file(path, start, length), status_code=206, media_type=media_type, headers=headers)
+
+
+def choose_response_mode(requested=None, accept=None):
+    """
+    Pick how analysis audio is delivered
+
+    Args:
+        requested: 'reference', 'inline' or 'multipart' from the request
+        accept: HTTP Accept header value
+
+    Returns:
+        str: One of RESPONSE_MODES (default 'reference')
+    """
+    requested = (requested or "").lower()
+    if requested in RESPONSE_MODES:
+        return requested
+    if accept and "multipart/mixed" in accept.lower():
+        return 'multipart'
+    return 'reference'
+
+
+def inline_audio_fields(audio_bytes, media_type):
+    """JSON fields carrying audio as base64"""
+    return {
+        "audio_inline": True,
+        "audio_media_type": media_type,
+        "audio_base64": base64.b64encode(audio_bytes).decode("ascii"),
+    }
+
+
+def multipart_mixed_response(payload, audio_bytes, media_type, etag=None):
+    """
+    Build a multipart/mixed response: the JSON payload first, then the audio
+
+    Args:
+        payload: JSON-serializable analysis result
+        audio_bytes: Audio body
+        media_type: Audio content type
+        etag: Optional quoted entity tag of the audio part
+
+    Returns:
+        Response: multipart/mixed response
+    """
+    boundary = uuid.uuid4().hex
+    json_part = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    audio_headers = f"Content-Type: {media_type}\r\nContent-Length: {len(audio_bytes)}\r\n"
+    if etag:
+        audio_headers += f"ETag: {etag}\r\n"
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json; charset=utf-8\r\n\r\n".encode("ascii"),
+        json_part,
+        f"\r\n--{boundary}\r\n{audio_headers}\r\n".encode("ascii"),
+        audio_bytes,
+        f"\r\n--{boundary}--\r\n".encode("ascii"),
+    ])
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
@@ -0,0 +1,291 @@
+# MANAGED AUDIO ARTIFACT STORE
+# Owns every generated audio file: content-hash ids, TTL expiry, disk quota
+# with oldest-first eviction and a background sweeper. The directory can be
+# shared by several gunicorn workers on the same host; with a shared storage
+# backend (src/blob_storage.py) other instances can serve the audio too.
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src import metrics
+from src.blob_storage import get_blob_storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: sweeps are not serialized across processes
+    fcntl = None
+
+AUDIO_STORE_DIR = Path(os.environ.get("AUDIO_STORE_DIR", Path(tempfile.gettempdir()) / "ai_doctor_audio"))
+AUDIO_TTL_SECONDS = int(os.environ.get("AUDIO_TTL_SECONDS", str(6 * 3600)))
+AUDIO_MAX_BYTES = int(os.environ.get("AUDIO_MAX_BYTES", str(200 * 1024 * 1024)))
+AUDIO_SWEEP_INTERVAL = int(os.environ.get("AUDIO_SWEEP_INTERVAL", "300"))
+
+MEDIA_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.ogg': 'audio/ogg',
+}
+
+_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+_TMP_PREFIX = ".tmp-"
+_LOCK_NAME = ".sweep.lock"
+
+EVICTIONS = metrics.counter("audio_store_evictions_total", "Audio files removed by the store")
+SHARED_FETCHES = metrics.counter("audio_store_shared_fetches_total", "Audio files fetched from shared storage")
+
+
+class AudioStore:
+    """Directory of generated audio addressed by the SHA-256 of its content"""
+
+    def __init__(self, root=AUDIO_STORE_DIR, ttl_seconds=AUDIO_TTL_SECONDS, max_bytes=AUDIO_MAX_BYTES, shared=None):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # Shared backend written through on put and read on local misses (None: this host only)
+        self.shared = shared
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # ---- writing -------------------------------------------------------
+
+    def put_bytes(self, data, suffix='.mp3', audio_id=None):
+        """
+        Store audio bytes (storing identical audio again returns the same id)
+
+        Args:
+            data: Audio bytes
+            suffix: File type
+            audio_id: Explicit id for derived artifacts (e.g. transcoded
+                      variants keyed by their source); defaults to the content hash
+
+        Returns:
+            str: Audio id (hex SHA-256 of the content)
+        """
+        if suffix not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported audio type: {suffix}")
+        if audio_id is not None and not _ID_RE.match(audio_id):
+            raise ValueError("Invalid audio id")
+        audio_id = audio_id or hashlib.sha256(data).hexdigest()
+        target = self.root / f"{audio_id}{suffix}"
+        if target.exists():
+            self.touch(audio_id)
+            return audio_id
+        self._write_local(target, data)
+        if self.shared is not None:
+            try:
+                self.shared.put(f"audio/{audio_id}{suffix}", data, MEDIA_TYPES[suffix])
+            except Exception as e:
+                # Still served by this instance; other instances will miss it
+                print(f"ERROR: Could not upload audio {audio_id} to shared storage: {e}")
+
+        if self.max_bytes and self.total_bytes() > self.max_bytes:
+            self.sweep()
+        return audio_id
+
+    def _write_local(self, target, data):
+        tmp_path = self.root / f"{_TMP_PREFIX}{target.stem}.{os.getpid()}.{threading.get_ident()}{target.suffix}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+
+    def put_file(self, path, suffix=None):
+        """Move an existing file into the store and return its id"""
+        suffix = suffix or Path(path).suffix.lower()
+        with open(path, 'rb') as f:
+            audio_id = self.put_bytes(f.read(), suffix)
+        os.unlink(path)
+        return audio_id
+
+    # ---- reading -------------------------------------------------------
+
+    @staticmethod
+    def media_type(path):
+        return MEDIA_TYPES.get(Path(path).suffix.lower(), 'application/octet-stream')
+
+    def path(self, audio_id):
+        """Return the file path for an id, or None if unknown or expired"""
+        if not audio_id or not _ID_RE.match(audio_id):
+            return None
+        return self._local_path(audio_id) or self._fetch_shared(audio_id)
+
+    def _fetch_shared(self, audio_id):
+        """Copy an artifact produced by another instance into the local directory"""
+        if self.shared is None:
+            return None
+        for suffix in MEDIA_TYPES:
+            try:
+                data = self.shared.get(f"audio/{audio_id}{suffix}")
+            except Exception as e:
+                print(f"ERROR: Could not read audio {audio_id} from shared storage: {e}")
+                return None
+            if data is not None:
+                target = self.root / f"{audio_id}{suffix}"
+                self._write_local(target, data)
+                SHARED_FETCHES.inc()
+                return target
+        return None
+
+    def _local_path(self, audio_id):
+        if not audio_id or not _ID_RE.match(audio_id):
+            return None
+        for suffix in MEDIA_TYPES:
+            candidate = self.root / f"{audio_id}{suffix}"
+            if candidate.exists():
+                return candidate
+        return None
+
+    def id_for_path(self, path):
+        """Return the id of a file owned by the store, or None for any other path"""
+        if not path:
+            return None
+        try:
+            resolved = Path(path).resolve()
+        except OSError:
+            return None
+        if resolved.parent != self.root.resolve():
+            return None
+        audio_id = resolved.stem
+        local = self.root / resolved.name
+        return audio_id if resolved.suffix in MEDIA_TYPES and self._local_path(audio_id) == local else None
+
+    def touch(self, audio_id):
+        """Mark an artifact as recently used (extends its local TTL)"""
+        path = self._local_path(audio_id)
+        if path is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    # ---- accounting and cleanup ---------------------------------------
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(self.root / name)
+            except OSError:
+                continue  # removed by another worker
+            entries.append((stat.st_mtime, stat.st_size, self.root / name))
+        return entries
+
+    def file_count(self):
+        return len(self._entries())
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _remove(self, path, reason):
+        try:
+            path.unlink()
+            EVICTIONS.inc(reason=reason)
+            return True
+        except OSError:
+            return False
+
+    def sweep(self, now=None):
+        """
+        Remove expired artifacts, then evict the oldest until under quota
+
+        Only one process sweeps at a time; concurrent callers return immediately.
+
+        Returns:
+            dict: {'expired': n, 'evicted': n}
+        """
+        now = time.time() if now is None else now
+        removed = {'expired': 0, 'evicted': 0}
+
+        lock_file = open(self.root / _LOCK_NAME, 'a')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return removed
+
+            # Abandoned partial writes
+            for name in os.listdir(self.root):
+                if name.startswith(_TMP_PREFIX):
+                    tmp_path = self.root / name
+                    try:
+                        if now - tmp_path.stat().st_mtime > 3600:
+                            tmp_path.unlink()
+                    except OSError:
+                        pass
+
+            entries = sorted(self._entries())
+            if self.ttl_seconds:
+                alive = []
+                for mtime, size, path in entries:
+                    if now - mtime > self.ttl_seconds:
+                        removed['expired'] += self._remove(path, 'ttl')
+                    else:
+                        alive.append((mtime, size, path))
+                entries = alive
+
+            if self.max_bytes:
+                total = sum(size for _, size, _ in entries)
+                for mtime, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    if self._remove(path, 'quota'):
+                        removed['evicted'] += 1
+                    total -= size
+
+            # A shared directory is expired by whichever instance sweeps (S3 uses lifecycle rules)
+            if self.ttl_seconds and hasattr(self.shared, 'sweep'):
+                self.shared.sweep("audio/", self.ttl_seconds, now)
+        finally:
+            lock_file.close()
+        return removed
+
+    def start_sweeper(self, interval=AUDIO_SWEEP_INTERVAL):
+        """Start the background sweeper thread (idempotent)"""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"ERROR: Audio store sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="audio-store-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_audio_store():
+    """Return the process-wide audio store"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = AudioStore(shared=get_blob_storage())
+        return _default_store
+
+
+metrics.gauge("audio_store_files", "Audio files currently held by the store").set_function(
+    lambda: get_audio_store().file_count()
+)
+metrics.gauge("audio_store_bytes", "Bytes of audio currently held by the store").set_function(
+    lambda: get_audio_store().total_bytes()
+)
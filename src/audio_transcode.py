@@ -0,0 +1,146 @@
+# COMPACT AUDIO OUTPUT FORMATS
+# Transcodes synthesized MP3 into smaller speech-oriented encodings (mono
+# Opus/OGG or low-bitrate MP3) with ffmpeg. Variants are cached in the audio
+# store next to the original; without ffmpeg the original MP3 is served.
+
+import hashlib
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+TRANSCODE_TIMEOUT = 60
+
+# Output profiles: container suffix, content type and ffmpeg encoder arguments
+PROFILES = {
+    'mp3': None,  # original synthesized audio
+    'mp3-low': {
+        'suffix': '.mp3',
+        'media_type': 'audio/mpeg',
+        'bitrate': '24k',
+        'args': ['-c:a', 'libmp3lame', '-ac', '1', '-ar', '22050', '-f', 'mp3'],
+    },
+    'opus': {
+        'suffix': '.ogg',
+        'media_type': 'audio/ogg',
+        'bitrate': '16k',
+        'args': ['-c:a', 'libopus', '-ac', '1', '-application', 'voip', '-f', 'ogg'],
+    },
+}
+
+DEFAULT_FORMAT = os.environ.get("AUDIO_DEFAULT_FORMAT", "mp3")
+
+_BITRATE_CHOICES = {'8k', '12k', '16k', '24k', '32k', '48k', '64k'}
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_available():
+    """Check whether the ffmpeg binary can be found"""
+    return shutil.which(FFMPEG_BINARY) is not None or os.path.isfile(FFMPEG_BINARY)
+
+
+def normalize_bitrate(profile, bitrate=None):
+    """Return a supported bitrate for a profile (falls back to the profile default)"""
+    if bitrate and str(bitrate).lower() in _BITRATE_CHOICES:
+        return str(bitrate).lower()
+    return PROFILES[profile]['bitrate']
+
+
+def negotiate_format(requested=None, accept=None):
+    """
+    Choose an output profile from an explicit request or an Accept header
+
+    Args:
+        requested: Profile name from the request ('mp3', 'mp3-low', 'opus')
+        accept: HTTP Accept header value
+
+    Returns:
+        str: Profile name
+    """
+    if requested:
+        requested = requested.lower()
+        if requested in ('ogg', 'audio/ogg'):
+            requested = 'opus'
+        if requested in PROFILES:
+            return requested
+
+    if accept:
+        for item in accept.split(","):
+            parts = [p.strip() for p in item.split(";")]
+            media = parts[0].lower()
+            refused = any(p.replace(" ", "") in ("q=0", "q=0.0") for p in parts[1:])
+            if refused:
+                continue
+            if media in ('audio/ogg', 'audio/opus') or 'codecs=opus' in item.lower():
+                return 'opus'
+
+    return DEFAULT_FORMAT if DEFAULT_FORMAT in PROFILES else 'mp3'
+
+
+def variant_id(audio_id, profile, bitrate):
+    """Stable id of a transcoded variant of an audio artifact"""
+    return hashlib.sha256(f"{audio_id}:{profile}:{bitrate}".encode('utf-8')).hexdigest()
+
+
+def transcode_bytes(data, profile, bitrate=None):
+    """
+    Transcode MP3 bytes into a compact profile
+
+    Args:
+        data: Source MP3 bytes
+        profile: 'mp3-low' or 'opus'
+        bitrate: Optional target bitrate such as '16k'
+
+    Returns:
+        bytes: Encoded audio
+
+    Raises:
+        RuntimeError: If ffmpeg is missing or fails
+    """
+    spec = PROFILES[profile]
+    if spec is None:
+        return data
+    if not ffmpeg_available():
+        raise RuntimeError("ffmpeg is not installed")
+
+    command = [
+        FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+        '-i', 'pipe:0',
+        *spec['args'],
+        '-b:a', normalize_bitrate(profile, bitrate),
+        'pipe:1',
+    ]
+    result = subprocess.run(command, input=data, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace')[:200]}")
+    return result.stdout
+
+
+def get_variant(audio_store, audio_id, profile, bitrate=None):
+    """
+    Return (variant_id, path) for a profile of a stored artifact, transcoding on first use
+
+    Falls back to the original artifact when no transcoding is needed or possible.
+    """
+    original = audio_store.path(audio_id)
+    if original is None:
+        return None, None
+    if PROFILES.get(profile) is None:
+        return audio_id, original
+
+    bitrate = normalize_bitrate(profile, bitrate)
+    derived_id = variant_id(audio_id, profile, bitrate)
+    cached = audio_store.path(derived_id)
+    if cached is not None:
+        return derived_id, cached
+
+    try:
+        with open(original, 'rb') as f:
+            encoded = transcode_bytes(f.read(), profile, bitrate)
+    except Exception as e:
+        print(f"WARNING: Transcoding to {profile} failed, serving original: {e}")
+        return audio_id, original
+
+    audio_store.put_bytes(encoded, PROFILES[profile]['suffix'], audio_id=derived_id)
+    return derived_id, audio_store.path(derived_id)
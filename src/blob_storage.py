@@ -0,0 +1,256 @@
+# SHARED ARTIFACT STORAGE
+# Generated audio, cached sentence audio and detailed reports are addressed by
+# content id, so any instance can serve an artifact another one produced. The
+# stores keep working on their local directories and write through to (and
+# read back from) a shared backend: a directory every node mounts, or an
+# S3-compatible bucket (AWS S3, MinIO, ...). With no backend configured the
+# service runs single-node as before.
+#
+#   ARTIFACT_STORAGE=local  ARTIFACT_STORAGE_DIR=/mnt/shared/ai_doctor
+#   ARTIFACT_STORAGE=s3     S3_ENDPOINT_URL=http://minio:9000 S3_BUCKET=ai-doctor
+#                           S3_ACCESS_KEY_ID=... S3_SECRET_ACCESS_KEY=...
+#
+# Shared objects are not swept by the S3 backend; give the bucket a lifecycle
+# rule at least as long as AUDIO_TTL_SECONDS and REPORT_TTL_SECONDS.
+#
+# Playlist manifests are shared too. Background jobs are not: the SQLite job
+# queue and the job input files stay on the node that accepted the job, so
+# /api/jobs/{id} (and its event stream) needs sticky sessions, or JOB_DB_PATH
+# and JOB_FILES_DIR on a volume only one node's workers use.
+
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, quote, urlsplit
+
+from src import metrics, providers
+
+ARTIFACT_STORAGE = os.environ.get("ARTIFACT_STORAGE", "none").lower()
+ARTIFACT_STORAGE_DIR = Path(os.environ.get("ARTIFACT_STORAGE_DIR", "shared_artifacts"))
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_REGION = os.environ.get("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID", os.environ.get("AWS_ACCESS_KEY_ID", ""))
+S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY", os.environ.get("AWS_SECRET_ACCESS_KEY", ""))
+S3_PREFIX = os.environ.get("S3_PREFIX", "")
+S3_TIMEOUT = float(os.environ.get("S3_TIMEOUT", "10"))
+
+_KEY_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._/-]*$')
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+REQUESTS = metrics.counter("artifact_storage_requests_total", "Shared storage operations by backend, op and outcome")
+
+
+class StorageError(Exception):
+    """The shared storage backend failed or rejected a request"""
+
+
+def validate_key(key):
+    if not _KEY_RE.match(key) or ".." in key:
+        raise ValueError(f"Invalid storage key: {key}")
+    return key
+
+
+class LocalBlobStorage:
+    """Shared directory (e.g. an NFS mount) holding one file per key"""
+    backend = "local"
+
+    def __init__(self, root=ARTIFACT_STORAGE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.root / validate_key(key)
+
+    def get(self, key):
+        """Return the object's bytes, or None if it does not exist"""
+        try:
+            data = self._path(key).read_bytes()
+        except FileNotFoundError:
+            REQUESTS.inc(backend=self.backend, op="get", outcome="miss")
+            return None
+        REQUESTS.inc(backend=self.backend, op="get", outcome="hit")
+        return data
+
+    def put(self, key, data, content_type=None):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".tmp-{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        REQUESTS.inc(backend=self.backend, op="put", outcome="ok")
+
+    def exists(self, key):
+        return self._path(key).exists()
+
+    def delete(self, key):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, prefix, max_age, now=None):
+        """Delete objects under prefix older than max_age seconds; returns the number removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        directory = self.root / validate_key(prefix.rstrip("/"))
+        if not directory.is_dir():
+            return 0
+        for path in directory.rglob("*"):
+            try:
+                if path.is_file() and now - path.stat().st_mtime > max_age:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+def sign_request(method, url, headers, payload_hash, access_key, secret_key, region, service="s3", now=None):
+    """
+    Sign a request with AWS Signature Version 4
+
+    Args:
+        method: HTTP method
+        url: Full URL (path already percent-encoded)
+        headers: Headers to sign besides host, x-amz-date and x-amz-content-sha256
+        payload_hash: Hex SHA-256 of the body
+        access_key, secret_key: Credentials
+        region, service: Signing scope
+        now: datetime (UTC) of the request
+
+    Returns:
+        dict: Headers to send, including Authorization
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    parts = urlsplit(url)
+
+    signed = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed['host'] = parts.netloc
+    signed['x-amz-date'] = amz_date
+    signed['x-amz-content-sha256'] = payload_hash
+    names = sorted(signed)
+
+    query = "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}"
+                     for k, v in sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    canonical_request = "\n".join([
+        method,
+        parts.path or "/",
+        query,
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        payload_hash,
+    ])
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+    ])
+
+    key = ("AWS4" + secret_key).encode('utf-8')
+    for part in (date, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    result = dict(headers)
+    result['x-amz-date'] = amz_date
+    result['x-amz-content-sha256'] = payload_hash
+    result['Authorization'] = (f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+                               f"SignedHeaders={';'.join(names)}, Signature={signature}")
+    return result
+
+
+class S3BlobStorage:
+    """S3-compatible bucket accessed with path-style URLs and SigV4 signing"""
+    backend = "s3"
+
+    def __init__(self, endpoint_url=S3_ENDPOINT_URL, bucket=S3_BUCKET, access_key=S3_ACCESS_KEY_ID,
+                 secret_key=S3_SECRET_ACCESS_KEY, region=S3_REGION, prefix=S3_PREFIX, timeout=S3_TIMEOUT):
+        if not bucket:
+            raise ValueError("S3_BUCKET is not set")
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.timeout = timeout
+        self._requests = providers.get("requests")
+        self._session = self._requests.Session()
+
+    def _url(self, key):
+        return f"{self.endpoint_url}/{self.bucket}/{quote(self.prefix + validate_key(key), safe='/-_.~')}"
+
+    def _request(self, method, key, data=b"", headers=None):
+        url = self._url(key)
+        payload_hash = hashlib.sha256(data).hexdigest() if data else _EMPTY_SHA256
+        signed = sign_request(method, url, headers or {}, payload_hash, self.access_key, self.secret_key, self.region)
+        try:
+            return self._session.request(method, url, data=data or None, headers=signed, timeout=self.timeout)
+        except self._requests.RequestException as e:
+            REQUESTS.inc(backend=self.backend, op=method.lower(), outcome="error")
+            raise StorageError(f"{method} {key} failed: {e}") from e
+
+    def _check(self, response, method, key, ok=(200,)):
+        if response.status_code not in ok:
+            REQUESTS.inc(backend=self.backend, op=method.lower(), outcome="error")
+            raise StorageError(f"{method} {key} returned HTTP {response.status_code}: {response.text[:200]}")
+
+    def get(self, key):
+        """Return the object's bytes, or None if it does not exist"""
+        response = self._request("GET", key)
+        if response.status_code == 404:
+            REQUESTS.inc(backend=self.backend, op="get", outcome="miss")
+            return None
+        self._check(response, "GET", key)
+        REQUESTS.inc(backend=self.backend, op="get", outcome="hit")
+        return response.content
+
+    def put(self, key, data, content_type=None):
+        headers = {'Content-Type': content_type or 'application/octet-stream'}
+        self._check(self._request("PUT", key, data, headers), "PUT", key)
+        REQUESTS.inc(backend=self.backend, op="put", outcome="ok")
+
+    def exists(self, key):
+        response = self._request("HEAD", key)
+        if response.status_code == 404:
+            return False
+        self._check(response, "HEAD", key)
+        return True
+
+    def delete(self, key):
+        self._check(self._request("DELETE", key), "DELETE", key, ok=(200, 204, 404))
+
+
+def create_blob_storage(kind=None):
+    """Build the backend selected by ARTIFACT_STORAGE ('none', 'local' or 's3'); None for single-node"""
+    kind = (kind or ARTIFACT_STORAGE).lower()
+    if kind in ("", "none"):
+        return None
+    if kind == "local":
+        return LocalBlobStorage(ARTIFACT_STORAGE_DIR)
+    if kind == "s3":
+        return S3BlobStorage()
+    raise ValueError(f"Unknown ARTIFACT_STORAGE: {kind}")
+
+
+_default_storage = None
+_default_storage_ready = False
+_default_storage_lock = threading.Lock()
+
+
+def get_blob_storage():
+    """Return the process-wide shared storage backend, or None when not configured"""
+    global _default_storage, _default_storage_ready
+    with _default_storage_lock:
+        if not _default_storage_ready:
+            _default_storage = create_blob_storage()
+            _default_storage_ready = True
+        return _default_storage
@@ -0,0 +1,130 @@
+# CPU-BOUND STAGES ON A PROCESS POOL
+# One process pool per app worker for pure-CPU stages that would otherwise
+# hold the request worker's GIL: decoding uploaded images and parsing large
+# PDFs in page ranges (src/document_extract.py).
+#
+# Large image uploads are decoded in the pool; the compressed bytes and the
+# decoded pixels are copied through shared memory blocks instead of being
+# pickled through the pool's pipe. Small uploads are decoded inline, where
+# the round trip would cost more than it saves.
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from src import metrics
+
+# Each gunicorn worker spawns its own pool, so keep this small
+CPU_POOL_WORKERS = int(os.environ.get("CPU_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Uploads smaller than this are decoded in the calling thread
+CPU_POOL_MIN_BYTES = int(os.environ.get("CPU_POOL_MIN_BYTES", str(256 * 1024)))
+# Longest image side passed to the model (0: the image as uploaded). Off by
+# default because it changes what the model sees; e.g. 3072, where Gemini
+# scales images down to anyway, makes the SDK's re-encode much cheaper
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "0"))
+
+DECODES = metrics.counter("image_decodes_total", "Uploaded images decoded, by where the work ran")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_cpu_pool():
+    """Return the process pool for CPU-bound stages (spawned lazily, shared by image decoding and PDF parsing)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the parent runs threads (sweepers, executors) that fork would copy mid-state
+            _pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_cpu_pool(wait=False):
+    """Stop the process pool (it is recreated on next use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def target_size(size, max_side=IMAGE_MAX_SIDE):
+    """Size of an image after downscaling so its longest side is at most max_side"""
+    width, height = size
+    scale = max_side / max(width, height) if max_side else 1
+    if scale >= 1:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _decode(data, size):
+    image = Image.open(io.BytesIO(data))
+    # JPEG can decode straight to a reduced scale, which is much faster than resizing afterwards
+    image.draft("RGB", size)
+    image = image.convert("RGB")
+    if image.size != size:
+        image = image.resize(size, Image.BICUBIC, reducing_gap=2.0)
+    return image
+
+
+def decode_into_shared(in_name, in_length, out_name, size):
+    """Decode the image in one shared block into RGB pixels in another (runs in pool workers)"""
+    source = shared_memory.SharedMemory(name=in_name)
+    target = shared_memory.SharedMemory(name=out_name)
+    try:
+        pixels = _decode(source.buf[:in_length], size).tobytes()
+        target.buf[:len(pixels)] = pixels
+    finally:
+        source.close()
+        target.close()
+
+
+def decode_image(data, max_side=IMAGE_MAX_SIDE, min_bytes=None, pool=None):
+    """
+    Decode uploaded image bytes into an RGB image, downscaled to max_side if set
+
+    Args:
+        data: Encoded image (PNG, JPEG, ...)
+        max_side: Longest side of the result (0 keeps the original size)
+        min_bytes: Smaller uploads are decoded inline (default CPU_POOL_MIN_BYTES)
+        pool: Process pool (default: the shared CPU pool)
+
+    Returns:
+        PIL.Image.Image: Decoded image
+
+    Raises:
+        Exception: The data is not a readable image
+    """
+    # Only the header is parsed here
+    with Image.open(io.BytesIO(data)) as probe:
+        size = target_size(probe.size, max_side)
+    min_bytes = CPU_POOL_MIN_BYTES if min_bytes is None else min_bytes
+    if CPU_POOL_WORKERS < 1 or len(data) < min_bytes:
+        DECODES.inc(where="inline")
+        return _decode(data, size)
+
+    length = size[0] * size[1] * 3
+    source = shared_memory.SharedMemory(create=True, size=len(data))
+    target = shared_memory.SharedMemory(create=True, size=length)
+    try:
+        source.buf[:len(data)] = data
+        try:
+            (pool or get_cpu_pool()).submit(decode_into_shared, source.name, len(data), target.name, size).result()
+        except BrokenProcessPool as e:
+            print(f"ERROR: CPU pool failed, decoding inline: {e}")
+            shutdown_cpu_pool()
+            DECODES.inc(where="inline")
+            return _decode(data, size)
+        DECODES.inc(where="pool")
+        # frombytes copies, so the block can be released right away
+        return Image.frombytes("RGB", size, target.buf[:length])
+    finally:
+        for block in (source, target):
+            block.close()
+            block.unlink()
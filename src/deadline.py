@@ -0,0 +1,128 @@
+# REQUEST DEADLINES
+# A deadline is set when a request arrives and handed down through every
+# stage (analysis, speech). Each provider call gets the time the request has
+# left, capped at PROVIDER_TIMEOUT_SECONDS, so one hung upstream connection
+# cannot hold a worker thread forever. Stages that run out of time are
+# recorded on the deadline so the endpoint can return what it has (text
+# without audio) and say what was cut.
+#
+# A deadline is also cancelled when the client disconnects: it then counts
+# as expired, so every stage stops at its next check instead of finishing
+# work nobody will read. Stages skipped this way count as reclaimed work.
+
+import asyncio
+import os
+import threading
+import time
+
+from src import metrics
+
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "90"))
+# Longest any single provider call may take, with or without a request deadline
+PROVIDER_TIMEOUT_SECONDS = float(os.environ.get("PROVIDER_TIMEOUT_SECONDS", "45"))
+# How often a waiting request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.environ.get("DISCONNECT_POLL_SECONDS", "0.5"))
+
+DEADLINE_EXCEEDED = metrics.counter("deadline_exceeded_total", "Request stages cut short by their deadline")
+WORK_RECLAIMED = metrics.counter("reclaimed_work_total", "Request stages skipped because the client disconnected")
+
+
+class DeadlineExceeded(TimeoutError):
+    """A stage ran out of time"""
+
+    def __init__(self, stage):
+        super().__init__(f"{stage} exceeded the request deadline")
+        self.stage = stage
+
+
+class Deadline:
+    """Point in time by which a request must be answered"""
+
+    def __init__(self, seconds=REQUEST_DEADLINE_SECONDS, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = clock() + seconds
+        # Stages that ran out of time, in order
+        self.timed_out = []
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cancel(self):
+        """Give up on the request (its client went away); stages stop at their next check"""
+        self.cancelled = True
+
+    def record(self, stage):
+        """Note that a stage was cut short"""
+        with self._lock:
+            if stage in self.timed_out:
+                return
+            self.timed_out.append(stage)
+        if self.cancelled:
+            WORK_RECLAIMED.inc(stage=stage)
+        else:
+            DEADLINE_EXCEEDED.inc(stage=stage)
+
+    def check(self, stage):
+        """Raise DeadlineExceeded if no time is left for the stage"""
+        if self.expired():
+            self.record(stage)
+            raise DeadlineExceeded(stage)
+
+    def timeout(self, stage, cap=PROVIDER_TIMEOUT_SECONDS):
+        """Timeout for the stage's next call: the time left, at most cap"""
+        self.check(stage)
+        remaining = self.remaining()
+        return min(remaining, cap) if cap else remaining
+
+
+def stage_timeout(deadline, stage, cap=PROVIDER_TIMEOUT_SECONDS):
+    """Timeout for one provider call; the default cap when the caller has no deadline"""
+    return deadline.timeout(stage, cap) if deadline is not None else cap
+
+
+async def watch_disconnect(is_disconnected, deadline=None, poll_seconds=DISCONNECT_POLL_SECONDS):
+    """
+    Return once the client has disconnected, cancelling the deadline
+
+    Args:
+        is_disconnected: Async callable, e.g. Request.is_disconnected
+        deadline: Deadline to cancel, if any
+        poll_seconds: Seconds between checks
+    """
+    while not await is_disconnected():
+        await asyncio.sleep(poll_seconds)
+    if deadline is not None:
+        deadline.cancel()
+
+
+def call_with_timeout(fn, timeout, *args, **kwargs):
+    """
+    Run a blocking call that takes no timeout of its own, giving up after timeout seconds
+
+    The call keeps running on a daemon thread if it hangs; the caller is
+    released and gets TimeoutError.
+    """
+    outcome = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome['result'] = fn(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True, name="timed-call").start()
+    if not done.wait(timeout):
+        raise TimeoutError(f"{getattr(fn, '__name__', 'call')} did not finish within {timeout:.1f}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
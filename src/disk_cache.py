@@ -0,0 +1,87 @@
+# SIZE-CAPPED DISK CACHE
+# Files stored under a directory by key (fanned out by the key's first two
+# characters) with a cap on their total size. Reads refresh a file's mtime,
+# so eviction removes the least recently used files first. Several worker
+# processes may share one directory; writes are atomic renames.
+
+import os
+import threading
+from pathlib import Path
+
+
+class DiskLRU:
+    """Directory of cached files with a total size cap (least recently used evicted first)"""
+
+    def __init__(self, root, suffix, max_bytes):
+        """
+        Args:
+            root: Cache directory
+            suffix: File extension of the entries (e.g. ".mp3")
+            max_bytes: Total size above which old entries are evicted
+        """
+        self.root = Path(root)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def path(self, key):
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def read(self, key):
+        """Return the entry's bytes (marking it as recently used), or None"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def write(self, key, data):
+        """Store an entry, evicting the oldest entries if the cache is over its cap"""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self.scan()[1]
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def scan(self):
+        """
+        Returns:
+            tuple: ([(mtime, size, path)], total bytes) of the entries on disk
+        """
+        files = []
+        total = 0
+        for path in self.root.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return files, total
+
+    def _evict(self):
+        # Rescan so that entries written by other workers are accounted for
+        files, total = self.scan()
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._size = total
@@ -8,9 +8,27 @@ import asyncio
 import edge_tts
 import subprocess
 import platform
+import threading
+import time
 
 load_dotenv()
 
+# Default number of concurrent synthesis requests for batch generation
+DEFAULT_BATCH_CONCURRENCY = int(os.environ.get("TTS_BATCH_CONCURRENCY", "8"))
+
+# Packed batch mode: maximum UTF-8 bytes of text per Edge TTS request. edge-tts
+# splits longer input into several service requests with estimated offsets, so
+# packs stay below its 4096-byte limit to keep word-boundary offsets exact.
+PACKED_MAX_BYTES = 3500
+
+# Edge TTS reports word-boundary offsets in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
+
+# Persistent event loop shared by synchronous callers (see run_coroutine_sync)
+_background_loop = None
+_background_thread = None
+_background_lock = threading.Lock()
+
 # Voice mappings for different languages and genders
 VOICE_MAP = {
     'English': {
@@ -33,6 +51,10 @@ VOICE_MAP = {
     }
 }
 
+def get_voice(language='English', gender='Male'):
+    """Get the Edge TTS voice name for a language and gender"""
+    return VOICE_MAP.get(language, VOICE_MAP['English']).get(gender, VOICE_MAP['English']['Male'])
+
 async def text_to_speech_advanced(input_text, output_filepath, language='English', gender='Male', 
                                   rate='+0%', volume='+0%', pitch='+0Hz'):
     """
@@ -52,7 +74,7 @@ async def text_to_speech_advanced(input_text, output_filepath, language='English
     """
     try:
         # Get voice for language and gender
-        voice = VOICE_MAP.get(language, VOICE_MAP['English']).get(gender, VOICE_MAP['English']['Male'])
+        voice = get_voice(language, gender)
         
         # Create Edge TTS communicate object with customization
         communicate = edge_tts.Communicate(
@@ -140,29 +162,349 @@ def generate_medical_speech(medical_text, output_file, language='English', gende
         **params
     ))
 
-def batch_generate_speech(text_dict, output_dir='audio_outputs', language='English', gender='Male'):
+# MPEG audio frame tables: bitrates (kbps) by [version][layer], sample rates by version
+_MPEG_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MPEG_BITRATES[(2, 3)] = _MPEG_BITRATES[(2, 2)]
+_MPEG_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+def iter_mp3_frames(data):
     """
-    Generate multiple audio files from dictionary
+    Iterate over the MPEG audio frames in an MP3 byte string
+    
+    Yields:
+        tuple: (start, end, duration_seconds) for each frame
+    """
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # Skip ID3v2 tag (synchsafe size)
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size
+    
+    while pos + 4 <= len(data):
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+            pos += 1  # resync
+            continue
+        version = {3: 1, 2: 2, 0: 2.5}.get((b1 >> 3) & 0x03)
+        layer = {3: 1, 2: 2, 1: 3}.get((b1 >> 1) & 0x03)
+        bitrate_index = (b2 >> 4) & 0x0F
+        rate_index = (b2 >> 2) & 0x03
+        if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1
+            continue
+        bitrate = _MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+        sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+        padding = (b2 >> 1) & 0x01
+        if layer == 1:
+            samples = 384
+            length = (12 * bitrate // sample_rate + padding) * 4
+        else:
+            samples = 1152 if (layer == 2 or version == 1) else 576
+            length = samples // 8 * bitrate // sample_rate + padding
+        if length <= 0:
+            pos += 1
+            continue
+        yield pos, pos + length, samples / sample_rate
+        pos += length
+
+def split_mp3_at_times(data, cut_times):
+    """
+    Split an MP3 stream at the given times, on frame boundaries
+    
+    Args:
+        data: MP3 bytes
+        cut_times: Ascending cut points in seconds
+    
+    Returns:
+        list: len(cut_times) + 1 MP3 byte strings
+    """
+    parts = []
+    cuts = list(cut_times)
+    part_start = 0
+    elapsed = 0.0
+    for start, end, duration in iter_mp3_frames(data):
+        if cuts and elapsed + duration / 2 >= cuts[0]:
+            parts.append(data[part_start:start])
+            part_start = start
+            cuts.pop(0)
+        elapsed += duration
+    parts.append(data[part_start:])
+    parts.extend(b"" for _ in cuts)
+    return parts
+
+class PackingError(Exception):
+    """Raised when packed audio cannot be mapped back to individual texts"""
+
+def _join_for_packing(texts):
+    """Join texts into one utterance, returning it with each text's character span"""
+    pieces = []
+    spans = []
+    pos = 0
+    for text in texts:
+        piece = " ".join(str(text).split())
+        if piece and piece[-1] not in ".!?।":
+            piece += "."  # force a sentence break between items
+        spans.append((pos, pos + len(piece)))
+        pieces.append(piece)
+        pos += len(piece) + 1
+    return "\n".join(pieces), spans
+
+def _item_cut_times(joined, spans, boundaries):
+    """
+    Work out where one item's audio ends and the next begins
+    
+    Args:
+        joined: Packed text
+        spans: Character span of each item in joined
+        boundaries: [(offset_ticks, duration_ticks, word_text), ...] from Edge TTS
+    
+    Returns:
+        list: Cut times in seconds between consecutive items
+    """
+    first_start = [None] * len(spans)
+    last_end = [None] * len(spans)
+    cursor = 0
+    item = 0
+    for offset, duration, word in boundaries:
+        found = joined.find(word, cursor) if word else -1
+        if found >= 0:
+            cursor = found + len(word)
+            position = found
+        else:
+            position = cursor  # spoken form differs from text (e.g. "mg"); keep current item
+        while item + 1 < len(spans) and position >= spans[item + 1][0]:
+            item += 1
+        if first_start[item] is None:
+            first_start[item] = offset
+        last_end[item] = offset + duration
+    
+    if any(value is None for value in first_start):
+        raise PackingError("word boundaries missing for some items")
+    
+    return [
+        (last_end[i] + first_start[i + 1]) / 2 / TICKS_PER_SECOND
+        for i in range(len(spans) - 1)
+    ]
+
+async def synthesize_packed(texts, language='English', gender='Male', rate='+0%', volume='+0%', pitch='+0Hz'):
+    """
+    Synthesize several short texts in a single Edge TTS session
+    
+    Items are spoken as consecutive sentences of one utterance and the audio is
+    split back into per-item MP3s at the word-boundary offsets reported by the
+    service. (edge-tts escapes all input, so SSML bookmarks cannot be sent.)
+    
+    Args:
+        texts: List of short texts for the same voice
+        language: Language selection
+        gender: Voice gender
+    
+    Returns:
+        list: MP3 bytes for each text, in order
+    
+    Raises:
+        PackingError: If the audio cannot be mapped back to the texts
+    """
+    joined, spans = _join_for_packing(texts)
+    communicate = edge_tts.Communicate(
+        joined,
+        get_voice(language, gender),
+        rate=rate,
+        volume=volume,
+        pitch=pitch,
+        boundary="WordBoundary"
+    )
+    
+    audio = bytearray()
+    boundaries = []
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio.extend(chunk["data"])
+        elif chunk["type"] == "WordBoundary":
+            boundaries.append((chunk["offset"], chunk["duration"], chunk["text"]))
+    
+    parts = split_mp3_at_times(bytes(audio), _item_cut_times(joined, spans, boundaries))
+    if not all(parts):
+        raise PackingError("empty audio segment after splitting")
+    return parts
+
+def _make_packs(items, max_bytes=PACKED_MAX_BYTES):
+    """Group (filename, text) items into consecutive packs under max_bytes of text"""
+    packs = []
+    current = []
+    size = 0
+    for filename, text in items:
+        length = len(str(text).encode("utf-8")) + 2
+        if current and size + length > max_bytes:
+            packs.append(current)
+            current, size = [], 0
+        current.append((filename, text))
+        size += length
+    if current:
+        packs.append(current)
+    return packs
+
+def _get_background_loop():
+    """Return the shared background event loop, starting its thread on first use"""
+    global _background_loop, _background_thread
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="doctor-voice-loop", daemon=True)
+            thread.start()
+            _background_loop = loop
+            _background_thread = thread
+        return _background_loop
+
+def run_coroutine_sync(coro, timeout=None):
+    """
+    Run a coroutine on the persistent background loop and wait for its result
+    
+    Safe to call from plain synchronous code and from threads that already run
+    their own event loop (e.g. FastAPI handlers), unlike asyncio.run().
+    
+    Args:
+        coro: Coroutine to execute
+        timeout: Optional timeout in seconds
+    
+    Returns:
+        The coroutine result
+    """
+    loop = _get_background_loop()
+    if threading.current_thread() is _background_thread:
+        coro.close()
+        raise RuntimeError("run_coroutine_sync() cannot be called from the background loop itself")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result(timeout)
+
+async def batch_generate_speech_async(text_dict, output_dir='audio_outputs', language='English', gender='Male',
+                                      concurrency=DEFAULT_BATCH_CONCURRENCY, progress_callback=None, packed=False):
+    """
+    Generate multiple audio files concurrently on a single event loop
     
     Args:
         text_dict: Dictionary with {filename: text_content}
         output_dir: Output directory
         language: Language selection
         gender: Voice gender
+        concurrency: Maximum number of simultaneous synthesis requests
+        progress_callback: Optional callable(completed, total, result) invoked as items finish
+        packed: Pack many short texts into one Edge TTS request (see synthesize_packed)
     
     Returns:
-        list: Successfully created files
+        list: One result dict per item, in input order, with keys
+              'filename', 'path', 'success', 'elapsed' (seconds) and 'error'
     """
     os.makedirs(output_dir, exist_ok=True)
-    created_files = []
-    
-    for filename, text in text_dict.items():
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    total = len(text_dict)
+    completed = 0
+    
+    def report(result):
+        nonlocal completed
+        completed += 1
+        if progress_callback is not None:
+            try:
+                progress_callback(completed, total, result)
+            except Exception as e:
+                print(f"✗ Progress callback error: {e}")
+        return result
+    
+    async def synthesize_one(filename, text):
         filepath = os.path.join(output_dir, filename)
-        success = asyncio.run(text_to_speech_advanced(text, filepath, language, gender))
-        if success:
-            created_files.append(filepath)
+        started = time.perf_counter()
+        error = None
+        try:
+            success = await text_to_speech_advanced(text, filepath, language, gender)
+            if not success:
+                error = "synthesis failed"
+        except Exception as e:
+            success = False
+            error = str(e)
+        return {
+            'filename': filename,
+            'path': filepath if success else None,
+            'success': success,
+            'elapsed': time.perf_counter() - started,
+            'error': error
+        }
+    
+    async def synthesize(filename, text):
+        async with semaphore:
+            return [report(await synthesize_one(filename, text))]
+    
+    async def synthesize_pack(pack):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                parts = await synthesize_packed([text for _, text in pack], language, gender)
+            except Exception as e:
+                # Fall back to one request per item for this pack
+                print(f"✗ Packed synthesis failed ({e}), retrying {len(pack)} items individually")
+                return [report(await synthesize_one(filename, text)) for filename, text in pack]
+            elapsed = time.perf_counter() - started
+            results = []
+            for (filename, _), audio in zip(pack, parts):
+                filepath = os.path.join(output_dir, filename)
+                with open(filepath, 'wb') as f:
+                    f.write(audio)
+                results.append(report({
+                    'filename': filename,
+                    'path': filepath,
+                    'success': True,
+                    'elapsed': elapsed,
+                    'error': None
+                }))
+            return results
+    
+    if packed:
+        tasks = [synthesize_pack(pack) for pack in _make_packs(text_dict.items())]
+    else:
+        tasks = [synthesize(name, text) for name, text in text_dict.items()]
+    
+    return [result for group in await asyncio.gather(*tasks) for result in group]
+
+def batch_generate_speech(text_dict, output_dir='audio_outputs', language='English', gender='Male',
+                          concurrency=DEFAULT_BATCH_CONCURRENCY, progress_callback=None, return_results=False,
+                          packed=False):
+    """
+    Generate multiple audio files from dictionary
+    
+    The whole batch runs concurrently on the persistent background loop, so this
+    also works when called from inside a running event loop.
+    
+    Args:
+        text_dict: Dictionary with {filename: text_content}
+        output_dir: Output directory
+        language: Language selection
+        gender: Voice gender
+        concurrency: Maximum number of simultaneous synthesis requests
+        progress_callback: Optional callable(completed, total, result)
+        return_results: Return per-item result dicts instead of file paths
+        packed: Pack many short texts into one Edge TTS request
+    
+    Returns:
+        list: Successfully created files (or per-item results if return_results)
+    """
+    results = run_coroutine_sync(batch_generate_speech_async(
+        text_dict,
+        output_dir=output_dir,
+        language=language,
+        gender=gender,
+        concurrency=concurrency,
+        progress_callback=progress_callback,
+        packed=packed
+    ))
     
-    return created_files
+    if return_results:
+        return results
+    return [result['path'] for result in results if result['success']]
 
 if __name__ == "__main__":
     print("=" * 80)
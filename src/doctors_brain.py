@@ -1,14 +1,10 @@
 # ADVANCED MEDICAL IMAGE ANALYSIS SYSTEM
 # Supports: Multiple languages, Comprehensive analysis, Professional medical advice
 
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai  # type: ignore
 from PIL import Image  # type: ignore
 
-load_dotenv()
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)  # type: ignore
+from src import providers
+from src.deadline import PROVIDER_TIMEOUT_SECONDS
 
 def analyze_medical_image_advanced(image_path, language='English', analysis_depth='comprehensive'):
     """
@@ -25,7 +21,8 @@ def analyze_medical_image_advanced(image_path, language='English', analysis_dept
     
     try:
         image = Image.open(image_path)
-        model = genai.GenerativeModel('gemini-flash-lite-latest')  # type: ignore
+        # Gemini is configured from GEMINI_API_KEY on first use
+        model = providers.get("genai").GenerativeModel('gemini-flash-lite-latest')  # type: ignore
         
         # Language instructions
         lang_map = {
@@ -100,7 +97,8 @@ Quick analysis: symptoms, condition, basic treatment, urgency.
                 "temperature": 0.5,
                 "top_p": 0.85,
                 "max_output_tokens": 2048,
-            }
+            },
+            request_options={"timeout": PROVIDER_TIMEOUT_SECONDS}
         )
         
         # Clean output
@@ -112,6 +110,8 @@ Quick analysis: symptoms, condition, basic treatment, urgency.
 
 # Main execution
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     image_path = "images.jpeg"
     
     print("=" * 80)
@@ -0,0 +1,100 @@
+# STREAMING DOCUMENT TEXT EXTRACTION
+# Yields PDF pages lazily and stops once a character budget is reached, so a
+# caller that only needs the first few thousand characters never parses the
+# rest. Large PDFs are parsed in page ranges on the shared CPU pool
+# (src/cpu_pool.py; PyPDF2 is pure Python and single-threaded), with results
+# still yielded in page order.
+
+import os
+from collections import deque
+
+from src import cpu_pool
+from src import providers
+
+# PDFs with at least this many pages, or this large, are parsed on the process pool
+PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "64"))
+PARALLEL_MIN_BYTES = int(os.environ.get("PDF_PARALLEL_MIN_BYTES", str(4 * 1024 * 1024)))
+PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "16"))
+
+
+def count_pdf_pages(file_path):
+    with open(file_path, 'rb') as f:
+        return len(providers.get("PyPDF2").PdfReader(f).pages)
+
+
+def extract_pdf_range(file_path, start, stop):
+    """Extract the text of pages [start, stop) (runs in pool workers)"""
+    with open(file_path, 'rb') as f:
+        reader = providers.get("PyPDF2").PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, min(stop, len(reader.pages)))]
+
+
+def _iter_sequential(file_path):
+    with open(file_path, 'rb') as f:
+        reader = providers.get("PyPDF2").PdfReader(f)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+def _iter_parallel(file_path, page_count, pool, workers):
+    ranges = deque((start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK))
+    pending = deque()
+    try:
+        while ranges or pending:
+            # Keep only a few ranges in flight so an early stop wastes little work
+            while ranges and len(pending) < workers * 2:
+                start, stop = ranges.popleft()
+                pending.append(pool.submit(extract_pdf_range, file_path, start, stop))
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf_pages(file_path, char_budget=None, parallel=None):
+    """
+    Yield the text of each PDF page in order
+
+    Args:
+        file_path: PDF path
+        char_budget: Stop once this many characters have been yielded (the
+                     last page is cut to fit); None reads the whole document
+        parallel: Parse page ranges on the process pool; None decides by page
+                  count and file size
+
+    Yields:
+        str: Page text
+    """
+    if char_budget is not None and char_budget <= 0:
+        return
+    page_count = None
+    workers = cpu_pool.CPU_POOL_WORKERS
+    if parallel is None and workers > 1:
+        if os.path.getsize(file_path) >= PARALLEL_MIN_BYTES:
+            # Large few-page scans would otherwise hold this worker's GIL for seconds
+            parallel = True
+        else:
+            page_count = count_pdf_pages(file_path)
+            parallel = page_count >= PARALLEL_MIN_PAGES
+    if parallel:
+        page_count = page_count if page_count is not None else count_pdf_pages(file_path)
+        pages = _iter_parallel(file_path, page_count, cpu_pool.get_cpu_pool(), max(1, workers))
+    else:
+        pages = _iter_sequential(file_path)
+
+    remaining = char_budget
+    try:
+        for text in pages:
+            if remaining is not None:
+                text = text[:remaining]
+                remaining -= len(text)
+            yield text
+            if remaining is not None and remaining <= 0:
+                break
+    finally:
+        pages.close()
+
+
+def extract_pdf_text(file_path, char_budget=None, parallel=None):
+    """Return the text of a PDF (pages separated by newlines), up to an optional character budget"""
+    return "\n".join(iter_pdf_pages(file_path, char_budget, parallel)).strip()
@@ -0,0 +1,333 @@
+# LAZY PER-PAGE DOCUMENT AUDIO
+# Long documents are split into page/chapter segments and returned as a
+# playlist manifest straight away. Each segment is synthesized when it is
+# first requested and the next one is prefetched in the background, so the
+# first audio arrives in constant time whatever the document length.
+# Manifests live in a directory shared by all workers on the host and, with
+# a shared storage backend (src/blob_storage.py), are written through to it
+# so a playlist created on one instance can be played from any other. Which
+# segments are already synthesized is tracked per host; another instance
+# re-renders a segment through the shared sentence cache.
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from src import metrics
+from src.blob_storage import get_blob_storage
+
+PLAYLIST_DIR = Path(os.environ.get("PLAYLIST_DIR", Path(tempfile.gettempdir()) / "ai_doctor_playlists"))
+PLAYLIST_TTL_SECONDS = int(os.environ.get("PLAYLIST_TTL_SECONDS", str(24 * 3600)))
+SEGMENT_MAX_CHARS = int(os.environ.get("PLAYLIST_SEGMENT_MAX_CHARS", "1500"))
+# The first segment is kept short so playback starts quickly
+FIRST_SEGMENT_MAX_CHARS = int(os.environ.get("PLAYLIST_FIRST_SEGMENT_MAX_CHARS", "400"))
+PREFETCH_WORKERS = int(os.environ.get("PLAYLIST_PREFETCH_WORKERS", "1"))
+
+MANIFEST_VERSION = 1
+
+_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?।])\s+')
+
+SEGMENTS_RENDERED = metrics.counter("playlist_segments_rendered_total", "Document playlist segments synthesized")
+SEGMENTS_PREFETCHED = metrics.counter("playlist_segments_prefetched_total", "Document playlist segments synthesized ahead of the listener")
+
+
+def _pieces(text, max_chars):
+    """Split text into pieces of at most max_chars at paragraph, sentence or word boundaries"""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_END_RE.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                yield sentence[:cut].strip()
+                sentence = sentence[cut:].strip()
+            if sentence:
+                yield sentence
+
+
+def split_segments(sections, max_chars=SEGMENT_MAX_CHARS, first_max_chars=FIRST_SEGMENT_MAX_CHARS):
+    """
+    Split document sections into playlist segments
+
+    Args:
+        sections: List of (title, text) pairs (pages or chapters)
+        max_chars: Maximum characters per segment
+        first_max_chars: Maximum characters of the first segment
+
+    Returns:
+        list: Segment dicts with 'title' and 'text'; a section never shares a segment with another
+    """
+    segments = []
+    for title, text in sections:
+        current = []
+        size = 0
+        for piece in _pieces(text or "", max_chars):
+            limit = first_max_chars if not segments else max_chars
+            if current and size + len(piece) + 1 > limit:
+                segments.append({'title': title, 'text': "\n\n".join(current)})
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+        if current:
+            segments.append({'title': title, 'text': "\n\n".join(current)})
+    return segments
+
+
+class PlaylistStore:
+    """Playlist manifests and per-segment audio ids in a shared directory"""
+
+    def __init__(self, root=PLAYLIST_DIR, ttl_seconds=PLAYLIST_TTL_SECONDS, executor=None, shared=None):
+        """
+        Args:
+            root: Local manifest directory
+            ttl_seconds: Playlists unused for this long are removed
+            executor: Pool for prefetching segments
+            shared: Optional blob storage that other instances read manifests from
+        """
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.executor = executor or ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="playlist-prefetch")
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _manifest_path(self, playlist_id):
+        return self.root / f"{playlist_id}.json"
+
+    def _audio_ref_path(self, playlist_id, index):
+        return self.root / f"{playlist_id}.{index}.audio"
+
+    @staticmethod
+    def _write_atomic(path, content):
+        tmp_path = path.with_name(f".tmp-{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    # ---- manifests -----------------------------------------------------
+
+    def create(self, sections, language, gender, title=""):
+        """
+        Create (or reuse) the playlist for a document
+
+        Args:
+            sections: List of (title, text) pairs
+            language: Speech language
+            gender: Voice gender
+            title: Document title shown to the listener
+
+        Returns:
+            dict: Manifest
+        """
+        segments = split_segments(sections)
+        digest = hashlib.sha256(json.dumps(
+            [MANIFEST_VERSION, language, gender, [s['text'] for s in segments]], ensure_ascii=False
+        ).encode('utf-8')).hexdigest()
+
+        existing = self.load(digest)
+        if existing is not None:
+            os.utime(self._manifest_path(digest))
+            return existing
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'id': digest,
+            'title': title,
+            'language': language,
+            'gender': gender,
+            'created': time.time(),
+            'segments': [
+                {'index': i, 'title': s['title'], 'chars': len(s['text']), 'text': s['text']}
+                for i, s in enumerate(segments)
+            ],
+        }
+        document = json.dumps(manifest, ensure_ascii=False)
+        self._write_atomic(self._manifest_path(digest), document)
+        if self.shared is not None:
+            try:
+                self.shared.put(self.shared_key(digest), document.encode('utf-8'), "application/json")
+            except Exception as e:
+                print(f"ERROR: Could not upload playlist to shared storage: {e}")
+        self.sweep()
+        return manifest
+
+    @staticmethod
+    def shared_key(playlist_id):
+        return f"playlists/{playlist_id}.json"
+
+    def load(self, playlist_id):
+        """Return a manifest, or None if unknown or expired"""
+        if not playlist_id or not _ID_RE.match(playlist_id):
+            return None
+        try:
+            with open(self._manifest_path(playlist_id), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return self._load_shared(playlist_id)
+        return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+    def _load_shared(self, playlist_id):
+        """Read a manifest created by another instance and keep a local copy"""
+        if self.shared is None:
+            return None
+        try:
+            blob = self.shared.get(self.shared_key(playlist_id))
+            if blob is None:
+                return None
+            manifest = json.loads(blob)
+        except Exception as e:
+            print(f"ERROR: Could not read playlist from shared storage: {e}")
+            return None
+        if manifest.get('version') != MANIFEST_VERSION or manifest['created'] < time.time() - self.ttl_seconds:
+            return None
+        self._write_atomic(self._manifest_path(playlist_id), json.dumps(manifest, ensure_ascii=False))
+        return manifest
+
+    def sweep(self, now=None):
+        """Remove playlists (and their audio references) not used within the TTL"""
+        now = time.time() if now is None else now
+        removed = 0
+        for path in self.root.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime <= self.ttl_seconds:
+                    continue
+                playlist_id = path.stem
+                path.unlink()
+                for ref in self.root.glob(f"{playlist_id}.*.audio"):
+                    ref.unlink()
+                removed += 1
+            except OSError:
+                pass  # removed by another worker
+        return removed
+
+    # ---- segment audio -------------------------------------------------
+
+    def cached_audio(self, playlist_id, index, audio_store):
+        """Return (audio_id, path) for an already synthesized segment, or (None, None)"""
+        try:
+            audio_id = self._audio_ref_path(playlist_id, index).read_text(encoding='utf-8').strip()
+        except OSError:
+            return None, None
+        path = audio_store.path(audio_id)
+        return (audio_id, path) if path is not None else (None, None)
+
+    def _render(self, manifest, index, render, audio_store):
+        playlist_id = manifest['id']
+        audio_id, path = self.cached_audio(playlist_id, index, audio_store)
+        if audio_id:
+            return audio_id, path
+
+        key = (playlist_id, index)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            segment = manifest['segments'][index]
+            audio_id = render(segment['text'], manifest['language'], manifest['gender'])
+            path = audio_store.path(audio_id) if audio_id else None
+            if path is not None:
+                self._write_atomic(self._audio_ref_path(playlist_id, index), audio_id)
+                SEGMENTS_RENDERED.inc()
+            future.set_result((audio_id, path) if path is not None else (None, None))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    def prefetch(self, manifest, index, render, audio_store):
+        """Synthesize a segment in the background if it is not ready yet"""
+        if index >= len(manifest['segments']):
+            return None
+        if self.cached_audio(manifest['id'], index, audio_store)[0]:
+            return None
+        with self._lock:
+            if (manifest['id'], index) in self._inflight:
+                return None
+
+        def run():
+            try:
+                if self._render(manifest, index, render, audio_store)[0]:
+                    SEGMENTS_PREFETCHED.inc()
+            except Exception as e:
+                print(f"ERROR: Prefetching playlist segment {index} failed: {e}")
+
+        return self.executor.submit(run)
+
+    def segment_audio(self, playlist_id, index, render, audio_store, prefetch=True):
+        """
+        Return the audio of one segment, synthesizing it on first use
+
+        Args:
+            playlist_id: Playlist id
+            index: Segment index
+            render: Callable(text, language, gender) -> audio id in the audio store
+            audio_store: AudioStore holding the segment audio
+            prefetch: Start synthesizing the following segment in the background
+
+        Returns:
+            tuple: (audio_id, path), or (None, None) for an unknown segment or failed synthesis
+        """
+        manifest = self.load(playlist_id)
+        if manifest is None or not 0 <= index < len(manifest['segments']):
+            return None, None
+        os.utime(self._manifest_path(playlist_id))
+
+        result = self._render(manifest, index, render, audio_store)
+        if prefetch:
+            self.prefetch(manifest, index + 1, render, audio_store)
+        return result
+
+
+def public_manifest(manifest, segment_url):
+    """
+    Manifest as returned to clients (segment text omitted)
+
+    Args:
+        manifest: Stored manifest
+        segment_url: Callable(playlist_id, index) -> URL of the segment audio
+    """
+    return {
+        'playlist_id': manifest['id'],
+        'title': manifest.get('title', ""),
+        'language': manifest['language'],
+        'gender': manifest['gender'],
+        'total_chars': sum(s['chars'] for s in manifest['segments']),
+        'segments': [
+            {'index': s['index'], 'title': s['title'], 'chars': s['chars'], 'url': segment_url(manifest['id'], s['index'])}
+            for s in manifest['segments']
+        ],
+    }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_playlist_store():
+    """Return the process-wide playlist store"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PlaylistStore(shared=get_blob_storage())
+        return _default_store
@@ -0,0 +1,233 @@
+# MAP-REDUCE DOCUMENT SUMMARIES
+# Long documents are split into chunks that are summarized concurrently by
+# the configured LLM (map), then the partial notes are merged into one
+# patient-friendly script in the chosen language (reduce); notes too long
+# for one prompt are first condensed in groups, still as English notes.
+# Chunk notes are
+# cached on disk by content, so re-reading a document (or reading it in
+# another language) only repeats the final merge. Wall time grows with the
+# latency of one chunk, not with the number of chunks.
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src import metrics
+from src.document_playlist import split_segments
+
+SUMMARY_CHUNK_CHARS = int(os.environ.get("SUMMARY_CHUNK_CHARS", "6000"))
+# Concurrent LLM calls per process (shared by all requests to respect rate limits)
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_MAX_WORDS = int(os.environ.get("SUMMARY_MAX_WORDS", "350"))
+SUMMARY_CACHE_DIR = Path(os.environ.get("SUMMARY_CACHE_DIR", Path(tempfile.gettempdir()) / "ai_doctor_summary_cache"))
+
+# Bump when the prompts change so cached chunk notes are not reused
+SUMMARY_VERSION = "1"
+
+# Partial notes longer than this are merged in groups first
+_NOTE_GROUP_CHARS = SUMMARY_CHUNK_CHARS
+
+CHUNK_CACHE_HITS = metrics.counter("summary_chunk_cache_hits_total", "Chunk notes served from the cache")
+LLM_CALLS = metrics.counter("summary_llm_calls_total", "LLM calls made for document summaries")
+LLM_FAILURES = metrics.counter("summary_llm_failures_total", "Failed LLM calls for document summaries")
+SUMMARY_SECONDS = metrics.histogram("summary_seconds", "Wall time of document summaries")
+
+MAP_PROMPT = """You are reading part {index} of {total} of a patient's medical document{title}.
+Write short plain-text notes (no markdown, no tables, under 150 words) covering only what this part says about:
+diagnoses, medicines with dose and timing, test results outside the normal range, procedures done,
+follow-up instructions and warning signs. Keep numbers and medicine names exactly as written.
+If this part has none of these, reply with "No clinical details."
+
+Document part:
+{text}"""
+
+REDUCE_PROMPT = """{language_instruction}
+
+Below are notes taken from consecutive parts of a patient's medical document{title}.
+Merge them into one explanation to be read aloud to the patient: simple words, short sentences,
+no markdown, no tables, under {max_words} words. Start with the main diagnosis, then the medicines
+and how to take them, then follow-up and warning signs. Do not repeat details.
+
+Notes:
+{notes}"""
+
+GROUP_PROMPT = """Below are notes taken from consecutive parts of a patient's medical document{title}.
+Combine them into one set of short plain-text notes in English (no markdown, no tables, under 250 words)
+covering diagnoses, medicines with dose and timing, abnormal test results, procedures, follow-up
+instructions and warning signs. Keep numbers and medicine names exactly as written. Do not repeat details.
+
+Notes:
+{notes}"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_summary_executor():
+    """Return the process-wide pool that bounds concurrent summary calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY, thread_name_prefix="summary")
+        return _executor
+
+
+def chunk_sections(sections, max_chars=SUMMARY_CHUNK_CHARS):
+    """Split (title, text) sections into chunks of at most max_chars, at paragraph and sentence boundaries"""
+    # Short pages are packed together; page boundaries do not matter to the summary
+    text = "\n\n".join(section_text for _, section_text in sections if section_text.strip())
+    return [segment['text'] for segment in split_segments([("", text)], max_chars=max_chars, first_max_chars=max_chars)]
+
+
+class SummaryCache:
+    """Disk cache of chunk notes keyed by model and chunk text"""
+
+    def __init__(self, root=SUMMARY_CACHE_DIR):
+        self.root = Path(root)
+
+    def _path(self, model_name, text):
+        key = hashlib.sha256(f"{SUMMARY_VERSION}\0{model_name}\0{text}".encode('utf-8')).hexdigest()
+        return self.root / key[:2] / f"{key}.txt"
+
+    def get(self, model_name, text):
+        try:
+            return self._path(model_name, text).read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def put(self, model_name, text, notes):
+        path = self._path(model_name, text)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(notes, encoding='utf-8')
+        os.replace(tmp_path, path)
+
+
+class DocumentSummarizer:
+    """Summarize long documents with bounded-concurrency map-reduce"""
+
+    def __init__(self, generate, model_name, language_instruction=None, executor=None, cache=None,
+                 chunk_chars=SUMMARY_CHUNK_CHARS, max_words=SUMMARY_MAX_WORDS):
+        """
+        Args:
+            generate: Callable(prompt) -> text; the LLM provider
+            model_name: Provider/model name (part of the cache key)
+            language_instruction: Callable(language) -> instruction line for the final script
+            executor: Pool bounding concurrent calls (default: shared summary pool)
+            cache: SummaryCache for chunk notes (None disables caching)
+            chunk_chars: Maximum characters per chunk
+            max_words: Length limit of the final script
+        """
+        self.generate = generate
+        self.model_name = model_name
+        self.language_instruction = language_instruction or (lambda language: f"Respond in {language}.")
+        self.executor = executor
+        self.cache = cache
+        self.chunk_chars = chunk_chars
+        self.max_words = max_words
+
+    def _call(self, prompt):
+        LLM_CALLS.inc()
+        try:
+            return self.generate(prompt).replace('#', '').replace('*', '').strip()
+        except Exception:
+            LLM_FAILURES.inc()
+            raise
+
+    def summarize_chunk(self, text, index, total, title=""):
+        """Return notes for one chunk (cached); the chunk's opening text if the LLM fails"""
+        if self.cache is not None:
+            notes = self.cache.get(self.model_name, text)
+            if notes is not None:
+                CHUNK_CACHE_HITS.inc()
+                return notes
+        try:
+            notes = self._call(MAP_PROMPT.format(index=index + 1, total=total, title=_title(title), text=text))
+        except Exception as e:
+            print(f"ERROR: Summary of part {index + 1}/{total} failed: {e}")
+            return text[:600]
+        if notes and self.cache is not None:
+            self.cache.put(self.model_name, text, notes)
+        return notes
+
+    def _map(self, function, items):
+        executor = self.executor or get_summary_executor()
+        return list(executor.map(function, items))
+
+    def summarize(self, sections, language='English', title=""):
+        """
+        Turn a document into one patient-friendly script
+
+        Args:
+            sections: (title, text) sections of the document
+            language: Language of the script
+            title: Document title given to the model
+
+        Returns:
+            tuple: (script, number of chunks); the script is empty if the final
+                   merge failed for a language other than English (read the
+                   document text instead of untranslated notes)
+        """
+        start = time.perf_counter()
+        chunks = chunk_sections(sections, self.chunk_chars)
+        if not chunks:
+            return "", 0
+
+        notes = self._map(lambda item: self.summarize_chunk(item[1], item[0], len(chunks), title), list(enumerate(chunks)))
+        notes = [n for n in notes if n and "No clinical details" not in n]
+
+        # Merge groups of notes until they fit in one final prompt
+        while sum(len(n) for n in notes) > _NOTE_GROUP_CHARS and len(notes) > 1:
+            groups = _group(notes, _NOTE_GROUP_CHARS)
+            if len(groups) == len(notes):
+                break
+            notes = self._map(lambda group: self._condense(group, title), groups)
+
+        script = self._merge(notes, language, title) if notes else ""
+        SUMMARY_SECONDS.observe(time.perf_counter() - start)
+        return script, len(chunks)
+
+    def _condense(self, notes, title):
+        try:
+            return self._call(GROUP_PROMPT.format(title=_title(title), notes=_numbered(notes)))
+        except Exception as e:
+            print(f"ERROR: Summary group merge failed: {e}")
+            return "\n\n".join(notes)
+
+    def _merge(self, notes, language, title):
+        prompt = REDUCE_PROMPT.format(language_instruction=self.language_instruction(language), title=_title(title),
+                                      max_words=self.max_words, notes=_numbered(notes))
+        try:
+            return self._call(prompt)
+        except Exception as e:
+            print(f"ERROR: Summary merge failed: {e}")
+            # The notes are English; in any other language the caller reads the document itself
+            return "\n\n".join(notes) if language == 'English' else ""
+
+
+def _numbered(notes):
+    return "\n\n".join(f"Part {i}: {n}" for i, n in enumerate(notes, start=1))
+
+
+def _title(title):
+    return f' ("{title}")' if title else ""
+
+
+def _group(notes, max_chars):
+    groups = []
+    current = []
+    size = 0
+    for note in notes:
+        if current and size + len(note) > max_chars:
+            groups.append(current)
+            current = []
+            size = 0
+        current.append(note)
+        size += len(note)
+    if current:
+        groups.append(current)
+    return groups
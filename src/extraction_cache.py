@@ -0,0 +1,143 @@
+# DOCUMENT EXTRACTION CACHE
+# Extracted text of uploaded documents, keyed by the SHA-256 of the file
+# content, so re-uploads of the same lab report skip parsing entirely.
+# Entries are invalidated when the extractor version changes and the cache
+# is capped in size (least recently used evicted first).
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from src import metrics, providers
+from src.disk_cache import DiskLRU
+
+EXTRACT_CACHE_DIR = Path(os.environ.get("EXTRACT_CACHE_DIR", Path(tempfile.gettempdir()) / "ai_doctor_extract_cache"))
+EXTRACT_CACHE_MAX_BYTES = int(os.environ.get("EXTRACT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Bump when extraction output changes; the PDF library version is part of the key too
+EXTRACTOR_VERSION = "1"
+
+CACHE_HITS = metrics.counter("extract_cache_hits_total", "Document extractions served from the cache")
+CACHE_MISSES = metrics.counter("extract_cache_misses_total", "Documents parsed")
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def section_offsets(sections):
+    """Character offset of each section in the newline-joined document text"""
+    offsets = []
+    position = 0
+    for _, text in sections:
+        offsets.append(position)
+        position += len(text) + 1
+    return offsets
+
+
+def trim_sections(sections, char_budget):
+    """Cut sections so that their text totals at most char_budget characters"""
+    if char_budget is None:
+        return sections
+    trimmed = []
+    remaining = char_budget
+    for title, text in sections:
+        if remaining <= 0:
+            break
+        trimmed.append((title, text[:remaining]))
+        remaining -= len(text[:remaining])
+    return trimmed
+
+
+class ExtractionCache:
+    """Disk cache of extracted document sections with a total size cap"""
+
+    def __init__(self, root=EXTRACT_CACHE_DIR, max_bytes=EXTRACT_CACHE_MAX_BYTES, version=None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # PyPDF2 is loaded with the first cache, not when this module is imported
+        self.version = version or f"{EXTRACTOR_VERSION}-pypdf2-{providers.get('PyPDF2').__version__}"
+        self._files = DiskLRU(self.root, ".json", max_bytes)
+
+    def _key(self, digest, kind):
+        return hashlib.sha256(f"{self.version}\0{kind}\0{digest}".encode('utf-8')).hexdigest()
+
+    def get(self, digest, kind, char_budget=None):
+        """
+        Return cached sections, or None if missing or too short for the budget
+
+        Entries written by budgeted extractions only serve requests that
+        need no more text than they hold.
+        """
+        data = self._files.read(self._key(digest, kind))
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            return None
+        if entry.get('version') != self.version:
+            return None
+        if not entry['complete'] and (char_budget is None or entry['chars'] < char_budget):
+            return None
+        return trim_sections([tuple(section) for section in entry['sections']], char_budget)
+
+    def put(self, digest, kind, sections, complete=True):
+        entry = {
+            'version': self.version,
+            'complete': complete,
+            'chars': sum(len(text) for _, text in sections),
+            'offsets': section_offsets(sections),
+            'sections': [list(section) for section in sections],
+        }
+        self._files.write(self._key(digest, kind), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+    def load(self, file_path, kind, extract, char_budget=None, digest=None):
+        """
+        Return a document's sections, parsing it only on a cache miss
+
+        Args:
+            file_path: Document path
+            kind: Document type ('pdf', 'docx', 'txt'); part of the key
+            extract: Callable(file_path, char_budget) -> list of (title, text); an
+                     extractor that stops early returns exactly char_budget
+                     characters, one that ignores the budget returns everything
+            char_budget: Characters needed (None for the whole document)
+            digest: Precomputed SHA-256 of the file, if known
+
+        Returns:
+            list: (title, text) sections
+        """
+        digest = digest or file_digest(file_path)
+        sections = self.get(digest, kind, char_budget)
+        if sections is not None:
+            CACHE_HITS.inc(kind=kind)
+            return sections
+
+        CACHE_MISSES.inc(kind=kind)
+        sections = extract(file_path, char_budget)
+        total = sum(len(text) for _, text in sections)
+        # Only an extraction cut off at the budget is partial (e.g. DOCX ignores the budget)
+        self.put(digest, kind, sections, complete=char_budget is None or total != char_budget)
+        return trim_sections(sections, char_budget)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Return the process-wide extraction cache"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+        return _default_cache
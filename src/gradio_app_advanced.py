@@ -1,64 +1,103 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
 from PIL import Image
 import asyncio
-import tempfile
 from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor
-import PyPDF2
-import docx
 import io
-from gtts import gTTS
 import time
+import threading
 from collections import defaultdict
-import requests
 import json
-from groq import Groq
+import shutil
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+
+from src import metrics, providers
+from src.admission import ADMISSION_MAX_IN_FLIGHT, AdmissionController, Overloaded
+from src.audio_http import (
+    INLINE_AUDIO_MAX_BYTES,
+    choose_response_mode,
+    immutable_file_response,
+    inline_audio_fields,
+    multipart_mixed_response,
+)
+from src.audio_store import get_audio_store
+from src.audio_transcode import PROFILES, get_variant, negotiate_format
+from src.cpu_pool import decode_image, shutdown_cpu_pool
+from src.deadline import (
+    PROVIDER_TIMEOUT_SECONDS,
+    REQUEST_DEADLINE_SECONDS,
+    Deadline,
+    WORK_RECLAIMED,
+    call_with_timeout,
+    stage_timeout,
+    watch_disconnect,
+)
+from src.document_extract import extract_pdf_text, iter_pdf_pages
+from src.doctors_brain import analyze_medical_image_advanced
+from src.document_playlist import get_playlist_store, public_manifest
+from src.document_summary import DocumentSummarizer, SummaryCache
+from src.extraction_cache import get_extraction_cache
+from src.load_shedding import QualityGovernor
+from src.job_queue import JobFailed, get_job_queue, job_events, new_job_id, public_job
+from src.phrase_bank import bank_is_complete, build_gtts_bank_once, render_with_bank
+from src.report_store import get_report_store
+from src.speech_pipeline import PipelinedSpeech
+from src.speech_script import SpeechScriptWriter
+from src.sentence_cache import new_request_stats, record_request_stats, synthesize_cached
+from src.upload_spool import UploadTooLarge, spool_upload
+from src.warmup import WARMUP, StepDegraded, Warmup
 
 load_dotenv()
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-
-# Validate API keys before configuring clients (ASCII-only console output for Windows compatibility)
-if not GEMINI_API_KEY:
-    print("WARNING: GEMINI_API_KEY not found in environment variables!")
-    print("Please add your Gemini API key to the .env file.")
-    GEMINI_API_KEY = None
-    
-if not GROQ_API_KEY:
-    print("WARNING: GROQ_API_KEY not found in environment variables!")
-    print("Please add your Groq API key to the .env file.")
-    GROQ_API_KEY = None
-
-# Configure clients only if API keys are available
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)  # type: ignore
-        print("INFO: Gemini API configured successfully")
-    except Exception as e:
-        print(f"ERROR: Could not configure Gemini API: {e}")
-        GEMINI_API_KEY = None
-else:
-    print("INFO: Gemini API will use fallback methods due to missing API key")
-
-if GROQ_API_KEY:
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY") or None
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY") or None
+
+# Synthesize analysis sentences while Gemini is still streaming the report
+PIPELINED_SPEECH = os.environ.get("PIPELINED_SPEECH", "1") == "1"
+
+# Maximum listening time for read-aloud documents (analyses use SPEECH_MAX_SECONDS)
+DOCUMENT_SPEECH_MAX_SECONDS = int(os.environ.get("DOCUMENT_SPEECH_MAX_SECONDS", "600"))
+# Characters read from a document for single-file speech; more than the
+# speech script can fit in DOCUMENT_SPEECH_MAX_SECONDS, so parsing stops early
+DOCUMENT_TEXT_BUDGET = int(os.environ.get("DOCUMENT_TEXT_BUDGET", "20000"))
+# Documents longer than this are summarized (map-reduce) before they are read
+# aloud, when an LLM is configured; up to DOCUMENT_SUMMARY_INPUT_CHARS are summarized
+DOCUMENT_SUMMARY = os.environ.get("DOCUMENT_SUMMARY", "1") == "1"
+DOCUMENT_SUMMARY_MIN_CHARS = int(os.environ.get("DOCUMENT_SUMMARY_MIN_CHARS", "4000"))
+DOCUMENT_SUMMARY_INPUT_CHARS = int(os.environ.get("DOCUMENT_SUMMARY_INPUT_CHARS", "200000"))
+
+def log_provider_status():
+    """Report which API keys are configured (ASCII-only console output for Windows compatibility)"""
+    if not GEMINI_API_KEY:
+        print("WARNING: GEMINI_API_KEY not found in environment variables!")
+        print("Please add your Gemini API key to the .env file.")
+        print("INFO: Gemini API will use fallback methods due to missing API key")
+    if not GROQ_API_KEY:
+        print("WARNING: GROQ_API_KEY not found in environment variables!")
+        print("Please add your Groq API key to the .env file.")
+        print("INFO: Groq API will use fallback methods due to missing API key")
+
+# Provider clients are created on first use (src/providers.py), not at import
+def get_genai():
+    """google.generativeai, configured with GEMINI_API_KEY"""
+    return providers.get("genai")
+
+def get_groq_client():
+    """Groq client, or None without GROQ_API_KEY or if it cannot be created"""
+    if not GROQ_API_KEY:
+        return None
     try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
-        print("INFO: Groq API configured successfully")
+        return providers.get("groq")
     except Exception as e:
         print(f"ERROR: Could not configure Groq API: {e}")
-        GROQ_API_KEY = None
-        groq_client = None
-else:
-    print("INFO: Groq API will use fallback methods due to missing API key")
-    groq_client = None
+        return None
 
 # Initialize Hugging Face models for free fallback
 image_captioning = None
@@ -75,50 +114,25 @@ except Exception as e:
     print(f"Failed to setup Hugging Face model loading: {e}")
     image_captioning = None
 
-# Storage for detailed reports
-REPORT_STORAGE_FILE = "detailed_reports.json"
-
+# Storage for detailed reports (SQLite, see src/report_store.py)
 def load_stored_reports():
-    """Load stored detailed reports"""
+    """Load stored detailed reports (newest first, up to the retention limit)"""
     try:
-        if os.path.exists(REPORT_STORAGE_FILE):
-            with open(REPORT_STORAGE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        return get_report_store().recent()
     except Exception:
         return {}
 
 def save_stored_report(report_key, report_data):
     """Save a detailed report for later retrieval"""
     try:
-        reports = load_stored_reports()
-        reports[report_key] = {
-            "data": report_data,
-            "timestamp": time.time(),
-            "language": report_data.get("language", "English")
-        }
-        
-        # Keep only recent reports (last 50)
-        if len(reports) > 50:
-            # Remove oldest reports
-            sorted_reports = sorted(reports.items(), key=lambda x: x[1]["timestamp"])
-            reports = dict(sorted_reports[-50:])
-        
-        with open(REPORT_STORAGE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(reports, f, ensure_ascii=False, indent=2)
+        get_report_store().put(report_key, report_data)
     except Exception as e:
         print(f"Error saving report: {e}")
 
 def get_stored_report(report_key):
-    """Retrieve a stored detailed report"""
+    """Retrieve a stored detailed report (None once older than REPORT_TTL_SECONDS)"""
     try:
-        reports = load_stored_reports()
-        if report_key in reports:
-            # Check if report is less than 24 hours old
-            report = reports[report_key]
-            if time.time() - report["timestamp"] < 86400:  # 24 hours
-                return report["data"]
-        return None
+        return get_report_store().get(report_key)
     except Exception:
         return None
 
@@ -147,8 +161,13 @@ LANGUAGES = {
     'Chhattisgarhi': {'code': 'hi', 'voice': 'hi-IN-MadhurNeural', 'voice_f': 'hi-IN-SwaraNeural'}  # Using Hindi voice for Chhattisgarhi
 }
 
-# Thread pool for parallel processing - OPTIMIZED FOR SPEED
-executor = ThreadPoolExecutor(max_workers=6)
+# Thread pool for heavy requests, behind admission control (src/admission.py)
+executor = ThreadPoolExecutor(max_workers=ADMISSION_MAX_IN_FLIGHT, thread_name_prefix="analysis")
+admission = AdmissionController(executor)
+
+# Serve cheaper analyses instead of queueing when the pool is saturated (src/load_shedding.py)
+LOAD_SHEDDING = os.environ.get("LOAD_SHEDDING", "1") == "1"
+quality_governor = QualityGovernor(lambda: admission.pressure())
 
 @lru_cache(maxsize=5)
 def get_gemini_model(model_name="models/gemini-1.5-flash"):
@@ -166,22 +185,26 @@ def get_gemini_model(model_name="models/gemini-1.5-flash"):
     
     for model in models_to_try:
         try:
-            return genai.GenerativeModel(model)  # type: ignore
+            return get_genai().GenerativeModel(model)  # type: ignore
         except Exception as e:
             print(f"Failed to load model {model}: {e}")
             continue
     
     # If all models fail, fall back to the original
-    return genai.GenerativeModel("models/gemini-2.5-pro")  # type: ignore
+    return get_genai().GenerativeModel("models/gemini-2.5-pro")  # type: ignore
 
-def analyze_image_free(image, question_type, language='English', additional_context=''):
+def analyze_image_free(image, question_type, language='English', additional_context='', deadline=None):
     """Analyze image using free Hugging Face models as alternative"""
     if image is None:
         return "Please upload an image first.", None
+    if deadline is not None and deadline.expired():
+        deadline.record("analysis")
+        return ANALYSIS_TIMEOUT_MESSAGE, None
     
     try:
         # Check if Groq API is available for fallback
-        if not GROQ_API_KEY or groq_client is None:
+        groq_client = get_groq_client()
+        if groq_client is None:
             return "Free image analysis requires Groq API. Please add GROQ_API_KEY to environment variables.", None
         
         # Try to load model on demand - this may fail on memory-constrained systems
@@ -226,13 +249,17 @@ Be thorough and professional. Include specific medicine names and dosages."""
                 model="llama-3.3-70b-versatile",
                 messages=[{"role": "user", "content": context}],
                 max_tokens=600,  # Increased for detailed analysis
-                temperature=0.1  # Very low for consistency and accuracy
+                temperature=0.1,  # Very low for consistency and accuracy
+                timeout=stage_timeout(deadline, "analysis"),
             )
             
             analysis = response.choices[0].message.content.replace('#', '').replace('*', '')
             return analysis, None
         except Exception as groq_error:
             print(f"ERROR: Groq API failed: {groq_error}")
+            if deadline is not None and deadline.expired():
+                deadline.record("analysis")
+                return ANALYSIS_TIMEOUT_MESSAGE, None
             return f"Analysis failed: {str(groq_error)[:100]}. Please check API configuration.", None
         
     except Exception as e:
@@ -277,80 +304,106 @@ def is_common_query(message):
         return 'thanks'
     return None
 
+# Canned replies for common chat queries (also pre-rendered into the phrase bank)
+COMMON_RESPONSES = {
+    'greeting': {
+        'English': "Hello! I'm your AI medical assistant. How can I help you with your health concerns today?",
+        'Hindi': "नमस्ते! मैं आपका AI मेडिकल असिस्टेंट हूं। आज आपकी स्वास्थ्य समस्याओं में मैं आपकी कैसे मदद कर सकता हूं?",
+        'Hinglish': "Hello! Main aapka AI doctor assistant hoon. Aaj aapki health problems mein kaise help kar sakta hoon?",
+        'Telugu': "నమస్కారం! నేను మీ AI వైద్య సహాయకుడు. ఈరోజు మీ ఆరోగ్య సమస్యలలో నేను మీకు ఎలా సహాయం చేయగలను?",
+        'Chhattisgarhi': "नमस्ते! हम तोला AI मेडिकल असिस्टेंट हे। आज तोला स्वास्थ्य समस्या म हम का मदद कर सकत हे?"
+    },
+    'thanks': {
+        'English': "You're welcome! Remember to consult a healthcare professional for any serious medical concerns. Take care!",
+        'Hindi': "आपका स्वागत है! कोई भी गंभीर स्वास्थ्य समस्या के लिए कृपया स्वास्थ्य विशेषज्ञ से सलाह लें। स्वस्थ रहें!",
+        'Hinglish': "You're welcome! Koi bhi serious health problem ke liye doctor se zaroor consult karo. Take care!",
+        'Telugu': "మీరు స్వాగతించబడ్డారు! ఏదైనా తీవ్రమైన వైద్య సమస్య కోసం వైద్య నిపుణులను సంప్రదించండి. జాగ్రత్తగా ఉండండి!",
+        'Chhattisgarhi': "तola स्वागत हे! कोनो गंभीर स्वास्थ्य समस्या के लइं डाक्टर से जरूर सलाह लेव। स्वस्थ रहव!"
+    }
+}
+
 def get_common_response(query_type, language):
     """Get cached response for common queries"""
-    responses = {
-        'greeting': {
-            'English': "Hello! I'm your AI medical assistant. How can I help you with your health concerns today?",
-            'Hindi': "नमस्ते! मैं आपका AI मेडिकल असिस्टेंट हूं। आज आपकी स्वास्थ्य समस्याओं में मैं आपकी कैसे मदद कर सकता हूं?",
-            'Hinglish': "Hello! Main aapka AI doctor assistant hoon. Aaj aapki health problems mein kaise help kar sakta hoon?",
-            'Telugu': "నమస్కారం! నేను మీ AI వైద్య సహాయకుడు. ఈరోజు మీ ఆరోగ్య సమస్యలలో నేను మీకు ఎలా సహాయం చేయగలను?",
-            'Chhattisgarhi': "नमस्ते! हम तोला AI मेडिकल असिस्टेंट हे। आज तोला स्वास्थ्य समस्या म हम का मदद कर सकत हे?"
-        },
-        'thanks': {
-            'English': "You're welcome! Remember to consult a healthcare professional for any serious medical concerns. Take care!",
-            'Hindi': "आपका स्वागत है! कोई भी गंभीर स्वास्थ्य समस्या के लिए कृपया स्वास्थ्य विशेषज्ञ से सलाह लें। स्वस्थ रहें!",
-            'Hinglish': "You're welcome! Koi bhi serious health problem ke liye doctor se zaroor consult karo. Take care!",
-            'Telugu': "మీరు స్వాగతించబడ్డారు! ఏదైనా తీవ్రమైన వైద్య సమస్య కోసం వైద్య నిపుణులను సంప్రదించండి. జాగ్రత్తగా ఉండండి!",
-            'Chhattisgarhi': "तola स्वागत हे! कोनो गंभीर स्वास्थ्य समस्या के लइं डाक्टर से जरूर सलाह लेव। स्वस्थ रहव!"
-        }
-    }
-    
-    return responses.get(query_type, {}).get(language, responses[query_type]['English'])
+    return COMMON_RESPONSES.get(query_type, {}).get(language, COMMON_RESPONSES[query_type]['English'])
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file"""
+def extract_text_from_pdf(file_path, char_budget=None):
+    """Extract text from PDF file (stops parsing once char_budget characters are read)"""
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
+        return extract_pdf_text(file_path, char_budget)
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
+def extract_sections_from_pdf(file_path, char_budget=None):
+    """Extract (title, text) per PDF page"""
+    return [(f"Page {i + 1}", text) for i, text in enumerate(iter_pdf_pages(file_path, char_budget))]
+
+def extract_sections_from_docx(file_path, char_budget=None):
+    """Extract (title, text) per DOCX chapter (split at heading paragraphs)"""
+    doc = providers.get("docx").Document(file_path)
+    sections = []
+    title, lines = "", []
+    for paragraph in doc.paragraphs:
+        style = paragraph.style.name if paragraph.style is not None else ""
+        if style.startswith("Heading") and paragraph.text.strip():
+            if any(line.strip() for line in lines):
+                sections.append((title, "\n".join(lines)))
+            title, lines = paragraph.text.strip(), [paragraph.text]
+        else:
+            lines.append(paragraph.text)
+    if any(line.strip() for line in lines):
+        sections.append((title, "\n".join(lines)))
+    return sections
+
+def extract_sections_from_txt(file_path, char_budget=None):
+    """Read a text file as a single section"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [("", f.read(char_budget) if char_budget is not None else f.read())]
+
+DOCUMENT_EXTRACTORS = {
+    '.pdf': ('pdf', extract_sections_from_pdf),
+    '.docx': ('docx', extract_sections_from_docx),
+    '.doc': ('docx', extract_sections_from_docx),
+    '.txt': ('txt', extract_sections_from_txt),
+}
+
+def load_document_sections(file_path, char_budget=None, digest=None):
+    """Return (title, text) sections of a PDF/DOCX/TXT file
+
+    Results are cached by file content, so repeated uploads are not parsed again.
+    Returns None for unsupported file types.
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext not in DOCUMENT_EXTRACTORS:
+        return None
+    kind, extract = DOCUMENT_EXTRACTORS[file_ext]
+    return get_extraction_cache().load(file_path, kind, extract, char_budget, digest)
+
 def extract_text_from_docx(file_path):
     """Extract text from DOCX file"""
     try:
-        doc = docx.Document(file_path)
+        doc = providers.get("docx").Document(file_path)
         text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
         return text.strip()
     except Exception as e:
         return f"Error reading DOCX: {str(e)}"
 
-def analyze_image(image, question_type, language='English', additional_context=''):
-    """Advanced image analysis with multilingual support and context - BALANCED VERSION"""
-    if image is None:
-        return "Please upload an image first.", None
+def build_analysis_prompt(image, question_type, language='English', additional_context='', tier='full'):
+    """Build the Gemini prompt for an image analysis request (cheaper tiers get a brief prompt)"""
+    lang_instruction = get_language_instruction(language)
     
-    # Check if Gemini API key is available before proceeding
-    if GEMINI_API_KEY is None:
-        # Use free alternative if API key is not available
-        try:
-            free_result, _ = analyze_image_free(image, question_type, language, additional_context)
-            return free_result, None
-        except Exception as free_error:
-            print(f"Free alternative failed: {free_error}")
-            return call_alternative_ai_service(f"Image analysis requested for {question_type}", language=language), None
+    # Add context to prompt if provided
+    context_addon = f"\n\nADDITIONAL PATIENT INFORMATION: {additional_context}" if additional_context.strip() else ""
     
-    try:
-        model = get_gemini_model("models/gemini-2.5-pro")
-        lang_instruction = get_language_instruction(language)
-        
-        # Add context to prompt if provided
-        context_addon = f"\n\nADDITIONAL PATIENT INFORMATION: {additional_context}" if additional_context.strip() else ""
-        
-        # Build prompts dynamically to avoid f-string issues and ensure variation
-        unique_id = f"Analysis ID: {time.time()}_{hash(image.tobytes()) % 10000}"
-        base_prompt = f"""{unique_id}
+    # Build prompts dynamically to avoid f-string issues and ensure variation
+    unique_id = f"Analysis ID: {time.time()}_{hash(image.tobytes()) % 10000}"
+    base_prompt = f"""{unique_id}
 
 {lang_instruction}
 
 You are a board-certified dermatologist providing a comprehensive medical report. Analyze this image and provide a detailed professional medical assessment."""
-        
-        if question_type == "Full Analysis":
-            query = base_prompt + """
+    
+    if question_type == "Full Analysis":
+        query = base_prompt + """
 
 MEDICAL REPORT:
 1. SYMPTOMS: What you see (location, size, color, shape)
@@ -361,13 +414,13 @@ MEDICAL REPORT:
 
 Keep response under 300 words."""
 
-        elif question_type == "Symptoms Only":
-            query = base_prompt + """
+    elif question_type == "Symptoms Only":
+        query = base_prompt + """
             
 List ALL visible symptoms clearly. Location, appearance, size, color. Keep under 150 words."""
-        
-        elif question_type == "Diagnosis":
-            query = base_prompt + """
+    
+    elif question_type == "Diagnosis":
+        query = base_prompt + """
 
 DIAGNOSIS:
 1. Main condition (confidence %)
@@ -377,12 +430,12 @@ DIAGNOSIS:
 5. Precautions
 
 Keep under 200 words."""
-        
-        elif question_type == "Treatment":
-            query = base_prompt + "\n\nTREATMENT PLAN:\nMedicines: Name-Dose-How often-How long\nInstructions: What to do at home\nWarnings: When to seek help\nKeep under 250 words"
-        
-        elif question_type == "Prevention":
-            query = base_prompt + """
+    
+    elif question_type == "Treatment":
+        query = base_prompt + "\n\nTREATMENT PLAN:\nMedicines: Name-Dose-How often-How long\nInstructions: What to do at home\nWarnings: When to seek help\nKeep under 250 words"
+    
+    elif question_type == "Prevention":
+        query = base_prompt + """
 
 PREVENTION:
 1. Lifestyle changes
@@ -392,30 +445,85 @@ PREVENTION:
 5. Avoid these things
 
 Keep under 200 words."""
-        
-        else:
-            query = base_prompt
-        
-        # ULTRA FAST generation config
-        generation_config = {
-            "temperature": 0.1,  # Very low for speed and consistency
-            "top_p": 0.7,        # Optimized for speed
-            "top_k": 30,         # Reduced for speed
-            "max_output_tokens": 500,  # Drastically reduced for speed
-        }
+    
+    else:
+        query = base_prompt
+
+    if ANALYSIS_TIERS[tier]['prompt']:
+        query = base_prompt + ANALYSIS_TIERS[tier]['prompt']
+
+    return query
+
+# ULTRA FAST generation config
+ANALYSIS_GENERATION_CONFIG = {
+    "temperature": 0.1,  # Very low for speed and consistency
+    "top_p": 0.7,        # Optimized for speed
+    "top_k": 30,         # Reduced for speed
+    "max_output_tokens": 500,  # Drastically reduced for speed
+}
+
+# Quality tiers served under load: brief prompt, fewer tokens, optional audio
+ANALYSIS_TIERS = {
+    'full': {'prompt': None, 'max_output_tokens': 500, 'audio': True},
+    'reduced': {
+        'prompt': "\n\nBRIEF REPORT: likely condition, main medicine with dose, urgency, when to see a doctor. "
+                  "Keep under 120 words.",
+        'max_output_tokens': 250,
+        'audio': True,
+    },
+    'minimal': {
+        'prompt': "\n\nIn under 60 words: the most likely condition, one safe first step, "
+                  "and whether to see a doctor urgently.",
+        'max_output_tokens': 120,
+        'audio': False,
+    },
+}
+
+ANALYSIS_TIMEOUT_MESSAGE = "Error: The analysis took too long. Please try again."
+
+def analysis_generation_config(tier='full'):
+    """Generation config for an analysis at the given quality tier"""
+    return dict(ANALYSIS_GENERATION_CONFIG, max_output_tokens=ANALYSIS_TIERS[tier]['max_output_tokens'])
+
+def analyze_image(image, question_type, language='English', additional_context='', tier='full', deadline=None):
+    """Advanced image analysis with multilingual support and context - BALANCED VERSION"""
+    if image is None:
+        return "Please upload an image first.", None
+    if deadline is not None and deadline.expired():
+        deadline.record("analysis")
+        return ANALYSIS_TIMEOUT_MESSAGE, None
+    
+    # Check if Gemini API key is available before proceeding
+    if GEMINI_API_KEY is None:
+        # Use free alternative if API key is not available
+        try:
+            free_result, _ = analyze_image_free(image, question_type, language, additional_context, deadline)
+            return free_result, None
+        except Exception as free_error:
+            print(f"Free alternative failed: {free_error}")
+            return call_alternative_ai_service(f"Image analysis requested for {question_type}", language=language), None
+    
+    try:
+        model = get_gemini_model("models/gemini-2.5-pro")
+        query = build_analysis_prompt(image, question_type, language, additional_context, tier)
         
         response = model.generate_content(
             [query, image],
-            generation_config=generation_config  # type: ignore
+            generation_config=analysis_generation_config(tier),  # type: ignore
+            request_options={"timeout": stage_timeout(deadline, "analysis")}
         )
         
         cleaned_text = response.text.replace('#', '').replace('*', '')
         return cleaned_text, None
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            # No time left for a fallback provider
+            deadline.record("analysis")
+            return ANALYSIS_TIMEOUT_MESSAGE, None
         if "429" in str(e) or "quota" in str(e).lower() or "API Key not found" in str(e):
             # Try free alternative first
             try:
-                free_result, _ = analyze_image_free(image, question_type, language, additional_context)
+                free_result, _ = analyze_image_free(image, question_type, language, additional_context, deadline)
                 return free_result, None
             except Exception as free_error:
                 print(f"Free alternative failed: {free_error}")
@@ -423,74 +531,218 @@ Keep under 200 words."""
                 return call_alternative_ai_service(f"Image analysis requested for {question_type}", language=language), None
         return f"Error: {str(e)}", None
 
-def generate_voice_multilingual(text, language, gender="Male"):
+def stream_analyze_image(image, question_type, language='English', additional_context='', tier='full', deadline=None):
+    """Yield the image analysis text as Gemini generates it.
+
+    Falls back to a single chunk from analyze_image (free alternatives, error
+    messages) when streaming is unavailable or fails before any text arrives.
+    Stops early, keeping the text produced so far, when the deadline passes.
+    """
+    if image is None or GEMINI_API_KEY is None:
+        yield analyze_image(image, question_type, language, additional_context, tier, deadline)[0]
+        return
+
+    produced = False
+    try:
+        model = get_gemini_model("models/gemini-2.5-pro")
+        query = build_analysis_prompt(image, question_type, language, additional_context, tier)
+        response = model.generate_content(
+            [query, image],
+            generation_config=analysis_generation_config(tier),  # type: ignore
+            stream=True,
+            request_options={"timeout": stage_timeout(deadline, "analysis")}
+        )
+        for chunk in response:
+            if produced and deadline is not None and deadline.expired():
+                deadline.record("analysis")
+                return
+            text = chunk.text.replace('#', '').replace('*', '')
+            if text:
+                produced = True
+                yield text
+    except Exception as e:
+        if produced:
+            print(f"ERROR: Analysis stream interrupted: {e}")
+            return
+        print(f"Streaming analysis failed, retrying without streaming: {e}")
+        yield analyze_image(image, question_type, language, additional_context, tier, deadline)[0]
+
+# Map language to gTTS language code
+GTTS_LANG_CODES = {
+    'English': 'en',
+    'Hindi': 'hi',
+    'Hinglish': 'en',  # Use English for Hinglish
+    'Telugu': 'te',
+    'Chhattisgarhi': 'hi',  # Use Hindi for Chhattisgarhi
+}
+
+def synthesize_speech_bytes(text, lang_code, timeout=PROVIDER_TIMEOUT_SECONDS):
+    """Synthesize text with gTTS and return the MP3 bytes"""
+    buffer = io.BytesIO()
+    tts = providers.get("gtts")(text, lang=lang_code, slow=False, lang_check=False, timeout=timeout)
+    tts.write_to_fp(buffer)
+    return buffer.getvalue()
+
+MAX_VOICE_CHARS = 12000
+
+def make_speech_renderer(language, gender, stats, deadline=None):
+    """Return render(text) -> MP3 bytes using the phrase bank and sentence cache"""
+    lang_code = GTTS_LANG_CODES.get(language, 'en')
+    stats_lock = threading.Lock()
+
+    def synthesize_segment(segment):
+        # Unchanged sentences are served from the sentence cache
+        segment_stats = new_request_stats()
+        audio = synthesize_cached(
+            segment,
+            f"gtts_{lang_code}",
+            lambda sentence: synthesize_speech_bytes(sentence, lang_code, stage_timeout(deadline, "speech")),
+            stats=segment_stats
+        )
+        with stats_lock:
+            for key, value in segment_stats.items():
+                stats[key] += value
+        return audio
+
+    def render(text):
+        # Canned phrases come from the pre-rendered bank; only the rest is synthesized
+        audio = render_with_bank(text, language, gender, synthesize_segment)
+        if audio is None:
+            audio = synthesize_segment(text)
+        return audio
+
+    return render
+
+def store_voice_audio(audio):
+    """Hand generated audio to the audio store and return its file path"""
+    # The audio store owns the file and removes it after its TTL
+    audio_store = get_audio_store()
+    return str(audio_store.path(audio_store.put_bytes(audio)))
+
+def generate_voice_multilingual(text, language, gender="Male", max_seconds=None, deadline=None):
     """Generate voice in multiple languages - synchronous version using gTTS"""
     if not text or not text.strip():
         print(f"Text is empty or None: {len(text) if text else 0} characters")
         return None
 
-    max_length = 12000
+    # Read a spoken script (no markup, abbreviations expanded, capped duration)
+    writer = SpeechScriptWriter(language, max_seconds)
+    text = writer.process(text, final=True)
+    writer.record()
+    if not text:
+        print("Speech script is empty")
+        return None
+
+    max_length = MAX_VOICE_CHARS
     if len(text) > max_length:
         original_length = len(text)
         text = text[:max_length] + "... (truncated for performance)"
         print(f"Text truncated from {original_length} to {len(text)} characters")
 
     try:
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        output_path = temp_file.name
-        temp_file.close()
-
-        # Map language to gTTS language code
-        lang_map = {
-            'English': 'en',
-            'Hindi': 'hi',
-            'Hinglish': 'en',  # Use English for Hinglish
-            'Telugu': 'te',
-            'Chhattisgarhi': 'hi',  # Use Hindi for Chhattisgarhi
-        }
-        lang_code = lang_map.get(language, 'en')
+        stats = new_request_stats()
+        render = make_speech_renderer(language, gender, stats, deadline)
 
         try:
-            tts = gTTS(text, lang=lang_code, slow=False, lang_check=False)
-            tts.save(output_path)
-
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                if file_size > 0:
-                    return output_path
-                print("ERROR: Generated audio file is empty with gTTS")
-                os.unlink(output_path)
-                return None
-
-            print("ERROR: Audio file was not created with gTTS")
-            return None
+            audio = render(text)
+            record_request_stats(stats)
         except Exception as e:
+            if deadline is not None and deadline.expired():
+                deadline.record("speech")
             print(f"ERROR: gTTS error: {e}")
-            if os.path.exists(output_path):
-                os.unlink(output_path)
             return None
+
+        if not audio:
+            print("ERROR: Generated audio is empty with gTTS")
+            return None
+        if deadline is not None and deadline.cancelled:
+            # Nobody is left to fetch the file
+            deadline.record("speech")
+            return None
+
+        return store_voice_audio(audio)
     except Exception as e:
         print(f"ERROR: Voice generation error: {e}")
         return None
 
-def generate_voice(text, language="English", gender="Male"):
+def generate_voice(text, language="English", gender="Male", max_seconds=None, deadline=None):
     """Synchronous wrapper for voice generation compatible with FastAPI"""
     try:
         if not text or not str(text).strip():
             return None
+        if deadline is not None and deadline.expired():
+            deadline.record("speech")
+            return None
 
         text = str(text).strip()
-        return generate_voice_multilingual(text, language, gender)
+        return generate_voice_multilingual(text, language, gender, max_seconds, deadline)
     except Exception as e:
         print(f"Error in generate_voice: {e}")
         return None
 
-def analyze_and_speak(image, question_type, language, gender, additional_context=''):
-    """Parallel image analysis and voice generation with context - OPTIMIZED VERSION"""
+def analyze_and_speak_pipelined(image, question_type, language, gender, additional_context='', tier='full',
+                                deadline=None):
+    """Stream the analysis and synthesize each finished sentence while the model is still writing"""
+    stats = new_request_stats()
+    writer = SpeechScriptWriter(language)
+    speech = PipelinedSpeech(
+        make_speech_renderer(language, gender, stats, deadline),
+        max_chars=MAX_VOICE_CHARS,
+        prepare=writer.process
+    )
+    parts = []
+
+    try:
+        for chunk in stream_analyze_image(image, question_type, language, additional_context, tier, deadline):
+            parts.append(chunk)
+            speech.feed(chunk)
+    except Exception as e:
+        print(f"ERROR: Image analysis failed: {str(e)}")
+
+    analysis_text = "".join(parts)
+    if not analysis_text.strip():
+        speech.finish()
+        return "Failed to generate analysis. Please check API keys and try again.", None
+
+    try:
+        audio = speech.finish()
+        writer.record()
+        record_request_stats(stats)
+        audio_file = store_voice_audio(audio) if audio else None
+    except Exception as e:
+        # Out of time: the text is still returned, without audio
+        if deadline is not None and deadline.expired():
+            deadline.record("speech")
+        print(f"ERROR: Voice generation failed: {str(e)}")
+        audio_file = None
+
+    return analysis_text, audio_file
+
+def analyze_and_speak(image, question_type, language, gender, additional_context='', pipelined=None, tier='full',
+                      deadline=None):
+    """Parallel image analysis and voice generation with context - OPTIMIZED VERSION
+
+    With a deadline, each stage gets the time left; if speech runs out of
+    time the analysis text is returned without audio.
+    """
+    if not ANALYSIS_TIERS[tier]['audio']:
+        # Cheapest tier under load: text only
+        try:
+            analysis_text, _ = analyze_image(image, question_type, language, additional_context, tier, deadline)
+        except Exception as e:
+            print(f"ERROR: Image analysis failed: {str(e)}")
+            analysis_text = None
+        if not analysis_text:
+            return "Failed to generate analysis. Please check API keys and try again.", None
+        return analysis_text, None
+
+    if PIPELINED_SPEECH if pipelined is None else pipelined:
+        return analyze_and_speak_pipelined(image, question_type, language, gender, additional_context, tier, deadline)
+
     #print(f"Starting analyze_and_speak with question_type={question_type}, language={language}, gender={gender}")
     
     try:
-        analysis_text, _ = analyze_image(image, question_type, language, additional_context)
+        analysis_text, _ = analyze_image(image, question_type, language, additional_context, tier, deadline)
     except Exception as e:
         print(f"ERROR: Image analysis failed: {str(e)}")
         analysis_text = None
@@ -501,7 +753,7 @@ def analyze_and_speak(image, question_type, language, gender, additional_context
         return "Failed to generate analysis. Please check API keys and try again.", None
     
     try:
-        audio_file = generate_voice(analysis_text, language, gender)
+        audio_file = generate_voice(analysis_text, language, gender, deadline=deadline)
     except Exception as e:
         print(f"ERROR: Voice generation failed: {str(e)}")
         audio_file = None
@@ -510,7 +762,7 @@ def analyze_and_speak(image, question_type, language, gender, additional_context
     
     return analysis_text, audio_file
 
-def transcribe_audio(audio_file, language='English'):
+def transcribe_audio(audio_file, language='English', deadline=None):
     """Multilingual audio transcription"""
     if audio_file is None:
         return "Please upload or record audio."
@@ -520,11 +772,12 @@ def transcribe_audio(audio_file, language='English'):
         lang_instruction = get_language_instruction(language)
         
         # Check if audio_file is a string (file path) or file object
+        # upload_file takes no timeout; give up on it when the budget runs out
         if isinstance(audio_file, str):
-            audio_file_obj = genai.upload_file(path=audio_file)  # type: ignore
+            audio_file_obj = call_with_timeout(get_genai().upload_file, stage_timeout(deadline, "upload"), path=audio_file)  # type: ignore
         else:
             # If it's a Gradio audio object, we need to get the file path
-            audio_file_obj = genai.upload_file(path=audio_file)  # type: ignore
+            audio_file_obj = call_with_timeout(get_genai().upload_file, stage_timeout(deadline, "upload"), path=audio_file)  # type: ignore
         
         result = model.generate_content([
             f"""{lang_instruction}
@@ -541,7 +794,7 @@ Listen to this audio and provide a professional medical assessment:
 
 Provide a complete medical evaluation without any AI disclaimers.""",
             audio_file_obj
-        ])
+        ], request_options={"timeout": stage_timeout(deadline, "transcription")})
         
         return result.text.replace('#', '').replace('*', '')
     except Exception as e:
@@ -587,7 +840,8 @@ Previous conversation:"""
         messages.append({"role": "user", "content": message})
         
         # Check if Groq client is available before making request
-        if 'groq_client' not in globals() or groq_client is None:
+        groq_client = get_groq_client()
+        if groq_client is None:
             return call_alternative_ai_service(message, language=language)
         
         # ULTRA FAST Groq chat
@@ -597,6 +851,7 @@ Previous conversation:"""
             max_tokens=200,  # Drastically reduced for ultra speed
             temperature=0.1,  # Very low for speed
             top_p=0.6,  # Optimized for speed
+            timeout=PROVIDER_TIMEOUT_SECONDS,
         )
         
         return response.choices[0].message.content.replace('#', '').replace('*', '')
@@ -607,8 +862,61 @@ Previous conversation:"""
             return fallback_response
         return f"Error: {str(e)}"
 
-def process_document_to_speech(file, language, gender):
-    """Convert PDF/DOCX/TXT to speech - BALANCED VERSION"""
+SUMMARY_GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 700,
+}
+
+def summary_model_name():
+    """Name of the LLM used for document summaries, or None if none is configured"""
+    if GEMINI_API_KEY:
+        return "gemini-1.5-flash"
+    if get_groq_client() is not None:
+        return "groq-llama-3.3-70b-versatile"
+    return None
+
+def generate_summary_text(prompt, deadline=None):
+    """Plain text completion for document summaries (Gemini, else Groq)"""
+    if GEMINI_API_KEY:
+        model = get_gemini_model("models/gemini-1.5-flash")
+        return model.generate_content(
+            prompt, generation_config=SUMMARY_GENERATION_CONFIG,
+            request_options={"timeout": stage_timeout(deadline, "summary")}
+        ).text  # type: ignore
+    groq_client = get_groq_client()
+    if groq_client is not None:
+        response = groq_client.chat.completions.create(
+            model="llama-3.3-70b-versatile",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=SUMMARY_GENERATION_CONFIG["max_output_tokens"],
+            temperature=SUMMARY_GENERATION_CONFIG["temperature"],
+            timeout=stage_timeout(deadline, "summary"),
+        )
+        return response.choices[0].message.content
+    raise RuntimeError("No LLM provider configured")
+
+def get_document_summarizer(deadline=None):
+    """Summarizer for long documents, or None when summaries are off or no LLM is configured
+
+    With a deadline, every map and reduce call gets the time the request has
+    left; once it is gone the remaining calls fail at once and their parts
+    fall back to the document text.
+    """
+    model_name = summary_model_name()
+    if not DOCUMENT_SUMMARY or model_name is None:
+        return None
+    return DocumentSummarizer(lambda prompt: generate_summary_text(prompt, deadline), model_name,
+                              get_language_instruction, cache=SummaryCache())
+
+def process_document_to_speech(file, language, gender, digest=None, title=None, deadline=None):
+    """Convert PDF/DOCX/TXT to speech - BALANCED VERSION
+
+    Long documents are summarized into a patient-friendly script first when
+    an LLM is configured. `digest` is the file's SHA-256 when already known
+    (streamed uploads) and `title` overrides the file name. With a deadline,
+    the summary and speech stages get the time the request has left; a
+    document that runs out of time returns no audio.
+    """
     if file is None:
         return "Please upload a file.", None
     
@@ -621,23 +929,25 @@ def process_document_to_speech(file, language, gender):
         return "Invalid file format.", None
         
     try:
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        if file_ext == '.pdf':
-            text = extract_text_from_pdf(file_path)
-        elif file_ext in ['.docx', '.doc']:
-            text = extract_text_from_docx(file_path)
-        elif file_ext == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-        else:
+        summarizer = get_document_summarizer(deadline)
+        char_budget = DOCUMENT_SUMMARY_INPUT_CHARS if summarizer is not None else DOCUMENT_TEXT_BUDGET
+        sections = load_document_sections(file_path, char_budget=char_budget, digest=digest)
+        if sections is None:
             return "Unsupported file format. Use PDF, DOCX, or TXT.", None
-        
-        # Balanced truncation - allow more content but not excessive
-        if len(text) > 8000:  # Increased from 5000
-            text = text[:8000] + "... (truncated for performance)"
-        
-        audio_file = generate_voice(text, language, gender)
+        text = "\n".join(section_text for _, section_text in sections).strip()
+
+        if summarizer is not None and len(text) > DOCUMENT_SUMMARY_MIN_CHARS:
+            script, chunk_count = summarizer.summarize(sections, language, title=title or os.path.basename(file_path))
+            if deadline is not None and deadline.expired():
+                deadline.record("summary")
+                return "Document summary ran out of time.", None
+            if script:
+                audio_file = generate_voice(script, language, gender, max_seconds=DOCUMENT_SPEECH_MAX_SECONDS,
+                                            deadline=deadline)
+                return f"Summarized {len(text)} characters from document in {chunk_count} parts.", audio_file
+
+        # The speech script caps listening time instead of cutting characters
+        audio_file = generate_voice(text, language, gender, max_seconds=DOCUMENT_SPEECH_MAX_SECONDS, deadline=deadline)
         return f"Extracted {len(text)} characters from document.", audio_file
     except Exception as e:
         if "429" in str(e) or "API Key not found" in str(e) or "quota" in str(e).lower():
@@ -646,18 +956,137 @@ def process_document_to_speech(file, language, gender):
             return fallback_response, None
         return f"Error: {str(e)}", None
 
+def render_document_segment(text, language, gender):
+    """Synthesize one playlist segment and return its audio id"""
+    # Segments are short, so the full text is read (no duration cap)
+    audio_path = generate_voice(text, language, gender, max_seconds=0)
+    return get_audio_store().id_for_path(audio_path)
+
+def playlist_segment_url(playlist_id, index):
+    return f"/api/playlists/{playlist_id}/segments/{index}"
+
+def process_document_to_playlist(file, language, gender, digest=None, title=None, deadline=None):
+    """Convert PDF/DOCX/TXT to a lazily synthesized per-page playlist
+
+    Returns immediately with the manifest; segment audio is synthesized when
+    requested, with the next segment prefetched. `digest` is the file's
+    SHA-256 when already known and `title` overrides the file name. No
+    manifest is written if the deadline passed during extraction.
+    """
+    if file is None:
+        return "Please upload a file.", None
+
+    if hasattr(file, 'name'):
+        file_path = file.name
+    elif isinstance(file, str):
+        file_path = file
+    else:
+        return "Invalid file format.", None
+
+    try:
+        sections = load_document_sections(file_path, digest=digest)
+        if sections is None:
+            return "Unsupported file format. Use PDF, DOCX, or TXT.", None
+        if deadline is not None and deadline.expired():
+            deadline.record("extraction")
+            return "Document extraction ran out of time.", None
+
+        manifest = get_playlist_store().create(sections, language, gender, title=title or os.path.basename(file_path))
+        if not manifest['segments']:
+            return "No readable text found in document.", None
+
+        playlist = public_manifest(manifest, playlist_segment_url)
+        return f"Extracted {playlist['total_chars']} characters in {len(playlist['segments'])} segments.", playlist
+    except Exception as e:
+        return f"Error: {str(e)}", None
+
+# ------------------------------
+# Background jobs (see src/job_queue.py)
+# ------------------------------
+
+def run_image_analysis_job(payload, job):
+    """Job: in-depth analysis of a stored image with doctors_brain, plus its audio"""
+    analysis = analyze_medical_image_advanced(payload['image_path'], payload['language'], payload['analysis_depth'])
+    if not analysis or analysis.startswith("Error:"):
+        raise RuntimeError(analysis or "Empty analysis")
+    job.check_cancelled()
+    audio_id = get_audio_store().id_for_path(generate_voice(analysis, payload['language'], payload['gender']))
+    return {
+        'analysis': analysis,
+        'audio_id': audio_id,
+        'audio_url': audio_url_for(audio_id, payload.get('audio_format', "")),
+    }
+
+def run_multilingual_analysis_job(payload, job):
+    """Job: analyze one image and voice the report in several languages"""
+    image = Image.open(payload['image_path']).convert("RGB")
+    languages = payload['languages']
+    renders = {}
+    for i, language in enumerate(languages):
+        job.check_cancelled()
+        analysis, audio_path = analyze_and_speak(
+            image, payload['analysis_type'], language, payload['gender'], payload.get('additional_context', "")
+        )
+        if not analysis:
+            raise RuntimeError(f"Analysis failed for {language}")
+        audio_id = get_audio_store().id_for_path(audio_path)
+        renders[language] = {
+            'analysis': analysis,
+            'audio_id': audio_id,
+            'audio_url': audio_url_for(audio_id, payload.get('audio_format', "")),
+        }
+        job.progress(i + 1, len(languages))
+    return {'languages': renders}
+
+def run_document_narration_job(payload, job):
+    """Job: narrate a whole document, rendering every playlist segment"""
+    sections = load_document_sections(payload['path'], digest=payload.get('digest'))
+    if sections is None:
+        raise JobFailed("Unsupported file format. Use PDF, DOCX, or TXT.")
+    playlists = get_playlist_store()
+    manifest = playlists.create(sections, payload['language'], payload['gender'], title=payload.get('title', ""))
+    if not manifest['segments']:
+        raise JobFailed("No readable text found in document.")
+
+    audio_store = get_audio_store()
+    total = len(manifest['segments'])
+    for index in range(total):
+        job.check_cancelled()
+        audio_id, _ = playlists.segment_audio(manifest['id'], index, render_document_segment, audio_store, prefetch=False)
+        if audio_id is None:
+            raise RuntimeError(f"Speech synthesis failed for segment {index}")
+        job.progress(index + 1, total)
+    return public_manifest(manifest, playlist_segment_url)
+
+JOB_HANDLERS = {
+    'image-analysis': run_image_analysis_job,
+    'multilingual-analysis': run_multilingual_analysis_job,
+    'document-narration': run_document_narration_job,
+}
+
+def get_jobs():
+    """Return the job queue with this app's job handlers registered"""
+    queue = get_job_queue()
+    for kind, handler in JOB_HANDLERS.items():
+        if kind not in queue.handlers:
+            queue.register(kind, handler)
+    return queue
+
+# Fallback reply templates; "{message}" is replaced with the original request
+FALLBACK_RESPONSES = {
+    'English': "API service temporarily unavailable. Please check your API keys in the .env file.\n\nOriginal message: {message}\n\nTo use this application, you need valid API keys from Google Gemini and Groq. Visit https://makersuite.google.com/app/apikey and https://console.groq.com for API keys.",
+    'Hindi': "API सेवा अस्थायी रूप से अनुपलब्ध है। कृपया .env फ़ाइल में अपनी API कुंजी जांचें।\n\nमूल संदेश: {message}\n\nइस एप्लिकेशन का उपयोग करने के लिए, आपको Google Gemini और Groq से मान्य API कुंजी की आवश्यकता है।",
+    'Hinglish': "API service unavailable hai. Please apni .env file mein API keys check karein.\n\nOriginal message: {message}\n\nIs application ka use karne ke liye, aapko Google Gemini aur Groq se valid API keys chahiye hongi.",
+    'Telugu': "API సేవ తాత్కాలికంగా అందుబాటులో లేదు. దయచేసి .env ఫైల్ లో మీ API కీలను తనిఖీ చేయండి.\n\nOriginal message: {message}\n\nఈ అనువర్తనాన్ని ఉపయోగించడానికి, మీకు Google Gemini మరియు Groq నుండి చెల్లుబాటు ఐపీ కీలు అవసరం.",
+    'Chhattisgarhi': "API सेवा अस्थायी रूप ले अनुपलब्ध हे। कृपया .env फ़ाइल में अपन API कुंजी जांच ले।\n\nOriginal message: {message}\n\nइ एप्लिकेशन के उपयोग करे बर, आपला Google Gemini अउ Groq ले मान्य API कुंजी के आवश्यकता होएगी।"
+}
+
 def call_alternative_ai_service(message, language='English'):
     """Fallback AI service when primary APIs are unavailable"""
     # In a real implementation, this would call another AI service
     # For now, return a helpful message
-    fallback_responses = {
-        'English': f"API service temporarily unavailable. Please check your API keys in the .env file.\n\nOriginal message: {message}\n\nTo use this application, you need valid API keys from Google Gemini and Groq. Visit https://makersuite.google.com/app/apikey and https://console.groq.com for API keys.",
-        'Hindi': f"API सेवा अस्थायी रूप से अनुपलब्ध है। कृपया .env फ़ाइल में अपनी API कुंजी जांचें।\n\nमूल संदेश: {message}\n\nइस एप्लिकेशन का उपयोग करने के लिए, आपको Google Gemini और Groq से मान्य API कुंजी की आवश्यकता है।",
-        'Hinglish': f"API service unavailable hai. Please apni .env file mein API keys check karein.\n\nOriginal message: {message}\n\nIs application ka use karne ke liye, aapko Google Gemini aur Groq se valid API keys chahiye hongi.",
-        'Telugu': f"API సేవ తాత్కాలికంగా అందుబాటులో లేదు. దయచేసి .env ఫైల్ లో మీ API కీలను తనిఖీ చేయండి.\n\nOriginal message: {message}\n\nఈ అనువర్తనాన్ని ఉపయోగించడానికి, మీకు Google Gemini మరియు Groq నుండి చెల్లుబాటు ఐపీ కీలు అవసరం.",
-        'Chhattisgarhi': f"API सेवा अस्थायी रूप ले अनुपलब्ध हे। कृपया .env फ़ाइल में अपन API कुंजी जांच ले।\n\nOriginal message: {message}\n\nइ एप्लिकेशन के उपयोग करे बर, आपला Google Gemini अउ Groq ले मान्य API कुंजी के आवश्यकता होएगी।"
-    }
-    return fallback_responses.get(language, fallback_responses['English'])
+    template = FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSES['English'])
+    return template.replace("{message}", str(message))
 
 
 # ------------------------------
@@ -668,7 +1097,97 @@ BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
 INDEX_FILE = STATIC_DIR / "index.html"
 
-app = FastAPI(title="AI Doctor Medical Assistance")
+# Startup warm-up (src/warmup.py): /readyz reports ready once it has run
+# Loading BLIP takes minutes and gigabytes, so it is opt-in
+WARMUP_LOCAL_MODELS = os.environ.get("WARMUP_LOCAL_MODELS", "0") == "1"
+WARMUP_GEMINI_MODELS = ["models/gemini-2.5-pro", "models/gemini-1.5-flash"]
+# Render missing canned phrases at startup (one worker at a time) instead of
+# only reporting them; the bank is normally built at deploy time
+WARMUP_RENDER_PHRASE_BANK = os.environ.get("WARMUP_RENDER_PHRASE_BANK", "0") == "1"
+
+def warm_clients():
+    """Import provider and format libraries, build API clients and open the stores"""
+    for name in ("gtts", "docx", "PyPDF2"):
+        providers.get(name)
+    if GEMINI_API_KEY:
+        get_genai()
+    get_groq_client()
+    get_audio_store()
+    get_report_store()
+    get_extraction_cache()
+
+def warm_models():
+    """Build the Gemini model objects the request paths use (cached by get_gemini_model)"""
+    if GEMINI_API_KEY:
+        for model_name in WARMUP_GEMINI_MODELS:
+            get_gemini_model(model_name)
+
+def warm_connections():
+    """Make one minimal request on each path the first requests take
+
+    Gemini gets a one-token generate_content call through the shared
+    generative client (the models service is a different client and
+    endpoint). The Groq client pools connections to its one host, so listing
+    models is enough. gTTS opens a new connection per request, so a one-word
+    synthesis only resolves its host and checks that the endpoint answers.
+    """
+    if GEMINI_API_KEY:
+        get_gemini_model(WARMUP_GEMINI_MODELS[1]).generate_content(
+            "Reply with OK.", generation_config={"max_output_tokens": 1},
+            request_options={"timeout": PROVIDER_TIMEOUT_SECONDS}
+        )
+    groq_client = get_groq_client()
+    if groq_client is not None:
+        groq_client.models.list(timeout=PROVIDER_TIMEOUT_SECONDS)
+    synthesize_speech_bytes("OK", 'en')
+
+def warm_phrase_bank():
+    """Load and check the canned-audio bank; missing phrases are synthesized on demand
+
+    Raises:
+        StepDegraded: The bank is incomplete (and was not filled here)
+    """
+    if bank_is_complete():
+        return
+    if not WARMUP_RENDER_PHRASE_BANK:
+        raise StepDegraded("phrase bank incomplete; build it with python -m src.phrase_bank build")
+    stats = build_gtts_bank_once()
+    if stats is None:
+        raise StepDegraded("phrase bank incomplete; another worker is building it")
+    print(f"INFO: Phrase bank: {stats['rendered']} rendered, {stats['reused']} reused, {stats['failed']} failed")
+    if stats['failed']:
+        raise StepDegraded(f"phrase bank incomplete; {stats['failed']} phrases failed to render")
+
+def create_warmup():
+    """Warm-up with the app's steps (none when WARMUP is off)"""
+    warmup = Warmup()
+    if WARMUP:
+        warmup.step("clients", warm_clients)
+        warmup.step("models", warm_models)
+        warmup.step("connections", warm_connections)
+        if WARMUP_LOCAL_MODELS:
+            warmup.step("local_models", load_huggingface_model)
+        # Canned phrases are synthesized on demand while the bank is incomplete
+        warmup.step("phrase_bank", warm_phrase_bank, blocking=False)
+    return warmup
+
+warmup = create_warmup()
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start background maintenance for the lifetime of the app."""
+    log_provider_status()
+    warmup.start()
+    audio_store = get_audio_store()
+    audio_store.start_sweeper()
+    get_jobs().start()
+    yield
+    get_job_queue().stop(timeout=5)
+    audio_store.stop_sweeper()
+    shutdown_cpu_pool()
+
+
+app = FastAPI(title="AI Doctor Medical Assistance", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -690,37 +1209,139 @@ async def serve_index():
     return INDEX_FILE.read_text(encoding="utf-8")
 
 
+def audio_url_for(audio_id, audio_format=""):
+    """Public URL of a stored audio artifact in the requested encoding."""
+    if not audio_id:
+        return None
+    profile = audio_format.lower() if audio_format else ""
+    if profile in PROFILES:
+        return f"/api/audio/{audio_id}?format={profile}"
+    return f"/api/audio/{audio_id}"
+
+
+async def run_admitted(route, fn, *args, deadline=None, is_disconnected=None):
+    """Run blocking work on the analysis pool; 503 with Retry-After when overloaded.
+
+    With a deadline, the request waits in the queue for at most its remaining time.
+    With is_disconnected (Request.is_disconnected), a client that goes away
+    gives up its place in the queue, and running work stops at its next
+    deadline check; the request then ends with 499.
+    """
+    queue_timeout = None
+    if deadline is not None:
+        queue_timeout = min(admission.queue_timeout, deadline.remaining())
+    started = threading.Event()
+
+    def admitted(*call_args):
+        started.set()
+        return fn(*call_args)
+
+    work = asyncio.ensure_future(admission.run(admitted, *args, route=route, queue_timeout=queue_timeout))
+    watcher = None
+    try:
+        if is_disconnected is not None:
+            watcher = asyncio.ensure_future(watch_disconnect(is_disconnected, deadline))
+            await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not work.done():
+                # The thread, if it started, keeps its slot until it reaches a deadline check
+                work.cancel()
+                await asyncio.wait({work})
+                if not started.is_set():
+                    WORK_RECLAIMED.inc(stage="queue")
+                raise HTTPException(status_code=499, detail="Client closed request.")
+        return await work
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+
 @app.post("/api/analyze-image")
 async def api_analyze_image(
+    request: Request,
     image: UploadFile = File(...),
     analysis_type: str = Form("Full Analysis"),
     language: str = Form("English"),
     gender: str = Form("Male"),
     additional_context: str = Form(""),
+    audio_format: str = Form(""),
+    response_mode: str = Form(""),
 ):
-    """API endpoint: analyze medical image and generate audio."""
+    """API endpoint: analyze medical image and generate audio.
+
+    `audio_format` (mp3, mp3-low, opus) selects the encoding of `audio_url`.
+    `audio_path` is a deprecated alias of `audio_url` (it used to be a server
+    file path for /api/audio?path=) and will be removed in the next release.
+    `response_mode` 'inline' embeds short audio as base64 in the JSON and
+    'multipart' (or Accept: multipart/mixed) returns JSON and audio as
+    multipart/mixed; audio above INLINE_AUDIO_MAX_BYTES is always referenced.
+    Under load a cheaper analysis is served; `quality_tier` and `degraded`
+    in the response say which. The request must finish within
+    REQUEST_DEADLINE_SECONDS; stages that ran out of time are listed in
+    `timed_out` (e.g. text returned without audio). If the client
+    disconnects, the stages still to run are skipped.
+    """
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS)
     try:
         image_bytes = await image.read()
-        pil_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        # Large uploads are decoded on the CPU pool, off this worker's GIL
+        pil_image = await run_in_threadpool(decode_image, image_bytes)
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid image file.")
 
     try:
-        analysis_text, audio_path = analyze_and_speak(
+        tier = quality_governor.admit() if LOAD_SHEDDING else 'full'
+        analysis_text, audio_path = await run_admitted(
+            "analyze-image",
+            analyze_and_speak,
             pil_image,
             analysis_type,
             language,
             gender,
             additional_context,
+            None,
+            tier,
+            deadline,
+            deadline=deadline,
+            is_disconnected=request.is_disconnected,
         )
         
         if not analysis_text:
             raise HTTPException(status_code=500, detail="Failed to analyze image. Please ensure Gemini API key is configured.")
         
-        return {
+        audio_store = get_audio_store()
+        audio_id = audio_store.id_for_path(audio_path)
+        audio_url = audio_url_for(audio_id, audio_format)
+        payload = {
             "analysis": analysis_text,
-            "audio_path": audio_path,
+            "audio_id": audio_id,
+            "audio_url": audio_url,
+            # Deprecated: kept for clients of the old response for one release
+            "audio_path": audio_url,
+            "quality_tier": tier,
+            "degraded": tier != 'full',
+            "timed_out": list(deadline.timed_out),
         }
+
+        mode = choose_response_mode(response_mode, request.headers.get("accept"))
+        if mode == 'reference' or not audio_id:
+            return payload
+
+        profile = negotiate_format(audio_format)
+        served_id, path = await run_in_threadpool(get_variant, audio_store, audio_id, profile)
+        if path is None or path.stat().st_size > INLINE_AUDIO_MAX_BYTES:
+            return payload
+        audio_bytes = path.read_bytes()
+        media_type = audio_store.media_type(path)
+        if mode == 'multipart':
+            return multipart_mixed_response(payload, audio_bytes, media_type, f'"{served_id}"')
+        payload.update(inline_audio_fields(audio_bytes, media_type))
+        return payload
     except HTTPException:
         raise
     except Exception as e:
@@ -731,13 +1352,295 @@ async def api_analyze_image(
         )
 
 
-@app.get("/api/audio")
-async def api_get_audio(path: str):
-    """Serve generated audio file by its path."""
-    if not path or not os.path.exists(path):
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the startup warm-up has finished, 503 while warming.
+
+    The body lists each warm-up step with its state and duration; the status
+    is "degraded" while a step (e.g. an incomplete phrase bank) left a
+    slower fallback in use.
+    """
+    status = warmup.status()
+    if not status['ready']:
+        label = "warming"
+    elif any(step['state'] == 'degraded' for step in status['steps'].values()):
+        label = "degraded"
+    else:
+        label = "ready"
+    return JSONResponse(
+        {"status": label, **status},
+        status_code=200 if status['ready'] else 503,
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_metrics():
+    """Expose process metrics in Prometheus text format."""
+    return metrics.render_prometheus()
+
+
+@app.get("/api/audio/{audio_id}")
+async def api_get_audio(audio_id: str, request: Request, format: str = "", bitrate: str = ""):
+    """Serve generated audio by content hash with caching, 304 and Range support.
+
+    `format` (mp3, mp3-low, opus) or the Accept header selects a compact
+    encoding; transcoded variants are cached in the audio store.
+    """
+    audio_store = get_audio_store()
+    if audio_store.path(audio_id) is None:
         raise HTTPException(status_code=404, detail="Audio file not found.")
-    filename = os.path.basename(path)
-    return FileResponse(path, media_type="audio/mpeg", filename=filename)
+    audio_store.touch(audio_id)
+
+    profile = negotiate_format(format, request.headers.get("accept"))
+    served_id, path = await run_in_threadpool(get_variant, audio_store, audio_id, profile, bitrate or None)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+    extra_headers = {} if format else {"Vary": "Accept"}
+    return immutable_file_response(request, path, f'"{served_id}"', audio_store.media_type(path), extra_headers)
+
+
+@app.get("/api/playlists/{playlist_id}")
+async def api_get_playlist(playlist_id: str):
+    """Return a document playlist manifest."""
+    manifest = get_playlist_store().load(playlist_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Playlist not found.")
+    return public_manifest(manifest, playlist_segment_url)
+
+
+@app.get("/api/playlists/{playlist_id}/segments/{index}")
+async def api_get_playlist_segment(playlist_id: str, index: int, request: Request):
+    """Serve one playlist segment, synthesizing it on first request and prefetching the next.
+
+    404 for an unknown playlist or index; 502 when synthesis fails (retry
+    later); 503 with Retry-After when the analysis pool is saturated. The
+    request waits for a slot at most REQUEST_DEADLINE_SECONDS.
+    """
+    audio_store = get_audio_store()
+    playlists = get_playlist_store()
+    manifest = await run_in_threadpool(playlists.load, playlist_id)
+    if manifest is None or not 0 <= index < len(manifest['segments']):
+        raise HTTPException(status_code=404, detail="Segment not found.")
+
+    args = (playlist_id, index, render_document_segment, audio_store)
+    try:
+        if (await run_in_threadpool(playlists.cached_audio, playlist_id, index, audio_store))[0]:
+            # Already synthesized: no slot needed (the next segment is still prefetched)
+            audio_id, path = await run_in_threadpool(playlists.segment_audio, *args)
+        else:
+            audio_id, path = await run_admitted(
+                "playlist-segment", playlists.segment_audio, *args,
+                deadline=Deadline(REQUEST_DEADLINE_SECONDS), is_disconnected=request.is_disconnected
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"ERROR: Segment synthesis failed: {e}")
+        path = None
+    if path is None:
+        raise HTTPException(status_code=502, detail="Segment audio could not be synthesized, please retry.")
+    return immutable_file_response(request, path, f'"{audio_id}"', audio_store.media_type(path))
+
+
+def document_timeout_error(deadline):
+    """504 naming the stages that ran out of time, or None if none did"""
+    if not deadline.timed_out:
+        return None
+    stages = ", ".join(deadline.timed_out)
+    return HTTPException(status_code=504, detail=f"Document processing ran out of time ({stages}).")
+
+
+@app.post("/api/document-to-speech")
+async def api_document_to_speech(request: Request):
+    """API endpoint: convert an uploaded PDF/DOCX/TXT document to speech.
+
+    Multipart form fields: `file`, `language`, `gender`, `mode` and
+    `audio_format`. The upload is streamed to disk (its digest computed on the
+    way) and rejected with 413 above DOCUMENT_UPLOAD_MAX_BYTES. `mode`
+    'playlist' (default) returns a per-segment playlist; 'audio' returns a
+    single track (a summary for long documents) capped at DOCUMENT_SPEECH_MAX_SECONDS.
+    Parsing, summarizing and synthesis share REQUEST_DEADLINE_SECONDS; a
+    request that runs out of time ends with 504 naming the stages cut short.
+    """
+    try:
+        upload, fields = await spool_upload(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Document too large (limit {e.max_bytes} bytes).")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if upload.suffix not in DOCUMENT_EXTRACTORS:
+            raise HTTPException(status_code=415, detail="Unsupported file format. Use PDF, DOCX, or TXT.")
+        language = fields.get("language", "English")
+        gender = fields.get("gender", "Male")
+        mode = fields.get("mode", "playlist")
+        deadline = Deadline(REQUEST_DEADLINE_SECONDS)
+
+        # Parsing and synthesis are blocking; run them on the admission-controlled pool
+        if mode == "audio":
+            status, audio_path = await run_admitted(
+                "document-to-speech", process_document_to_speech,
+                upload.path, language, gender, upload.digest, upload.filename, deadline,
+                deadline=deadline, is_disconnected=request.is_disconnected
+            )
+            audio_id = get_audio_store().id_for_path(audio_path)
+            if not audio_id:
+                raise document_timeout_error(deadline) or HTTPException(status_code=422, detail=status)
+            return {
+                "status": status,
+                "audio_id": audio_id,
+                "audio_url": audio_url_for(audio_id, fields.get("audio_format", "")),
+            }
+
+        status, playlist = await run_admitted(
+            "document-to-speech", process_document_to_playlist,
+            upload.path, language, gender, upload.digest, upload.filename, deadline,
+            deadline=deadline, is_disconnected=request.is_disconnected
+        )
+        if playlist is None:
+            raise document_timeout_error(deadline) or HTTPException(status_code=422, detail=status)
+        return {"status": status, "playlist": playlist}
+    finally:
+        upload.discard()
+
+
+def job_links(job_id):
+    return {
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events",
+    }
+
+
+async def store_job_image(image, job_id):
+    """Validate an uploaded image and save it as the job's input"""
+    try:
+        pil_image = await run_in_threadpool(decode_image, await image.read())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid image file.")
+    path = get_jobs().job_dir(job_id) / "image.png"
+    await run_in_threadpool(pil_image.save, path)
+    return str(path)
+
+
+@app.post("/api/jobs/image-analysis", status_code=202)
+async def api_submit_image_analysis(
+    image: UploadFile = File(...),
+    language: str = Form("English"),
+    gender: str = Form("Male"),
+    analysis_depth: str = Form("comprehensive"),
+    audio_format: str = Form(""),
+):
+    """Queue an in-depth image analysis; poll status_url or subscribe to events_url."""
+    job_id = new_job_id()
+    image_path = await store_job_image(image, job_id)
+    payload = {
+        "image_path": image_path,
+        "language": language,
+        "gender": gender,
+        "analysis_depth": analysis_depth,
+        "audio_format": audio_format,
+    }
+    await run_in_threadpool(get_jobs().submit, "image-analysis", payload, job_id=job_id)
+    return job_links(job_id)
+
+
+@app.post("/api/jobs/multilingual-analysis", status_code=202)
+async def api_submit_multilingual_analysis(
+    image: UploadFile = File(...),
+    languages: str = Form(...),
+    analysis_type: str = Form("Full Analysis"),
+    gender: str = Form("Male"),
+    additional_context: str = Form(""),
+    audio_format: str = Form(""),
+):
+    """Queue an image analysis voiced in several languages (comma-separated)."""
+    language_list = [language.strip() for language in languages.split(",") if language.strip()]
+    if not language_list:
+        raise HTTPException(status_code=400, detail="No languages given.")
+    job_id = new_job_id()
+    image_path = await store_job_image(image, job_id)
+    payload = {
+        "image_path": image_path,
+        "languages": language_list,
+        "analysis_type": analysis_type,
+        "gender": gender,
+        "additional_context": additional_context,
+        "audio_format": audio_format,
+    }
+    await run_in_threadpool(get_jobs().submit, "multilingual-analysis", payload, job_id=job_id)
+    return job_links(job_id)
+
+
+@app.post("/api/jobs/document-narration", status_code=202)
+async def api_submit_document_narration(request: Request):
+    """Queue narration of a whole uploaded document (form fields as /api/document-to-speech)."""
+    try:
+        upload, fields = await spool_upload(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Document too large (limit {e.max_bytes} bytes).")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if upload.suffix not in DOCUMENT_EXTRACTORS:
+            raise HTTPException(status_code=415, detail="Unsupported file format. Use PDF, DOCX, or TXT.")
+        queue = get_jobs()
+        job_id = new_job_id()
+        path = str(queue.job_dir(job_id) / f"document{upload.suffix}")
+        await run_in_threadpool(shutil.move, upload.path, path)
+        payload = {
+            "path": path,
+            "digest": upload.digest,
+            "title": upload.filename,
+            "language": fields.get("language", "English"),
+            "gender": fields.get("gender", "Male"),
+        }
+        await run_in_threadpool(queue.submit, "document-narration", payload, job_id=job_id)
+        return job_links(job_id)
+    finally:
+        upload.discard()
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_get_job(job_id: str):
+    """Return a job's status, progress and (when finished) result."""
+    job = await run_in_threadpool(get_jobs().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return public_job(job)
+
+
+@app.delete("/api/jobs/{job_id}")
+async def api_cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    queue = get_jobs()
+    if not await run_in_threadpool(queue.cancel, job_id):
+        job = await run_in_threadpool(queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}.")
+    return public_job(await run_in_threadpool(queue.get, job_id))
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def api_job_events(job_id: str, request: Request):
+    """Server-Sent Events stream of a job's status until it finishes."""
+    queue = get_jobs()
+    if await run_in_threadpool(queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return StreamingResponse(
+        job_events(queue, job_id, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
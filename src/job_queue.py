@@ -0,0 +1,485 @@
+# BACKGROUND JOB QUEUE
+# Long-running work (comprehensive analyses, whole-document narration,
+# multi-language renders) is submitted as a job stored in SQLite and run by a
+# small pool of worker threads. Jobs are retried with exponential backoff,
+# can be cancelled, and survive restarts: a running job holds a lease that
+# its worker renews, and jobs whose lease expires (or whose local worker
+# process died) are picked up again. The database can be shared by several
+# gunicorn workers on the same host, but not across hosts: SQLite over a
+# network filesystem is unsafe, so a job id is only known to the node that
+# accepted it. Multi-node deployments route /api/jobs/* with sticky sessions.
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from src import metrics
+
+JOB_DB_PATH = Path(os.environ.get("JOB_DB_PATH", Path(tempfile.gettempdir()) / "ai_doctor_jobs.sqlite3"))
+JOB_FILES_DIR = Path(os.environ.get("JOB_FILES_DIR", Path(tempfile.gettempdir()) / "ai_doctor_job_files"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", "300"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+# Finished jobs (and their files) are deleted after this long
+JOB_RESULT_TTL_SECONDS = int(os.environ.get("JOB_RESULT_TTL_SECONDS", str(24 * 3600)))
+
+TERMINAL_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+QUEUE_DEPTH = metrics.gauge("job_queue_depth", "Jobs waiting to run")
+WAIT_SECONDS = metrics.histogram("job_wait_seconds", "Time jobs waited in the queue before starting")
+RUN_SECONDS = metrics.histogram("job_run_seconds", "Time spent running job attempts",
+                                buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+JOBS_FINISHED = metrics.counter("jobs_finished_total", "Jobs by final status")
+JOB_RETRIES = metrics.counter("job_retries_total", "Failed job attempts scheduled for retry")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_until REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    progress TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobFailed(Exception):
+    """Raise from a handler to fail a job without retrying it"""
+
+
+class JobContext:
+    """Handle passed to job handlers"""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job_id = job['id']
+        self.attempt = job['attempts']
+        self.files = queue.job_dir(self.job_id)
+
+    def cancelled(self):
+        return self.queue.cancel_requested(self.job_id)
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job was cancelled; call between steps"""
+        if self.cancelled():
+            raise JobCancelled(self.job_id)
+
+    def progress(self, done, total):
+        self.queue.set_progress(self.job_id, done, total)
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobQueue:
+    """SQLite-backed job queue with a local worker pool"""
+
+    def __init__(self, db_path=JOB_DB_PATH, files_dir=JOB_FILES_DIR, workers=JOB_WORKERS,
+                 lease_seconds=JOB_LEASE_SECONDS, poll_seconds=JOB_POLL_SECONDS,
+                 retry_base_seconds=JOB_RETRY_BASE_SECONDS, retry_max_seconds=JOB_RETRY_MAX_SECONDS):
+        self.db_path = Path(db_path)
+        self.files_dir = Path(files_dir)
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers = {}
+        self._local = threading.local()
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    # ---- storage -------------------------------------------------------
+
+    def _connect(self):
+        # One connection per thread; autocommit, explicit transactions where needed
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def job_dir(self, job_id):
+        """Directory for a job's input files (removed with the job)"""
+        path = self.files_dir / job_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    # ---- client API ----------------------------------------------------
+
+    def register(self, kind, handler):
+        """Register handler(payload, context) -> JSON-serializable result for a job kind"""
+        self.handlers[kind] = handler
+
+    def submit(self, kind, payload, max_attempts=JOB_MAX_ATTEMPTS, job_id=None):
+        """
+        Queue a job
+
+        Args:
+            kind: Registered job kind
+            payload: JSON-serializable handler arguments
+            max_attempts: Attempts before the job is marked failed
+            job_id: Explicit id (e.g. when input files were written to job_dir first)
+
+        Returns:
+            str: Job id
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = job_id or new_job_id()
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, payload, status, max_attempts, run_after, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), max_attempts, now, now, now),
+        )
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return a job as a dict (payload, progress and result decoded), or None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ('payload', 'progress', 'result'):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: queued jobs stop at once, running jobs at their next check
+
+        Returns:
+            bool: False if the job does not exist or has already finished
+        """
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT kind FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return False
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued'", (now, now, job_id))
+        if cursor.rowcount:
+            JOBS_FINISHED.inc(kind=row['kind'], status='cancelled')
+            self._remove_files(job_id)
+            return True
+        cursor = conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = 'running'", (now, job_id))
+        return cursor.rowcount > 0
+
+    def cancel_requested(self, job_id):
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def set_progress(self, job_id, done, total):
+        self._connect().execute("UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                                (json.dumps({'done': done, 'total': total}), time.time(), job_id))
+
+    def depth(self):
+        """Number of jobs waiting to run"""
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    # ---- execution -----------------------------------------------------
+
+    def claim(self, now=None):
+        """Take the next runnable job (queued and due, or running with an expired lease)"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY run_after LIMIT 1", (now, now)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                job = dict(row)
+                if job['status'] == 'running' and (job['cancel_requested'] or job['attempts'] >= job['max_attempts']):
+                    # The worker running it was lost; do not start it again
+                    status = 'cancelled' if job['cancel_requested'] else 'failed'
+                    conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ?, owner = NULL "
+                                 "WHERE id = ?", (status, job['error'] or "Worker lost", now, now, job['id']))
+                    JOBS_FINISHED.inc(kind=job['kind'], status=status)
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_until = ?, "
+                    "started_at = ?, updated_at = ? WHERE id = ?",
+                    (self.owner, now + self.lease_seconds, now, now, job['id']))
+                conn.execute("COMMIT")
+                break
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        WAIT_SECONDS.observe(max(0.0, now - job['run_after']))
+        job.update(status='running', attempts=job['attempts'] + 1, owner=self.owner,
+                   lease_until=now + self.lease_seconds, started_at=now)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def run_one(self):
+        """Claim and run one job; returns False if none was runnable"""
+        job = self.claim()
+        if job is None:
+            return False
+        self._execute(job)
+        return True
+
+    def _execute(self, job):
+        job_id = job['id']
+        with self._running_lock:
+            self._running.add(job_id)
+        start = time.monotonic()
+        try:
+            handler = self.handlers.get(job['kind'])
+            if handler is None:
+                raise JobFailed(f"No handler for job kind '{job['kind']}'")
+            context = JobContext(self, job)
+            context.check_cancelled()
+            result = handler(job['payload'], context)
+            status = 'cancelled' if context.cancelled() else 'succeeded'
+            self._finish(job, status, result=result)
+        except JobCancelled:
+            self._finish(job, 'cancelled')
+        except JobFailed as e:
+            self._finish(job, 'failed', error=str(e))
+        except Exception as e:
+            print(f"ERROR: Job {job_id} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            if job['attempts'] < job['max_attempts'] and not self.cancel_requested(job_id):
+                self._retry(job, str(e))
+            else:
+                self._finish(job, 'failed', error=str(e))
+        finally:
+            RUN_SECONDS.observe(time.monotonic() - start)
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def retry_delay(self, attempts):
+        """Backoff before the next attempt: exponential, capped, with jitter"""
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _retry(self, job, error):
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'queued', run_after = ?, error = ?, owner = NULL, lease_until = NULL, "
+            "updated_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (now + self.retry_delay(job['attempts']), error, now, job['id'], self.owner))
+        if cursor.rowcount:
+            JOB_RETRIES.inc(kind=job['kind'])
+
+    def _finish(self, job, status, result=None, error=None):
+        now = time.time()
+        # Only the current lease holder may finish a job (another worker may have reclaimed it)
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ?, "
+            "owner = NULL, lease_until = NULL WHERE id = ? AND owner = ? AND status = 'running'",
+            (status, json.dumps(result) if result is not None else None, error, now, now, job['id'], self.owner))
+        if cursor.rowcount:
+            JOBS_FINISHED.inc(kind=job['kind'], status=status)
+            self._remove_files(job['id'])
+
+    def _remove_files(self, job_id):
+        shutil.rmtree(self.files_dir / job_id, ignore_errors=True)
+
+    # ---- maintenance ---------------------------------------------------
+
+    def renew_leases(self):
+        with self._running_lock:
+            running = list(self._running)
+        if not running:
+            return
+        now = time.time()
+        placeholders = ",".join("?" * len(running))
+        self._connect().execute(
+            f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'running' AND id IN ({placeholders})",
+            (now + self.lease_seconds, self.owner, *running))
+
+    def recover(self):
+        """
+        Release jobs held by dead worker processes on this host
+
+        Their leases are expired so that the next claim restarts them
+        (counted as a new attempt) without waiting for the lease timeout.
+
+        Returns:
+            int: Number of jobs released
+        """
+        host = socket.gethostname()
+        released = 0
+        conn = self._connect()
+        for row in conn.execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall():
+            owner_host, _, pid = (row['owner'] or "").rpartition(":")
+            if owner_host != host or not pid.isdigit() or row['owner'] == self.owner or _pid_alive(int(pid)):
+                continue
+            released += conn.execute("UPDATE jobs SET lease_until = 0 WHERE id = ? AND owner = ?",
+                                     (row['id'], row['owner'])).rowcount
+        if released:
+            self._wake.set()
+        return released
+
+    def sweep(self, now=None):
+        """Delete finished jobs older than JOB_RESULT_TTL_SECONDS; returns the number removed"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        placeholders = ",".join("?" * len(TERMINAL_STATUSES))
+        rows = conn.execute(f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                            (*TERMINAL_STATUSES, now - JOB_RESULT_TTL_SECONDS)).fetchall()
+        for row in rows:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (row['id'],))
+            self._remove_files(row['id'])
+        return len(rows)
+
+    # ---- worker pool ---------------------------------------------------
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_one()
+            except Exception as e:
+                print(f"ERROR: Job worker error: {e}")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def _maintenance_loop(self):
+        last_sweep = 0.0
+        while not self._stop.wait(max(1.0, self.lease_seconds / 3)):
+            try:
+                self.renew_leases()
+                self.recover()
+                if time.monotonic() - last_sweep > 3600:
+                    self.sweep()
+                    last_sweep = time.monotonic()
+            except Exception as e:
+                print(f"ERROR: Job queue maintenance failed: {e}")
+
+    def start(self):
+        """Recover jobs from crashed workers and start the worker threads (idempotent)"""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        self.recover()
+        QUEUE_DEPTH.set_function(self.depth)
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._maintenance_loop, name="job-maintenance", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the workers; running jobs keep their lease and are resumed after a restart"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+def public_job(job):
+    """Client view of a job"""
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'progress': job['progress'],
+        'result': job['result'],
+        'error': job['error'] if job['status'] != 'succeeded' else None,
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at'],
+    }
+
+
+async def job_events(queue, job_id, poll_seconds=0.5, is_disconnected=None):
+    """
+    Yield Server-Sent Events with the job state whenever it changes
+
+    The job may run in another worker process, so its row is polled. The
+    stream ends once the job has finished or the client disconnects.
+    """
+    last = None
+    while True:
+        job = await run_in_threadpool(queue.get, job_id)
+        if job is None:
+            yield "event: error\ndata: {\"error\": \"Job not found\"}\n\n"
+            return
+        state = public_job(job)
+        if state != last:
+            yield f"event: status\ndata: {json.dumps(state)}\n\n"
+            last = state
+        if job['status'] in TERMINAL_STATUSES:
+            return
+        if is_disconnected is not None and await is_disconnected():
+            return
+        await asyncio.sleep(poll_seconds)
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue"""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
@@ -0,0 +1,83 @@
+# QUALITY-TIERED LOAD SHEDDING
+# When the analysis pool is saturated, new requests are served at a cheaper
+# quality tier (shorter prompt, fewer output tokens, no audio) instead of
+# queueing into timeouts. Tiers go down as soon as pressure crosses a
+# threshold and come back one step at a time, only after pressure has stayed
+# well below that threshold for a cool-down period, so the service does not
+# flap between tiers at the edge of saturation.
+
+import os
+import threading
+import time
+
+from src import metrics
+
+# Tiers from best to cheapest
+TIERS = ('full', 'reduced', 'minimal')
+
+# Pressure is (running + queued) / slots; 1.0 means every slot is busy
+SHED_REDUCED_AT = float(os.environ.get("SHED_REDUCED_AT", "1.0"))
+SHED_MINIMAL_AT = float(os.environ.get("SHED_MINIMAL_AT", "1.5"))
+# A tier is left once pressure is below this fraction of its threshold...
+SHED_RECOVER_RATIO = float(os.environ.get("SHED_RECOVER_RATIO", "0.7"))
+# ...for this long
+SHED_COOLDOWN_SECONDS = float(os.environ.get("SHED_COOLDOWN_SECONDS", "10"))
+
+TIER_LEVEL = metrics.gauge("quality_tier_level", "Current quality tier (0 = full)")
+TIER_REQUESTS = metrics.counter("quality_tier_requests_total", "Requests served by quality tier")
+TIER_CHANGES = metrics.counter("quality_tier_changes_total", "Quality tier transitions")
+
+
+class QualityGovernor:
+    """Pick the quality tier for new requests from a pressure signal, with hysteresis"""
+
+    def __init__(self, pressure, thresholds=None, recover_ratio=SHED_RECOVER_RATIO,
+                 cooldown=SHED_COOLDOWN_SECONDS, clock=time.monotonic):
+        """
+        Args:
+            pressure: Callable returning the current load (1.0 = saturated)
+            thresholds: Pressure at which each tier after 'full' starts
+            recover_ratio: Fraction of a tier's threshold pressure must fall below to leave it
+            cooldown: Seconds pressure must stay low before moving up one tier
+            clock: Monotonic clock (tests pass a fake)
+        """
+        self.pressure = pressure
+        self.thresholds = tuple(thresholds or (SHED_REDUCED_AT, SHED_MINIMAL_AT))
+        self.recover_ratio = recover_ratio
+        self.cooldown = cooldown
+        self.clock = clock
+        self.level = 0
+        self._calm_since = None
+        self._lock = threading.Lock()
+        TIER_LEVEL.set(0)
+
+    def _set_level(self, level):
+        TIER_CHANGES.inc(source=TIERS[self.level], target=TIERS[level])
+        self.level = level
+        TIER_LEVEL.set(level)
+
+    def current(self):
+        """Update the tier from the current pressure and return its name"""
+        pressure = self.pressure()
+        now = self.clock()
+        with self._lock:
+            target = sum(1 for threshold in self.thresholds if pressure >= threshold)
+            if target > self.level:
+                self._set_level(target)
+                self._calm_since = None
+            elif self.level and pressure < self.thresholds[self.level - 1] * self.recover_ratio:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.cooldown:
+                    self._set_level(self.level - 1)
+                    # The next step up needs its own calm period
+                    self._calm_since = now
+            else:
+                self._calm_since = None
+            return TIERS[self.level]
+
+    def admit(self):
+        """Return the tier a new request is served at (counted in the metrics)"""
+        tier = self.current()
+        TIER_REQUESTS.inc(tier=tier)
+        return tier
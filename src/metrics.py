@@ -0,0 +1,162 @@
+# LIGHTWEIGHT IN-PROCESS METRICS
+# Counters, gauges and histograms exposed in Prometheus text format at /metrics.
+# Values are per process (each gunicorn worker reports its own).
+
+import threading
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list(extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class Counter:
+    """Monotonically increasing value, optionally split by labels"""
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()] or [(self.name, (), 0)]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, or be computed on scrape"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text=""):
+        super().__init__(name, help_text)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Compute the value by calling function() at scrape time"""
+        self._function = function
+
+    def value(self, **labels):
+        if self._function is not None and not labels:
+            return self._function()
+        return super().value(**labels)
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [(self.name, (), self._function())]
+            except Exception:
+                return []
+        return super().samples()
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def samples(self):
+        with self._lock:
+            samples = [
+                (self.name + "_bucket", (), count, [("le", bound)])
+                for bound, count in zip(self.buckets, self._counts)
+            ]
+            samples.append((self.name + "_bucket", (), self._count, [("le", "+Inf")]))
+            samples.append((self.name + "_sum", (), self._sum))
+            samples.append((self.name + "_count", (), self._count))
+            return samples
+
+
+def _get_or_create(cls, name, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, *args, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+
+def counter(name, help_text=""):
+    """Get or create a counter"""
+    return _get_or_create(Counter, name, help_text)
+
+
+def gauge(name, help_text=""):
+    """Get or create a gauge"""
+    return _get_or_create(Gauge, name, help_text)
+
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS):
+    """Get or create a histogram"""
+    return _get_or_create(Histogram, name, help_text, buckets)
+
+
+def render_prometheus():
+    """Render every registered metric in Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+
+    lines = []
+    for metric in sorted(metrics, key=lambda m: m.name):
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample in metric.samples():
+            name, key, value = sample[:3]
+            extra = sample[3] if len(sample) > 3 else None
+            lines.append(f"{name}{_format_labels(key, extra)} {value}")
+    return "\n".join(lines) + "\n"
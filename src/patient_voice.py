@@ -5,18 +5,10 @@ import logging
 import speech_recognition as sr 
 from pydub import AudioSegment  
 from io import BytesIO
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai  # type: ignore
 
-load_dotenv()
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)  # type: ignore
+from src import providers
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-def record_audio_advanced(file_path, timeout=30, phrase_time_limit=60, quality='high'):
+def record_audio_advanced(file_path, timeout=30, phrase_time_limit=60, quality='speech'):
     """
     Advanced audio recording with quality options
     
@@ -24,7 +16,8 @@ def record_audio_advanced(file_path, timeout=30, phrase_time_limit=60, quality='
         file_path: Path to save audio
         timeout: Wait time for speech start (seconds)
         phrase_time_limit: Max recording duration (seconds)
-        quality: 'low' (64k), 'medium' (128k), 'high' (192k), 'ultra' (320k)
+        quality: 'speech' (48k mono, enough for transcription), 'low' (64k),
+                 'medium' (128k), 'high' (192k), 'ultra' (320k)
     
     Returns:
         bool: Success status
@@ -33,12 +26,13 @@ def record_audio_advanced(file_path, timeout=30, phrase_time_limit=60, quality='
     
     # Quality settings
     bitrates = {
+        'speech': '48k',
         'low': '64k',
         'medium': '128k',
         'high': '192k',
         'ultra': '320k'
     }
-    bitrate = bitrates.get(quality, '192k')
+    bitrate = bitrates.get(quality, '48k')
     
     try:
         with sr.Microphone(sample_rate=48000) as source:
@@ -59,6 +53,8 @@ def record_audio_advanced(file_path, timeout=30, phrase_time_limit=60, quality='
             
             # Enhance audio (normalize volume)
             audio_segment = audio_segment.normalize()  # type: ignore
+            if quality == 'speech':
+                audio_segment = audio_segment.set_channels(1)  # type: ignore
             
             audio_segment.export(file_path, format="mp3", bitrate=bitrate)  # type: ignore
 
@@ -85,6 +81,8 @@ def transcribe_and_analyze_advanced(audio_file, language='English', include_anal
         str: Transcription with optional medical analysis
     """
     try:
+        # Gemini is configured from GEMINI_API_KEY on first use
+        genai = providers.get("genai")
         audio_file_obj = genai.upload_file(path=audio_file)  # type: ignore
         model = genai.GenerativeModel('gemini-flash-lite-latest')  # type: ignore
         
@@ -158,6 +156,11 @@ Accurate transcription:
         return f"Transcription error: {str(e)}"
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
     print("=" * 80)
     print("ADVANCED PATIENT VOICE RECORDING & ANALYSIS SYSTEM")
     print("=" * 80)
@@ -168,7 +171,7 @@ if __name__ == "__main__":
     print("\n[STEP 1: AUDIO RECORDING]")
     print("Please describe your symptoms in detail...\n")
     
-    if record_audio_advanced(file_path=audio_file_path, timeout=30, phrase_time_limit=60, quality='high'):
+    if record_audio_advanced(file_path=audio_file_path, timeout=30, phrase_time_limit=60, quality='speech'):
         
         # Step 2: Advanced transcription with medical analysis
         print("\n[STEP 2: TRANSCRIPTION & MEDICAL ANALYSIS]")
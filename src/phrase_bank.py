@@ -0,0 +1,368 @@
+# PRE-RENDERED PHRASE AUDIO BANK
+# Canned replies, disclaimers and section headers rendered once at build time
+# and spliced with freshly synthesized audio at runtime.
+#
+# Build the bank (run at deploy time):
+#     python -m src.phrase_bank build
+#
+# Workers only check the bank at startup. With WARMUP_RENDER_PHRASE_BANK=1
+# one worker fills the gaps instead, holding a lock file in the bank
+# directory so the others do not render the same phrases.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+BANK_DIR = Path(os.environ.get(
+    "PHRASE_BANK_DIR",
+    Path(__file__).resolve().parent.parent / "assets" / "phrase_bank"
+))
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+_LOCK_NAME = ".build.lock"
+
+GENDERS = ['Male', 'Female']
+
+# Standard disclaimers appended to medical answers
+STANDARD_DISCLAIMERS = {
+    'English': [
+        "This is an AI-generated analysis. Please consult a licensed doctor before taking any medicine.",
+        "If symptoms worsen, consult a doctor immediately.",
+    ],
+    'Hindi': [
+        "यह AI द्वारा तैयार किया गया विश्लेषण है। कोई भी दवा लेने से पहले कृपया डॉक्टर से सलाह लें।",
+        "अगर लक्षण बढ़ें तो तुरंत डॉक्टर से मिलें।",
+    ],
+    'Hinglish': [
+        "Yeh AI analysis hai. Koi bhi medicine lene se pehle doctor se zaroor consult karein.",
+        "Agar symptoms badh jaayein toh turant doctor se milein.",
+    ],
+    'Telugu': [
+        "ఇది AI విశ్లేషణ మాత్రమే. ఏదైనా మందు వాడే ముందు దయచేసి వైద్యుడిని సంప్రదించండి.",
+        "లక్షణాలు పెరిగితే వెంటనే వైద్యుడిని సంప్రదించండి.",
+    ],
+    'Chhattisgarhi': [
+        "ये AI के बनाए विश्लेषण हे। कोनो दवाई खाए के पहिली डाक्टर ले जरूर सलाह लेव।",
+        "अगर लक्षण बाढ़ जाए त तुरते डाक्टर ले मिलव।",
+    ],
+}
+
+# Section headers used by the analysis prompts (models echo them back verbatim)
+SECTION_HEADERS = [
+    "MEDICAL REPORT:", "SYMPTOMS:", "DIAGNOSIS:", "TREATMENT:", "URGENCY:", "ADVICE:",
+    "TREATMENT PLAN:", "PREVENTION:", "CLINICAL FINDINGS:", "DIFFERENTIAL DIAGNOSIS:",
+    "TREATMENT RECOMMENDATIONS:", "URGENCY ASSESSMENT:", "PATIENT EDUCATION:",
+    "Medicines:", "Instructions:", "Warnings:",
+]
+
+# A banked phrase may start at the beginning of the text, of a line or of a
+# sentence, optionally after a list marker ("1." / "-" / "•")
+_BOUNDARY_RE = re.compile(r'\n|(?<=[.!?।:]) +')
+_LIST_MARKER_RE = re.compile(r'(?:\d+[.)] *|[-•] *)?')
+
+_manifest_lock = threading.Lock()
+_manifest_cache = {'mtime': None, 'index': {}}
+
+
+def normalize_text(text):
+    """Collapse runs of spaces and blank lines so lookups ignore layout differences"""
+    text = re.sub(r'[ \t\r\f\v]+', ' ', str(text))
+    text = re.sub(r' ?\n[ \n]*', '\n', text)
+    return text.strip()
+
+
+def phrase_key(text):
+    """Stable short digest for a phrase"""
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()[:16]
+
+
+def collect_phrases():
+    """
+    Collect every canned phrase per language
+
+    Returns:
+        dict: {language: [phrase, ...]}
+    """
+    from src.gradio_app_advanced import COMMON_RESPONSES, FALLBACK_RESPONSES, LANGUAGES
+
+    phrases = {language: [] for language in LANGUAGES}
+
+    for per_language in COMMON_RESPONSES.values():
+        for language, text in per_language.items():
+            phrases.setdefault(language, []).append(text)
+
+    # Fallback templates: bank the static text around the dynamic message
+    for language, template in FALLBACK_RESPONSES.items():
+        for part in template.split("{message}"):
+            if part.strip():
+                phrases.setdefault(language, []).append(part)
+
+    for language, disclaimers in STANDARD_DISCLAIMERS.items():
+        phrases.setdefault(language, []).extend(disclaimers)
+
+    for language in phrases:
+        phrases[language].extend(SECTION_HEADERS)
+
+    # Normalize and de-duplicate, preserving order
+    return {
+        language: list(dict.fromkeys(normalize_text(p) for p in items if normalize_text(p)))
+        for language, items in phrases.items()
+    }
+
+
+def load_manifest(bank_dir=None):
+    """Load the bank manifest, or an empty one if the bank has not been built"""
+    manifest_path = Path(bank_dir or BANK_DIR) / MANIFEST_NAME
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'entries': []}
+
+
+def _get_index(bank_dir=None):
+    """
+    Return {(language, gender): {phrase: file_path}} for the current manifest
+
+    The index is rebuilt whenever the manifest file changes on disk.
+    """
+    bank_dir = Path(bank_dir or BANK_DIR)
+    manifest_path = bank_dir / MANIFEST_NAME
+    try:
+        mtime = (str(manifest_path), manifest_path.stat().st_mtime)
+    except OSError:
+        return {}
+
+    with _manifest_lock:
+        if _manifest_cache['mtime'] != mtime:
+            index = {}
+            for entry in load_manifest(bank_dir)['entries']:
+                path = bank_dir / entry['file']
+                if path.exists():
+                    key = (entry['language'], entry['gender'])
+                    index.setdefault(key, {})[entry['text']] = str(path)
+            _manifest_cache['index'] = index
+            _manifest_cache['mtime'] = mtime
+        return _manifest_cache['index']
+
+
+def plan_segments(text, language='English', gender='Male', bank_dir=None):
+    """
+    Split text into banked and dynamic segments
+
+    Args:
+        text: Text to be spoken
+        language: Voice language
+        gender: Voice gender
+        bank_dir: Optional bank directory override
+
+    Returns:
+        list: [('bank', file_path) | ('text', segment), ...] covering the whole text
+    """
+    text = normalize_text(text)
+    phrases = _get_index(bank_dir).get((language, gender), {})
+    if not text or not phrases:
+        return [('text', text)] if text else []
+
+    ordered = sorted(phrases, key=len, reverse=True)
+    candidates = [0] + [m.end() for m in _BOUNDARY_RE.finditer(text)]
+    segments = []
+    pending_start = 0
+
+    for candidate in candidates:
+        if candidate < pending_start:
+            continue
+        start = _LIST_MARKER_RE.match(text, candidate).end()
+        for phrase in ordered:
+            end = start + len(phrase)
+            if text.startswith(phrase, start) and (end == len(text) or text[end] in ' \n'):
+                dynamic = text[pending_start:start].strip()
+                if dynamic:
+                    segments.append(('text', dynamic))
+                segments.append(('bank', phrases[phrase]))
+                pending_start = end
+                break
+
+    remainder = text[pending_start:].strip()
+    if remainder:
+        segments.append(('text', remainder))
+    return segments
+
+
+def render_with_bank(text, language, gender, synthesize, bank_dir=None):
+    """
+    Assemble audio for text from banked phrases and synthesized segments
+
+    Args:
+        text: Text to be spoken
+        language: Voice language
+        gender: Voice gender
+        synthesize: Callable(segment_text) -> MP3 bytes for non-banked segments
+        bank_dir: Optional bank directory override
+
+    Returns:
+        bytes: MP3 audio, or None when no banked phrase occurs in the text
+    """
+    segments = plan_segments(text, language, gender, bank_dir)
+    if not any(kind == 'bank' for kind, _ in segments):
+        return None
+
+    parts = []
+    for kind, value in segments:
+        if kind == 'bank':
+            with open(value, 'rb') as f:
+                parts.append(f.read())
+        else:
+            parts.append(synthesize(value))
+    # MP3 streams are sequences of independent frames, so byte concatenation splices cleanly
+    return b''.join(parts)
+
+
+def build_bank(render, bank_dir=None, languages=None, force=False, voice_key=None):
+    """
+    Render every canned phrase x language x gender into the bank
+
+    Args:
+        render: Callable(text, language, gender) -> MP3 bytes
+        bank_dir: Output directory (defaults to assets/phrase_bank)
+        languages: Optional subset of languages to build (the manifest keeps
+                   the entries of the other languages)
+        force: Re-render phrases even if their audio already exists
+        voice_key: Optional callable(language, gender) -> str naming the voice
+                   actually used; renders that share a voice share one file
+
+    Returns:
+        dict: {'rendered': n, 'reused': n, 'failed': n}
+    """
+    bank_dir = Path(bank_dir or BANK_DIR)
+    bank_dir.mkdir(parents=True, exist_ok=True)
+    voice_key = voice_key or (lambda language, gender: f"{language}_{gender}")
+
+    stats = {'rendered': 0, 'reused': 0, 'failed': 0}
+    phrases_by_language = collect_phrases()
+    built = [language for language in phrases_by_language if not languages or language in languages]
+    # Languages not rebuilt this time keep their existing manifest entries
+    entries = [
+        entry for entry in load_manifest(bank_dir)['entries']
+        if entry['language'] not in built and (bank_dir / entry['file']).exists()
+    ]
+
+    for language, phrases in phrases_by_language.items():
+        if language not in built:
+            continue
+        for gender in GENDERS:
+            voice = voice_key(language, gender)
+            for phrase in phrases:
+                relative = f"{voice}/{phrase_key(phrase)}.mp3"
+                target = bank_dir / relative
+                if target.exists() and target.stat().st_size > 0 and not force:
+                    stats['reused'] += 1
+                else:
+                    try:
+                        audio = render(phrase, language, gender)
+                        if not audio:
+                            raise ValueError("empty audio")
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        # Per-process temp names: several workers may fill the bank at once
+                        tmp_path = target.with_suffix(f'.{os.getpid()}.tmp')
+                        with open(tmp_path, 'wb') as f:
+                            f.write(audio)
+                        os.replace(tmp_path, target)
+                        stats['rendered'] += 1
+                    except Exception as e:
+                        print(f"✗ Failed to render {language}/{gender} phrase '{phrase[:40]}': {e}")
+                        stats['failed'] += 1
+                        continue
+                entries.append({'language': language, 'gender': gender, 'text': phrase, 'file': relative})
+
+    manifest = {'version': MANIFEST_VERSION, 'entries': entries}
+    tmp_manifest = bank_dir / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_manifest, bank_dir / MANIFEST_NAME)
+    return stats
+
+
+def build_gtts_bank(bank_dir=None, languages=None, force=False):
+    """Build the bank with gTTS, the app's synthesizer; returns build_bank's stats"""
+    from src.gradio_app_advanced import GTTS_LANG_CODES, synthesize_speech_bytes
+
+    def lang_code(language):
+        return GTTS_LANG_CODES.get(language, 'en')
+
+    return build_bank(
+        lambda text, language, gender: synthesize_speech_bytes(text, lang_code(language)),
+        bank_dir=bank_dir,
+        languages=languages,
+        force=force,
+        # gTTS has a single voice per language code, so genders share files
+        voice_key=lambda language, gender: f"gtts_{lang_code(language)}"
+    )
+
+
+def build_gtts_bank_once(bank_dir=None):
+    """
+    Fill the gaps in the bank unless another process is already doing it
+
+    Returns:
+        dict: build_bank's stats, or None if another process holds the build lock
+    """
+    bank_dir = Path(bank_dir or BANK_DIR)
+    bank_dir.mkdir(parents=True, exist_ok=True)
+    with open(bank_dir / _LOCK_NAME, 'a') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+        # A build that held the lock just before may have finished it
+        if bank_is_complete(bank_dir):
+            return {'rendered': 0, 'reused': 0, 'failed': 0}
+        return build_gtts_bank(bank_dir=bank_dir)
+
+
+def bank_is_complete(bank_dir=None):
+    """Whether every canned phrase has audio for every gender in the bank"""
+    index = _get_index(bank_dir)
+    return all(
+        phrase in index.get((language, gender), {})
+        for language, phrases in collect_phrases().items()
+        for gender in GENDERS
+        for phrase in phrases
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render the canned phrase audio bank")
+    parser.add_argument('command', choices=['build', 'list'])
+    parser.add_argument('--bank-dir', default=None, help="Output directory (default: assets/phrase_bank)")
+    parser.add_argument('--languages', nargs='*', default=None)
+    parser.add_argument('--force', action='store_true', help="Re-render existing phrases")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for language, phrases in collect_phrases().items():
+            print(f"{language}: {len(phrases)} phrases")
+        return 0
+
+    stats = build_gtts_bank(bank_dir=args.bank_dir, languages=args.languages, force=args.force)
+    print(f"Phrase bank: {stats['rendered']} rendered, {stats['reused']} reused, {stats['failed']} failed")
+    # A partial bank is still usable (missing phrases are synthesized at runtime)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
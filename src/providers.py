@@ -0,0 +1,86 @@
+# PROVIDER REGISTRY
+# Provider SDKs (Gemini, Groq, gTTS) and document format libraries are
+# imported on first use instead of at startup. google.generativeai alone
+# takes most of a second to import, which every cold start paid before the
+# first request could be served. Each provider has a loader that runs once
+# per process; loaders of API clients also configure them from the
+# environment, so importing a module never configures a client.
+
+import importlib
+import os
+import threading
+
+_loaders = {}
+_loaded = {}
+# Re-entrant: a loader may get() another provider
+_lock = threading.RLock()
+
+
+def register(name, loader):
+    """
+    Register a provider
+
+    Args:
+        name: Provider name used with get()
+        loader: Callable() -> provider object, called on first use
+    """
+    with _lock:
+        _loaders[name] = loader
+        _loaded.pop(name, None)
+
+
+def get(name):
+    """
+    Return a provider, loading it on first use
+
+    Raises:
+        KeyError: No provider registered under name
+        Exception: Whatever the loader raised (it is retried on the next call)
+    """
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _loaded:
+            _loaded[name] = _loaders[name]()
+        return _loaded[name]
+
+
+def is_loaded(name):
+    """Whether the provider has been loaded in this process"""
+    return name in _loaded
+
+
+def _module(module_name):
+    return lambda: importlib.import_module(module_name)
+
+
+def _load_genai():
+    genai = importlib.import_module("google.generativeai")
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if api_key:
+        genai.configure(api_key=api_key)
+    return genai
+
+
+def _load_groq():
+    """Groq client, or None without GROQ_API_KEY"""
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        return None
+    from groq import Groq
+    return Groq(api_key=api_key)
+
+
+def _load_gtts():
+    from gtts import gTTS
+    return gTTS
+
+
+register("genai", _load_genai)
+register("groq", _load_groq)
+register("gtts", _load_gtts)
+register("PyPDF2", _module("PyPDF2"))
+register("docx", _module("docx"))
+register("requests", _module("requests"))
@@ -0,0 +1,207 @@
+# DETAILED REPORT STORE
+# Stores generated reports in SQLite (WAL mode) keyed by report key, with an
+# index on the timestamp. Reads and writes touch a single row, expiry is one
+# DELETE, and the newest REPORT_MAX_REPORTS are kept. Large payloads are
+# zlib-compressed. Safe for concurrent gunicorn workers; reports from the
+# old detailed_reports.json file are imported once. With a shared storage
+# backend, reports are also written there so every instance can read them.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from src.blob_storage import get_blob_storage
+
+REPORT_DB_PATH = Path(os.environ.get("REPORT_DB_PATH", "detailed_reports.sqlite3"))
+REPORT_LEGACY_FILE = Path(os.environ.get("REPORT_LEGACY_FILE", "detailed_reports.json"))
+REPORT_TTL_SECONDS = int(os.environ.get("REPORT_TTL_SECONDS", "86400"))
+REPORT_MAX_REPORTS = int(os.environ.get("REPORT_MAX_REPORTS", "10000"))
+# Payloads at least this large are stored compressed (0 disables compression)
+REPORT_COMPRESS_MIN_BYTES = int(os.environ.get("REPORT_COMPRESS_MIN_BYTES", "512"))
+
+# Expiry and the retention limit are enforced every this many writes
+_PRUNE_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    key TEXT PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    language TEXT NOT NULL,
+    compressed INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_timestamp ON reports (timestamp);
+"""
+
+
+class ReportStore:
+    """SQLite-backed store of detailed reports"""
+
+    def __init__(self, db_path=REPORT_DB_PATH, ttl_seconds=REPORT_TTL_SECONDS, max_reports=REPORT_MAX_REPORTS,
+                 compress_min_bytes=REPORT_COMPRESS_MIN_BYTES, legacy_file=None, shared=None):
+        self.db_path = Path(db_path)
+        self.shared = shared
+        self.ttl_seconds = ttl_seconds
+        self.max_reports = max_reports
+        self.compress_min_bytes = compress_min_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+        if legacy_file is not None:
+            self.import_legacy(legacy_file)
+
+    def _connect(self):
+        # One connection per thread; every statement is its own transaction
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _encode(self, data):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if self.compress_min_bytes and len(payload) >= self.compress_min_bytes:
+            return 1, zlib.compress(payload, 6)
+        return 0, payload
+
+    @staticmethod
+    def _decode(compressed, payload):
+        if compressed:
+            payload = zlib.decompress(payload)
+        return json.loads(payload)
+
+    def _row(self, key, data, timestamp):
+        compressed, payload = self._encode(data)
+        language = data.get("language", "English") if isinstance(data, dict) else "English"
+        return key, timestamp, language, compressed, payload
+
+    @staticmethod
+    def shared_key(key):
+        """Shared storage key of a report (report keys may hold any characters)"""
+        return f"reports/{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    def put(self, key, data, timestamp=None):
+        """Store (or replace) a report"""
+        row = self._row(key, data, time.time() if timestamp is None else timestamp)
+        self._connect().execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)", row)
+        if self.shared is not None:
+            document = {"timestamp": row[1], "data": data}
+            try:
+                self.shared.put(self.shared_key(key), zlib.compress(json.dumps(document).encode('utf-8')),
+                                'application/octet-stream')
+            except Exception as e:
+                print(f"ERROR: Could not upload report to shared storage: {e}")
+        with self._writes_lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def put_many(self, items):
+        """Store (key, data, timestamp) triples in one transaction"""
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+                             (self._row(key, data, timestamp) for key, data, timestamp in items))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.prune()
+
+    def get(self, key, now=None):
+        """Return a report's data, or None if missing or older than the TTL"""
+        now = time.time() if now is None else now
+        row = self._connect().execute(
+            "SELECT compressed, payload FROM reports WHERE key = ? AND timestamp >= ?",
+            (key, now - self.ttl_seconds)).fetchone()
+        if row is not None:
+            return self._decode(*row)
+        return self._get_shared(key, now)
+
+    def _get_shared(self, key, now):
+        """Read a report written by another instance and keep a local copy"""
+        if self.shared is None:
+            return None
+        try:
+            blob = self.shared.get(self.shared_key(key))
+            if blob is None:
+                return None
+            document = json.loads(zlib.decompress(blob))
+        except Exception as e:
+            print(f"ERROR: Could not read report from shared storage: {e}")
+            return None
+        if document["timestamp"] < now - self.ttl_seconds:
+            return None
+        row = self._row(key, document["data"], document["timestamp"])
+        self._connect().execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)", row)
+        return document["data"]
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM reports WHERE key = ?", (key,))
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def recent(self, limit=None):
+        """Return {key: {"data", "timestamp", "language"}} for the newest reports"""
+        rows = self._connect().execute(
+            "SELECT key, timestamp, language, compressed, payload FROM reports ORDER BY timestamp DESC LIMIT ?",
+            (limit if limit is not None else self.max_reports,)).fetchall()
+        return {key: {"data": self._decode(compressed, payload), "timestamp": timestamp, "language": language}
+                for key, timestamp, language, compressed, payload in rows}
+
+    def prune(self, now=None):
+        """
+        Delete expired reports and those beyond the retention limit
+
+        Returns:
+            int: Number of reports deleted
+        """
+        now = time.time() if now is None else now
+        conn = self._connect()
+        deleted = conn.execute("DELETE FROM reports WHERE timestamp < ?", (now - self.ttl_seconds,)).rowcount
+        # Newest report beyond the limit (walks the timestamp index, not the table)
+        row = conn.execute("SELECT timestamp FROM reports ORDER BY timestamp DESC LIMIT 1 OFFSET ?",
+                           (self.max_reports,)).fetchone()
+        if row is not None:
+            deleted += conn.execute("DELETE FROM reports WHERE timestamp <= ?", (row[0],)).rowcount
+        return deleted
+
+    def import_legacy(self, path):
+        """Import reports from the old JSON file once, then rename it"""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                reports = json.load(f)
+            self.put_many((key, report["data"], report["timestamp"]) for key, report in reports.items())
+            os.replace(path, path.with_name(path.name + ".imported"))
+            return len(reports)
+        except Exception as e:
+            print(f"Error importing {path}: {e}")
+            return 0
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_report_store():
+    """Return the process-wide report store"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ReportStore(legacy_file=REPORT_LEGACY_FILE, shared=get_blob_storage())
+        return _default_store
@@ -0,0 +1,179 @@
+# SENTENCE-LEVEL TTS AUDIO CACHE
+# Reuses cached audio for unchanged sentences so follow-up analyses and edited
+# reports only synthesize the sentences that actually changed. With a shared
+# storage backend, sentences synthesized by one instance are reused by all.
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src import metrics
+from src.blob_storage import get_blob_storage
+from src.disk_cache import DiskLRU
+
+CACHE_DIR = Path(os.environ.get("TTS_CACHE_DIR", Path(tempfile.gettempdir()) / "ai_doctor_tts_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SYNTHESIS_WORKERS = int(os.environ.get("TTS_SYNTHESIS_WORKERS", "4"))
+
+# Sentence ends: terminal punctuation (incl. Devanagari danda) followed by space, or a line break
+_SENTENCE_RE = re.compile(r'[^\n]*?(?:[.!?।](?=\s)|$)', re.MULTILINE)
+_LIST_MARKER_RE = re.compile(r'^\d+[.)]$')
+
+CHARS_REQUESTED = metrics.counter("tts_chars_requested_total", "Characters requested for speech")
+CHARS_SYNTHESIZED = metrics.counter("tts_chars_synthesized_total", "Characters actually sent to the TTS engine")
+CHARS_PER_REQUEST = metrics.histogram(
+    "tts_chars_synthesized_per_request",
+    "Characters sent to the TTS engine per voice request",
+    buckets=(0, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000)
+)
+SENTENCE_HITS = metrics.counter("tts_sentence_cache_hits_total", "Sentences served from the audio cache")
+SENTENCE_MISSES = metrics.counter("tts_sentence_cache_misses_total", "Sentences synthesized")
+SYNTHESIS_SECONDS = metrics.histogram("tts_synthesis_seconds", "Wall time spent synthesizing cache misses per call")
+
+
+def split_sentences(text):
+    """
+    Split text into speakable sentences
+
+    Returns:
+        list: Sentences with surrounding whitespace removed; fragments without
+              any letters or digits (bare bullets, separators) are dropped
+    """
+    sentences = []
+    marker = ""
+    for match in _SENTENCE_RE.finditer(str(text)):
+        sentence = match.group(0).strip()
+        if _LIST_MARKER_RE.match(sentence):
+            # Keep "1." together with the item it numbers
+            marker = sentence + " "
+        elif any(ch.isalnum() for ch in sentence):
+            sentences.append(marker + sentence)
+            marker = ""
+    if marker:
+        sentences.append(marker.strip())
+    return sentences
+
+
+class SentenceAudioCache:
+    """Disk cache of per-sentence audio with a total size cap (least recently used evicted first)"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, shared=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._files = DiskLRU(self.cache_dir, ".mp3", max_bytes)
+
+    def _path(self, key):
+        return self._files.path(key)
+
+    @staticmethod
+    def make_key(voice_key, sentence):
+        return hashlib.sha256(f"{voice_key}\0{sentence}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        data = self._files.read(key)
+        if data is not None or self.shared is None:
+            return data
+        try:
+            data = self.shared.get(f"tts/{key}.mp3")
+        except Exception as e:
+            print(f"ERROR: Could not read sentence audio from shared storage: {e}")
+            return None
+        if data is not None:
+            self._files.write(key, data)
+        return data
+
+    def put(self, key, data):
+        self._files.write(key, data)
+        if self.shared is not None:
+            try:
+                self.shared.put(f"tts/{key}.mp3", data, 'audio/mpeg')
+            except Exception as e:
+                print(f"ERROR: Could not upload sentence audio to shared storage: {e}")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Return the process-wide sentence cache"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SentenceAudioCache(shared=get_blob_storage())
+        return _default_cache
+
+
+def new_request_stats():
+    """Per-request counters filled in by synthesize_cached"""
+    return {'sentences': 0, 'reused': 0, 'synthesized': 0, 'chars_total': 0, 'chars_synthesized': 0}
+
+
+def record_request_stats(stats):
+    """Publish one voice request's synthesis counts to the metrics registry"""
+    CHARS_PER_REQUEST.observe(stats['chars_synthesized'])
+
+
+def synthesize_cached(text, voice_key, synthesize, cache=None, stats=None, max_workers=SYNTHESIS_WORKERS):
+    """
+    Synthesize text sentence by sentence, reusing cached audio for unchanged sentences
+
+    Args:
+        text: Text to speak
+        voice_key: Identifies the engine/voice; part of every cache key
+        synthesize: Callable(sentence) -> MP3 bytes, called only for cache misses
+        cache: SentenceAudioCache (defaults to the process-wide cache)
+        stats: Optional dict from new_request_stats() to accumulate into
+        max_workers: Maximum concurrent synthesis calls for missing sentences
+
+    Returns:
+        bytes: MP3 audio for the whole text
+    """
+    cache = cache or get_default_cache()
+    stats = stats if stats is not None else new_request_stats()
+    sentences = split_sentences(text)
+    keys = [cache.make_key(voice_key, sentence) for sentence in sentences]
+
+    audio = {}
+    missing = {}
+    for key, sentence in zip(keys, sentences):
+        if key in audio or key in missing:
+            continue
+        cached = cache.get(key)
+        if cached:
+            audio[key] = cached
+        else:
+            missing[key] = sentence
+
+    if missing:
+        started = time.perf_counter()
+        workers = max(1, min(max_workers, len(missing)))
+        if workers == 1:
+            rendered = [synthesize(sentence) for sentence in missing.values()]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                rendered = list(pool.map(synthesize, missing.values()))
+        for (key, sentence), data in zip(missing.items(), rendered):
+            audio[key] = data
+            cache.put(key, data)
+        SYNTHESIS_SECONDS.observe(time.perf_counter() - started)
+
+    chars_total = sum(len(s) for s in sentences)
+    chars_synthesized = sum(len(s) for s in missing.values())
+    stats['sentences'] += len(sentences)
+    stats['synthesized'] += len(missing)
+    stats['reused'] += len(sentences) - len(missing)
+    stats['chars_total'] += chars_total
+    stats['chars_synthesized'] += chars_synthesized
+    CHARS_REQUESTED.inc(chars_total)
+    CHARS_SYNTHESIZED.inc(chars_synthesized)
+    SENTENCE_HITS.inc(len(sentences) - len(missing))
+    SENTENCE_MISSES.inc(len(missing))
+
+    return b''.join(audio[key] for key in keys)
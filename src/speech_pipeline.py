@@ -0,0 +1,153 @@
+# PIPELINED SPEECH SYNTHESIS
+# Starts synthesizing each completed sentence of a streamed LLM response while
+# the model is still generating, then joins the audio in order, so the audio
+# is ready shortly after the last sentence arrives instead of a full TTS pass later.
+
+import collections
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Synthesis jobs one request may run at once; the rest of its sentences wait
+# in the request's own queue, so one long report cannot hold the whole pool
+PIPELINE_PER_REQUEST = int(os.environ.get("TTS_PIPELINE_PER_REQUEST", "2"))
+# Shared by all requests in the process: enough for every admitted analysis
+# (ADMISSION_MAX_IN_FLIGHT, 6 by default) to run its per-request share
+PIPELINE_WORKERS = int(os.environ.get("TTS_PIPELINE_WORKERS", str(6 * PIPELINE_PER_REQUEST)))
+
+# Candidate sentence ends: terminal punctuation followed by whitespace, or a line break
+_BOUNDARY_RE = re.compile(r'[.!?।](?=\s)|\n')
+_LIST_MARKER_RE = re.compile(r'^\d+[.)]$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_pipeline_executor():
+    """Return the process-wide pool used for pipelined synthesis"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="tts-pipeline")
+        return _executor
+
+
+def split_completed(buffer):
+    """
+    Split streamed text into the part made of finished sentences and the rest
+
+    A sentence counts as finished once whitespace follows its terminal
+    punctuation; list numbers such as "1." stay with the item they number.
+
+    Returns:
+        tuple: (completed_text, remainder)
+    """
+    cut = 0
+    previous = 0
+    for match in _BOUNDARY_RE.finditer(buffer):
+        end = match.end()
+        fragment = buffer[previous:end].strip()
+        previous = end
+        if _LIST_MARKER_RE.match(fragment):
+            continue
+        cut = end
+    return buffer[:cut], buffer[cut:]
+
+
+class PipelinedSpeech:
+    """Feeds streamed text to a synthesizer one batch of completed sentences at a time"""
+
+    def __init__(self, synthesize_text, executor=None, max_chars=None, prepare=None,
+                 max_parallel=PIPELINE_PER_REQUEST):
+        """
+        Args:
+            synthesize_text: Callable(text) -> MP3 bytes for a run of whole sentences
+            executor: Executor for synthesis jobs (defaults to the shared pipeline pool)
+            max_chars: Stop sending text to the synthesizer after this many characters
+            prepare: Optional callable(text, final) -> text, applied in stream
+                     order before synthesis (e.g. a speech script writer)
+            max_parallel: Jobs of this request running on the executor at once
+        """
+        self.synthesize_text = synthesize_text
+        self.executor = executor or get_pipeline_executor()
+        self.max_chars = max_chars
+        self.prepare = prepare
+        self.max_parallel = max(1, max_parallel)
+        self._buffer = ""
+        self._submitted_chars = 0
+        self._futures = []
+        self._waiting = collections.deque()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def jobs_submitted(self):
+        return len(self._futures)
+
+    def _submit(self, text, final=False):
+        if self.prepare is not None:
+            text = self.prepare(text, final)
+        if self.max_chars is not None:
+            remaining = self.max_chars - self._submitted_chars
+            if remaining <= 0:
+                return
+            text = text[:remaining]
+        if not text.strip():
+            return
+        self._submitted_chars += len(text)
+        future = Future()
+        self._futures.append(future)
+        with self._lock:
+            self._waiting.append((future, text))
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start waiting jobs while this request is below max_parallel"""
+        while True:
+            with self._lock:
+                if self._running >= self.max_parallel or not self._waiting:
+                    return
+                self._running += 1
+                future, text = self._waiting.popleft()
+            self.executor.submit(self._run, future, text)
+
+    def _run(self, future, text):
+        try:
+            future.set_result(self.synthesize_text(text))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._dispatch()
+
+    def feed(self, chunk):
+        """Add streamed text; completed sentences are submitted for synthesis immediately"""
+        if not chunk:
+            return
+        completed, self._buffer = split_completed(self._buffer + chunk)
+        self._submit(completed)
+
+    def finish(self):
+        """
+        Synthesize any trailing text and wait for all jobs
+
+        Returns:
+            bytes: Audio for all fed text in order
+
+        Raises:
+            Exception: The first synthesis error, after the remaining jobs finish
+        """
+        self._submit(self._buffer, final=True)
+        self._buffer = ""
+        parts = []
+        error = None
+        for future in self._futures:
+            try:
+                parts.append(future.result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return b''.join(part for part in parts if part)
@@ -0,0 +1,298 @@
+# SPOKEN SCRIPT RENDERING FOR TTS
+# Turns a written analysis into what should actually be read aloud: list and
+# table markup removed, dosing abbreviations spoken in the patient's language,
+# repeated headings and boilerplate dropped, and the result capped at a
+# maximum listening time instead of a blind character cut.
+
+import os
+import re
+
+from src import metrics
+from src.sentence_cache import split_sentences
+
+SPEECH_MAX_SECONDS = int(os.environ.get("SPEECH_MAX_SECONDS", "180"))
+
+# Approximate gTTS speaking rate (characters per second) used for duration estimates
+CHARS_PER_SECOND = {
+    'English': 15,
+    'Hinglish': 15,
+    'Hindi': 13,
+    'Telugu': 12,
+}
+
+# Languages that reuse another language's rules
+LANGUAGE_ALIASES = {
+    'Chhattisgarhi': 'Hindi',
+}
+
+# Spoken forms; units apply after a number, frequencies as standalone words
+LANGUAGE_RULES = {
+    'English': {
+        'units': {'mg': 'milligrams', 'mcg': 'micrograms', 'ml': 'millilitres', 'g': 'grams', 'kg': 'kilograms'},
+        'frequencies': {
+            'OD': 'once daily', 'QD': 'once daily', 'BID': 'twice daily', 'BD': 'twice daily',
+            'TID': 'three times daily', 'TDS': 'three times daily', 'QID': 'four times daily',
+            'HS': 'at bedtime', 'PRN': 'when needed', 'SOS': 'when needed',
+        },
+        'words': {'e.g.': 'for example', 'i.e.': 'that is', 'approx.': 'approximately', 'tab.': 'tablet', 'vs.': 'versus'},
+        'percent': 'percent',
+        'range': 'to',
+        'and': 'and',
+        'per_day': 'per day',
+        'for_days': 'for {n} days',
+        'degrees': {'C': 'degrees Celsius', 'F': 'degrees Fahrenheit'},
+        'closing': 'The full report is shown on screen.',
+    },
+    'Hinglish': {
+        'units': {'mg': 'milligram', 'mcg': 'microgram', 'ml': 'ml', 'g': 'gram', 'kg': 'kilo'},
+        'frequencies': {
+            'OD': 'din mein ek baar', 'QD': 'din mein ek baar', 'BID': 'din mein do baar', 'BD': 'din mein do baar',
+            'TID': 'din mein teen baar', 'TDS': 'din mein teen baar', 'QID': 'din mein chaar baar',
+            'HS': 'sone se pehle', 'PRN': 'zaroorat hone par', 'SOS': 'zaroorat hone par',
+        },
+        'words': {'e.g.': 'jaise', 'i.e.': 'yaani', 'approx.': 'lagbhag', 'tab.': 'tablet', 'vs.': 'ya'},
+        'percent': 'percent',
+        'range': 'se',
+        'and': 'aur',
+        'per_day': 'roz',
+        'for_days': '{n} din tak',
+        'degrees': {'C': 'degree Celsius', 'F': 'degree Fahrenheit'},
+        'closing': 'Poori report screen par dekhein.',
+    },
+    'Hindi': {
+        'units': {'mg': 'मिलीग्राम', 'mcg': 'माइक्रोग्राम', 'ml': 'मिलीलीटर', 'g': 'ग्राम', 'kg': 'किलो'},
+        'frequencies': {
+            'OD': 'दिन में एक बार', 'QD': 'दिन में एक बार', 'BID': 'दिन में दो बार', 'BD': 'दिन में दो बार',
+            'TID': 'दिन में तीन बार', 'TDS': 'दिन में तीन बार', 'QID': 'दिन में चार बार',
+            'HS': 'सोने से पहले', 'PRN': 'ज़रूरत होने पर', 'SOS': 'ज़रूरत होने पर',
+        },
+        'words': {'e.g.': 'जैसे', 'i.e.': 'यानी', 'approx.': 'लगभग', 'tab.': 'गोली', 'vs.': 'या'},
+        'percent': 'प्रतिशत',
+        'range': 'से',
+        'and': 'और',
+        'per_day': 'प्रतिदिन',
+        'for_days': '{n} दिन तक',
+        'degrees': {'C': 'डिग्री सेल्सियस', 'F': 'डिग्री फ़ारेनहाइट'},
+        'closing': 'पूरी रिपोर्ट स्क्रीन पर देखें।',
+    },
+    'Telugu': {
+        'units': {'mg': 'మిల్లీగ్రాములు', 'mcg': 'మైక్రోగ్రాములు', 'ml': 'మిల్లీలీటర్లు', 'g': 'గ్రాములు', 'kg': 'కిలోలు'},
+        'frequencies': {
+            'OD': 'రోజుకు ఒకసారి', 'QD': 'రోజుకు ఒకసారి', 'BID': 'రోజుకు రెండుసార్లు', 'BD': 'రోజుకు రెండుసార్లు',
+            'TID': 'రోజుకు మూడుసార్లు', 'TDS': 'రోజుకు మూడుసార్లు', 'QID': 'రోజుకు నాలుగుసార్లు',
+            'HS': 'నిద్రపోయే ముందు', 'PRN': 'అవసరమైనప్పుడు', 'SOS': 'అవసరమైనప్పుడు',
+        },
+        'words': {'e.g.': 'ఉదాహరణకు', 'i.e.': 'అంటే', 'approx.': 'సుమారు', 'tab.': 'మాత్ర', 'vs.': 'లేదా'},
+        'percent': 'శాతం',
+        'range': 'నుండి',
+        'and': 'మరియు',
+        'per_day': 'రోజుకు',
+        'for_days': '{n} రోజుల పాటు',
+        'degrees': {'C': 'డిగ్రీల సెల్సియస్', 'F': 'డిగ్రీల ఫారెన్‌హీట్'},
+        'closing': 'పూర్తి నివేదిక స్క్రీన్‌పై ఉంది.',
+    },
+}
+
+# Boilerplate that is worth saying once per script at most
+BOILERPLATE_PATTERNS = [
+    re.compile(r'\bAI[- ]generated\b|\bnot a substitute\b|\binformational purposes\b', re.IGNORECASE),
+    re.compile(r'\bAI (analysis|report)\b|AI द्वारा|AI ద్వారా|AI విశ్లేషణ', re.IGNORECASE),
+]
+
+_TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?[\s:|-]+\|[\s:|-]*$')
+_MARKUP_RE = re.compile(r'[#*_`]+|^\s*>\s?')
+_BULLET_RE = re.compile(r'^\s*(?:[-•▪●]|\d{1,2}[.)])\s+')
+_ARROW_RE = re.compile(r'\s*(?:->|=>|→)\s*')
+_DEGREE_RE = re.compile(r'(\d)\s*°\s*([CF])\b')
+# "4-5" is a range; dates, phone numbers and IDs ("2024-01-15", "A12-34",
+# "07-3") are not: no longer hyphenated run, no letters, no leading zeros
+_RANGE_RE = re.compile(r'(?<![\w.\-–/])((?:[1-9]\d*|0)(?:\.\d+)?)\s*[-–]\s*((?:[1-9]\d*|0)(?:\.\d+)?)(?![\w\-–/]|\.\d)')
+_TIMES_DAYS_RE = re.compile(r'[x×]\s*(\d+)\s*days?\b', re.IGNORECASE)
+_PER_DAY_RE = re.compile(r'\s*/\s*day\b', re.IGNORECASE)
+_PLUS_RE = re.compile(r'\s+\+\s+')
+_SPACES_RE = re.compile(r'[ \t]+')
+# A heading is a short label ending in a colon ("TREATMENT:", "Medical report:")
+_HEADING_RE = re.compile(r'^[^.!?।:\d]{1,60}:$')
+_MARKDOWN_HEADING_RE = re.compile(r'^\s*#+\s')
+
+SCRIPT_CHARS_IN = metrics.counter("speech_script_chars_in_total", "Characters of written text given to the speech script")
+SCRIPT_CHARS_OUT = metrics.counter("speech_script_chars_out_total", "Characters of spoken script sent to TTS")
+SCRIPT_CAPPED = metrics.counter("speech_script_capped_total", "Speech scripts cut at the maximum duration")
+
+
+def get_rules(language):
+    """Return the spoken-form rules for a language (English for unknown languages)"""
+    language = LANGUAGE_ALIASES.get(language, language)
+    return LANGUAGE_RULES.get(language, LANGUAGE_RULES['English'])
+
+
+def estimate_seconds(text, language='English'):
+    """Rough speaking time of a text"""
+    language = LANGUAGE_ALIASES.get(language, language)
+    return len(text) / CHARS_PER_SECOND.get(language, CHARS_PER_SECOND['English'])
+
+
+def _clean_line(line):
+    """Remove markdown and list/table markup from one line"""
+    if _TABLE_SEPARATOR_RE.match(line) and '|' in line:
+        return ""
+    if line.count('|') >= 2:
+        cells = [cell.strip() for cell in line.strip().strip('|').split('|')]
+        line = ", ".join(cell for cell in cells if cell)
+        if line and line[-1] not in '.!?।':
+            line += "."
+    line = _MARKUP_RE.sub('', line)
+    line = _BULLET_RE.sub('', line)
+    return _SPACES_RE.sub(' ', line).strip()
+
+
+def _compile_rules(rules):
+    # "MG" and "Ml" are units, but "5G" is a network, not grams: single letters are case-sensitive
+    units = '|'.join(
+        [f"(?i:{unit})" for unit in sorted(rules['units'], key=len, reverse=True) if len(unit) > 1]
+        + [unit for unit in rules['units'] if len(unit) == 1]
+    )
+    frequencies = '|'.join(sorted(rules['frequencies'], key=len, reverse=True))
+    words = '|'.join(re.escape(word) for word in sorted(rules['words'], key=len, reverse=True))
+    return {
+        'units': re.compile(rf'(\d+(?:\.\d+)?)\s*({units})\b'),
+        # Frequencies are upper case in prescriptions ("OD", "b.i.d." is folded first)
+        'frequencies': re.compile(rf'\b({frequencies})\b'),
+        'dotted': re.compile(r'\b([a-zA-Z])\.([a-zA-Z])\.(?:([a-zA-Z])\.)?(?:([a-zA-Z])\.)?(?=\s|$|[,;)])'),
+        'words': re.compile(rf'(?<!\w)({words})(?=\s|$)', re.IGNORECASE),
+    }
+
+
+_compiled = {}
+
+
+def _expand(text, rules):
+    """Speak abbreviations, units and symbols in the language of the rules"""
+    key = id(rules)
+    if key not in _compiled:
+        _compiled[key] = _compile_rules(rules)
+    patterns = _compiled[key]
+
+    def fold_dotted(match):
+        letters = "".join(group for group in match.groups() if group).upper()
+        return letters if letters in rules['frequencies'] else match.group(0)
+
+    text = patterns['words'].sub(lambda m: rules['words'][m.group(1).lower()], text)
+    text = patterns['dotted'].sub(fold_dotted, text)
+    text = patterns['units'].sub(lambda m: f"{m.group(1)} {rules['units'][m.group(2).lower()]}", text)
+    text = patterns['frequencies'].sub(lambda m: rules['frequencies'][m.group(1)], text)
+    text = _TIMES_DAYS_RE.sub(lambda m: rules['for_days'].format(n=m.group(1)), text)
+    text = _PER_DAY_RE.sub(f" {rules['per_day']}", text)
+    text = _RANGE_RE.sub(lambda m: f"{m.group(1)} {rules['range']} {m.group(2)}", text)
+    text = _DEGREE_RE.sub(lambda m: f"{m.group(1)} {rules['degrees'][m.group(2)]}", text)
+    text = text.replace('%', f" {rules['percent']}").replace('&', f" {rules['and']} ")
+    text = _PLUS_RE.sub(f" {rules['and']} ", text)
+    text = _ARROW_RE.sub(', ', text)
+    return _SPACES_RE.sub(' ', text)
+
+
+def _sentence_key(sentence):
+    return re.sub(r'\W+', ' ', sentence.lower()).strip()
+
+
+class SpeechScriptWriter:
+    """Incrementally renders written text into a spoken script for one response"""
+
+    def __init__(self, language='English', max_seconds=None):
+        """
+        Args:
+            language: Response language (selects abbreviation and range rules)
+            max_seconds: Maximum listening time; 0 disables the cap
+        """
+        self.language = language
+        self.rules = get_rules(language)
+        self.max_seconds = SPEECH_MAX_SECONDS if max_seconds is None else max_seconds
+        self.chars_in = 0
+        self.chars_out = 0
+        self.seconds = 0.0
+        self.capped = False
+        self._seen_headings = set()
+        self._said_boilerplate = False
+
+    def _keep(self, sentence, heading=False):
+        """Drop empty sentences, repeated headings and boilerplate after its first line
+
+        Other sentences are always kept, even when repeated: the same
+        instruction may apply to two medicines.
+        """
+        key = _sentence_key(sentence)
+        if not key:
+            return False
+        if heading or (_HEADING_RE.match(sentence) and len(key.split()) <= 6):
+            if key in self._seen_headings:
+                return False
+            self._seen_headings.add(key)
+        if any(pattern.search(sentence) for pattern in BOILERPLATE_PATTERNS):
+            if self._said_boilerplate:
+                return False
+            self._said_boilerplate = True
+        return True
+
+    def process(self, text, final=False):
+        """
+        Render the next piece of written text (whole sentences)
+
+        Args:
+            text: Written text; pieces must be fed in order
+            final: True for the last piece (adds the closing line if the script was capped)
+
+        Returns:
+            str: Spoken script for this piece (line breaks kept)
+        """
+        self.chars_in += len(text)
+        lines = str(text).split("\n")
+        spoken_lines = []
+        for i, line in enumerate(lines):
+            # Table header rows (followed by a |---| separator) are not worth reading out
+            if i + 1 < len(lines) and '|' in lines[i + 1] and _TABLE_SEPARATOR_RE.match(lines[i + 1]):
+                continue
+            spoken = []
+            heading = bool(_MARKDOWN_HEADING_RE.match(line))
+            for sentence in split_sentences(_expand(_clean_line(line), self.rules)):
+                sentence = _BULLET_RE.sub('', sentence).strip()
+                if self.capped or not self._keep(sentence, heading):
+                    continue
+                duration = estimate_seconds(sentence, self.language)
+                if self.max_seconds and self.seconds + duration > self.max_seconds and self.seconds > 0:
+                    self.capped = True
+                    continue
+                self.seconds += duration
+                spoken.append(sentence)
+            if spoken:
+                spoken_lines.append(" ".join(spoken))
+
+        if final and self.capped:
+            spoken_lines.append(self.rules['closing'])
+        script = "\n".join(spoken_lines)
+        self.chars_out += len(script)
+        return script
+
+    def record(self):
+        """Publish this script's character counts to the metrics registry"""
+        SCRIPT_CHARS_IN.inc(self.chars_in)
+        SCRIPT_CHARS_OUT.inc(self.chars_out)
+        if self.capped:
+            SCRIPT_CAPPED.inc()
+
+
+def make_speech_script(text, language='English', max_seconds=None):
+    """
+    Render a complete written analysis into a spoken script
+
+    Args:
+        text: Written analysis or document text
+        language: Response language
+        max_seconds: Maximum listening time (defaults to SPEECH_MAX_SECONDS; 0 disables)
+
+    Returns:
+        str: Spoken script (line breaks kept)
+    """
+    writer = SpeechScriptWriter(language, max_seconds)
+    script = writer.process(text, final=True)
+    writer.record()
+    return script
@@ -91,6 +91,15 @@ function setLoading(isLoading) {
   }
 }
 
+function inlineAudioUrl(base64, mediaType) {
+  const binary = atob(base64);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return URL.createObjectURL(new Blob([bytes], { type: mediaType || "audio/mpeg" }));
+}
+
 async function analyzeImage() {
   if (!selectedFile) {
     alert("Please upload a medical image first.");
@@ -103,10 +112,18 @@ async function analyzeImage() {
   formData.append("language", languageSelect.value);
   formData.append("gender", voiceGender.value);
   formData.append("additional_context", contextInput.value || "");
+  // Opus is several times smaller than MP3 for speech; use it where supported
+  const canPlayOpus = audioPlayer.canPlayType('audio/ogg; codecs="opus"') !== "";
+  formData.append("audio_format", canPlayOpus ? "opus" : "mp3");
+  // Short audio comes back inside the JSON, saving a second request
+  formData.append("response_mode", "inline");
 
   setLoading(true);
   reportOutput.textContent = "Analyzing image, please wait...";
   audioPlayer.classList.add("hidden");
+  if (audioPlayer.src.startsWith("blob:")) {
+    URL.revokeObjectURL(audioPlayer.src);
+  }
   audioPlayer.src = "";
   audioHint.textContent = "Generating audio (if available)...";
 
@@ -124,11 +141,12 @@ async function analyzeImage() {
     const data = await res.json();
     reportOutput.textContent = data.analysis || "No analysis text returned.";
 
-    if (data.audio_path) {
-      const audioUrl = `${API_BASE}/api/audio?path=${encodeURIComponent(
-        data.audio_path,
-      )}`;
-      audioPlayer.src = audioUrl;
+    if (data.audio_base64) {
+      audioPlayer.src = inlineAudioUrl(data.audio_base64, data.audio_media_type);
+      audioPlayer.classList.remove("hidden");
+      audioHint.textContent = "Audio generated. Press play to listen.";
+    } else if (data.audio_url) {
+      audioPlayer.src = `${API_BASE}${data.audio_url}`;
       audioPlayer.classList.remove("hidden");
       audioHint.textContent = "Audio generated. Press play to listen.";
     } else {
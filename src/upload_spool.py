@@ -0,0 +1,180 @@
+# STREAMED DOCUMENT UPLOADS
+# Parses multipart/form-data request bodies chunk by chunk, writing the file
+# part straight to a temporary file while its SHA-256 is computed, so a 50 MB
+# PDF never sits in memory and the digest is ready for the extraction cache
+# without reading the file again. Uploads over the size ceiling are rejected
+# as soon as the ceiling is crossed. Spooled files are local to the node
+# handling the request and are gone once it finishes.
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+DOCUMENT_UPLOAD_MAX_BYTES = int(os.environ.get("DOCUMENT_UPLOAD_MAX_BYTES", str(64 * 1024 * 1024)))
+UPLOAD_SPOOL_DIR = Path(os.environ.get("UPLOAD_SPOOL_DIR", Path(tempfile.gettempdir()) / "ai_doctor_uploads"))
+
+# File data is kept in memory up to this size, then written out off the event loop
+SPOOL_FLUSH_BYTES = 1024 * 1024
+# Ordinary form fields (language, gender, ...) are short
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """The uploaded file exceeds the configured size ceiling"""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """An uploaded file on disk with its size and SHA-256"""
+
+    def __init__(self, filename, max_bytes, spool_dir):
+        self.filename = os.path.basename(filename or "")
+        self.suffix = os.path.splitext(self.filename)[1].lower()
+        self.max_bytes = max_bytes
+        self.size = 0
+        Path(spool_dir).mkdir(parents=True, exist_ok=True)
+        # The suffix is kept so that extractors can pick a parser by extension
+        fd, self.path = tempfile.mkstemp(suffix=self.suffix, dir=spool_dir)
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+
+    @property
+    def pending(self):
+        """Bytes received but not yet written to disk"""
+        return len(self._buffer)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def feed(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._hash.update(data)
+        self._buffer += data
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def discard(self):
+        """Close and delete the temporary file"""
+        self._buffer.clear()
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+async def spool_upload(request, field="file", max_bytes=None, spool_dir=None):
+    """
+    Stream a multipart/form-data request body to disk
+
+    Args:
+        request: Starlette request (only headers and stream() are used)
+        field: Name of the file field
+        max_bytes: Size ceiling for the file (default DOCUMENT_UPLOAD_MAX_BYTES)
+        spool_dir: Directory for the temporary file (default UPLOAD_SPOOL_DIR)
+
+    Returns:
+        tuple: (SpooledUpload, dict of the other form fields). The caller
+               must discard() the upload when done with it.
+
+    Raises:
+        UploadTooLarge: The file (or declared body) exceeds max_bytes
+        ValueError: The body is not multipart or has no file in `field`
+    """
+    max_bytes = DOCUMENT_UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    spool_dir = UPLOAD_SPOOL_DIR if spool_dir is None else spool_dir
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise ValueError("Expected a multipart/form-data upload.")
+
+    # Refuse obviously oversized bodies before reading them (form overhead allowed for)
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes + MAX_FIELD_BYTES:
+        raise UploadTooLarge(max_bytes)
+
+    fields = {}
+    state = {'upload': None, 'header_field': b"", 'header_value': b"", 'headers': {}, 'name': None, 'value': None}
+
+    def on_part_begin():
+        state['headers'] = {}
+        state['name'] = None
+        state['value'] = None
+
+    def on_header_field(data, start, end):
+        state['header_field'] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state['header_value'] += data[start:end]
+
+    def on_header_end():
+        state['headers'][state['header_field'].lower()] = state['header_value']
+        state['header_field'] = b""
+        state['header_value'] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state['headers'].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode('utf-8', 'replace')
+        filename = disposition.get(b"filename")
+        if name == field and filename is not None and state['upload'] is None:
+            state['upload'] = SpooledUpload(filename.decode('utf-8', 'replace'), max_bytes, spool_dir)
+            state['name'] = field
+        elif filename is None:
+            state['name'] = name
+            state['value'] = bytearray()
+
+    def on_part_data(data, start, end):
+        if state['name'] == field and state['value'] is None:
+            state['upload'].feed(data[start:end])
+        elif state['value'] is not None:
+            state['value'] += data[start:end]
+            if len(state['value']) > MAX_FIELD_BYTES:
+                raise ValueError(f"Form field '{state['name']}' is too large.")
+        # Other file parts are ignored
+
+    def on_part_end():
+        if state['value'] is not None:
+            fields[state['name']] = state['value'].decode('utf-8', 'replace')
+
+    parser = MultipartParser(options[b"boundary"], {
+        'on_part_begin': on_part_begin,
+        'on_header_field': on_header_field,
+        'on_header_value': on_header_value,
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+        'on_part_data': on_part_data,
+        'on_part_end': on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            upload = state['upload']
+            if upload is not None and upload.pending >= SPOOL_FLUSH_BYTES:
+                await run_in_threadpool(upload.flush)
+        parser.finalize()
+        if state['upload'] is None:
+            raise ValueError(f"Missing file field '{field}'.")
+        await run_in_threadpool(state['upload'].close)
+    except BaseException:
+        if state['upload'] is not None:
+            state['upload'].discard()
+        raise
+    return state['upload'], fields
@@ -0,0 +1,131 @@
+# STARTUP WARM-UP
+# Work the first request would otherwise pay for (provider SDK imports,
+# client and model construction, connection set-up, local models, canned
+# audio) runs in named steps on a background thread when the app starts.
+# The server answers /healthz straight away; /readyz only reports ready once
+# every blocking step has finished, so the platform routes traffic to a
+# worker when its first request will be fast. A failed step is logged and
+# counted but does not keep the worker out of rotation, and neither does a
+# warm-up that runs past WARMUP_TIMEOUT_SECONDS. Non-blocking steps keep
+# running after the worker is ready. A step that can only do part of its job
+# (e.g. the phrase bank is incomplete) raises StepDegraded: the worker serves,
+# slower, and /readyz says which step is degraded.
+
+import os
+import threading
+import time
+
+from src import metrics
+
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+# Longest the worker waits for blocking steps before it reports ready anyway
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_TIMEOUT_SECONDS", "60"))
+# Comma-separated step names to leave out
+WARMUP_SKIP = {name.strip() for name in os.environ.get("WARMUP_SKIP", "").split(",") if name.strip()}
+
+READY = metrics.gauge("warmup_ready", "1 once the worker is warm (or its warm-up timed out)")
+STEP_SECONDS = metrics.gauge("warmup_step_seconds", "Time each warm-up step took")
+STEP_FAILURES = metrics.counter("warmup_step_failures_total", "Warm-up steps that raised")
+
+
+class StepDegraded(Exception):
+    """A warm-up step finished without all of its work; requests fall back to slower paths"""
+
+
+class Warmup:
+    """Ordered warm-up steps run once on a background thread"""
+
+    def __init__(self, timeout=WARMUP_TIMEOUT_SECONDS, skip=WARMUP_SKIP, clock=time.monotonic):
+        """
+        Args:
+            timeout: Seconds after start() when the worker is ready regardless
+            skip: Names of steps not to run
+            clock: Time source (monotonic seconds)
+        """
+        self.timeout = timeout
+        self.skip = set(skip)
+        self.clock = clock
+        self._steps = []
+        self._state = {}
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._blocking_done = threading.Event()
+        self._thread = None
+
+    def step(self, name, fn, blocking=True):
+        """
+        Register a step
+
+        Args:
+            name: Step name shown by status() and used in WARMUP_SKIP
+            fn: Callable() doing the work
+            blocking: Whether readiness waits for this step
+        """
+        self._steps.append((name, fn, blocking))
+        self._state[name] = {'state': 'skipped' if name in self.skip else 'pending', 'blocking': blocking}
+
+    def _run_step(self, name, fn):
+        with self._lock:
+            self._state[name]['state'] = 'running'
+        start = self.clock()
+        try:
+            fn()
+            state, error = 'done', None
+        except StepDegraded as e:
+            print(f"WARNING: Warm-up step {name} degraded: {e}")
+            state, error = 'degraded', str(e)[:200]
+        except Exception as e:
+            print(f"ERROR: Warm-up step {name} failed: {e}")
+            STEP_FAILURES.inc(step=name)
+            state, error = 'failed', str(e)[:200]
+        seconds = self.clock() - start
+        STEP_SECONDS.set(round(seconds, 3), step=name)
+        with self._lock:
+            self._state[name].update(state=state, seconds=round(seconds, 3))
+            if error:
+                self._state[name]['error'] = error
+
+    def run(self):
+        """Run the blocking steps, mark the worker ready, then run the rest"""
+        if self._started_at is None:
+            self._started_at = self.clock()
+        steps = [step for step in self._steps if step[0] not in self.skip]
+        for name, fn, blocking in steps:
+            if blocking:
+                self._run_step(name, fn)
+        self._blocking_done.set()
+        READY.set(1)
+        for name, fn, blocking in steps:
+            if not blocking:
+                self._run_step(name, fn)
+
+    def start(self):
+        """Start the warm-up on a daemon thread (once)"""
+        if self._thread is not None:
+            return
+        self._started_at = self.clock()
+        READY.set(0)
+        self._thread = threading.Thread(target=self.run, daemon=True, name="warmup")
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Block until the worker is ready; returns whether it is"""
+        self._blocking_done.wait(timeout)
+        return self.ready()
+
+    def ready(self):
+        """Whether the blocking steps have finished, or the warm-up timed out"""
+        if self._blocking_done.is_set():
+            return True
+        if self._started_at is None:
+            return False
+        if self.clock() - self._started_at >= self.timeout:
+            READY.set(1)
+            return True
+        return False
+
+    def status(self):
+        """{'ready': bool, 'steps': {name: {'state', 'blocking', 'seconds', 'error'}}}"""
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._state.items()}
+        return {'ready': self.ready(), 'steps': steps}
@@ -0,0 +1,163 @@
+import sys
+import os
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import gradio_app_advanced as app_module
+from src.admission import REJECTIONS, AdmissionController, Overloaded
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=False)
+
+
+async def _until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_limits_in_flight_and_rejects_when_queue_is_full(pool):
+    controller = AdmissionController(pool, name="test-full", max_in_flight=2, max_queue=2, queue_timeout=5)
+    gate = threading.Event()
+    before = REJECTIONS.value(pool="test-full", route="r", reason="queue_full")
+
+    async def scenario():
+        tasks = [asyncio.create_task(controller.run(gate.wait, route="r")) for _ in range(4)]
+        await _until(lambda: controller.queue_depth == 2)
+        assert controller.in_flight == 2
+
+        start = time.monotonic()
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.run(gate.wait, route="r")
+        assert time.monotonic() - start < 0.5  # rejected without waiting
+        assert excinfo.value.reason == "queue_full"
+        assert excinfo.value.retry_after >= 1
+
+        gate.set()
+        assert await asyncio.gather(*tasks) == [True] * 4
+        assert controller.in_flight == 0 and controller.queue_depth == 0
+
+    asyncio.run(scenario())
+    assert REJECTIONS.value(pool="test-full", route="r", reason="queue_full") == before + 1
+
+
+def test_waiters_past_their_deadline_are_rejected(pool):
+    controller = AdmissionController(pool, name="test-deadline", max_in_flight=1, max_queue=4, queue_timeout=5)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(controller.run(gate.wait))
+        await _until(lambda: controller.in_flight == 1)
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.run(gate.wait, queue_timeout=0.05)
+        assert excinfo.value.reason == "queue_timeout"
+        assert controller.queue_depth == 0
+        gate.set()
+        await running
+
+    asyncio.run(scenario())
+    assert controller.in_flight == 0
+
+
+def test_slots_are_handed_over_in_arrival_order(pool):
+    controller = AdmissionController(pool, name="test-fifo", max_in_flight=1, max_queue=10)
+    gate = threading.Event()
+    order = []
+
+    async def scenario():
+        first = asyncio.create_task(controller.run(gate.wait))
+        await _until(lambda: controller.in_flight == 1)
+        tasks = []
+        for i in range(5):
+            tasks.append(asyncio.create_task(controller.run(order.append, i)))
+            await _until(lambda: controller.queue_depth == i + 1)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+
+    asyncio.run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_cancelled_requests_do_not_leak_slots(pool):
+    controller = AdmissionController(pool, name="test-cancel", max_in_flight=1, max_queue=4)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(controller.run(gate.wait))
+        waiting = asyncio.create_task(controller.run(lambda: "never"))
+        await _until(lambda: controller.queue_depth == 1)
+        waiting.cancel()
+        running.cancel()  # the thread keeps its slot until it finishes
+        await asyncio.sleep(0.01)
+        assert controller.in_flight == 1 and controller.queue_depth == 0
+        gate.set()
+        await _until(lambda: controller.in_flight == 0)
+        assert await controller.run(lambda: "next") == "next"
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_follows_measured_service_time(pool):
+    controller = AdmissionController(pool, name="test-retry", max_in_flight=1, max_queue=4)
+    controller._record(8.0)
+    assert controller.retry_after() == 8
+    controller._service_seconds = 10 ** 6
+    assert controller.retry_after() == 60
+
+
+def test_errors_propagate_and_free_the_slot(pool):
+    controller = AdmissionController(pool, name="test-error", max_in_flight=1, max_queue=0)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await controller.run(fail)
+        assert await controller.run(lambda: 42) == 42
+
+    asyncio.run(scenario())
+
+
+def _post_image(client):
+    image = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(image, format="PNG")
+    return client.post("/api/analyze-image", files={"image": ("scan.png", image.getvalue(), "image/png")})
+
+
+def test_overloaded_endpoint_returns_503_with_retry_after(pool, monkeypatch):
+    monkeypatch.setattr(app_module, "admission", AdmissionController(pool, name="test-app", max_in_flight=0, max_queue=0))
+    monkeypatch.setattr(app_module, "analyze_and_speak", lambda *args: ("Rest well.", None))
+    response = _post_image(TestClient(app_module.app))
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert 'admission_rejections_total{pool="test-app",reason="queue_full",route="analyze-image"} 1' in \
+        app_module.metrics.render_prometheus()
+
+
+def test_admitted_analysis_runs_on_the_pool(pool, monkeypatch):
+    threads = []
+
+    def analyze(*args):
+        threads.append(threading.current_thread().name)
+        return "Rest well.", None
+
+    monkeypatch.setattr(app_module, "analyze_and_speak", analyze)
+    response = _post_image(TestClient(app_module.app))
+    assert response.status_code == 200
+    assert response.json()["analysis"] == "Rest well."
+    assert threads[0].startswith("analysis")
+    assert 'admission_in_flight{pool="analysis"} 0' in app_module.metrics.render_prometheus()
@@ -0,0 +1,134 @@
+import sys
+import os
+import base64
+import email.parser
+import email.policy
+import io
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import audio_store as audio_store_module
+from src import gradio_app_advanced as app_module
+from src.audio_http import choose_response_mode, parse_range
+from src.audio_store import AudioStore
+
+AUDIO = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    store = AudioStore(tmp_path, ttl_seconds=60, max_bytes=0)
+    monkeypatch.setattr(audio_store_module, "_default_store", store)
+    audio_id = store.put_bytes(AUDIO)
+    return TestClient(app_module.app), audio_id
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=100-", 100) == 'unsatisfiable'
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_full_response_is_immutable_with_strong_etag(audio):
+    client, audio_id = audio
+    response = client.get(f"/api/audio/{audio_id}")
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["etag"] == f'"{audio_id}"'
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(AUDIO))
+
+
+def test_conditional_get_returns_304(audio):
+    client, audio_id = audio
+    response = client.get(f"/api/audio/{audio_id}", headers={"If-None-Match": f'"{audio_id}"'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == f'"{audio_id}"'
+
+
+def test_range_request_returns_only_requested_bytes(audio):
+    client, audio_id = audio
+    response = client.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=1000-1999"})
+    assert response.status_code == 206
+    assert response.content == AUDIO[1000:2000]
+    assert response.headers["content-range"] == f"bytes 1000-1999/{len(AUDIO)}"
+
+    tail = client.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=-100"})
+    assert tail.status_code == 206 and tail.content == AUDIO[-100:]
+
+
+def test_unsatisfiable_and_stale_if_range(audio):
+    client, audio_id = audio
+    response = client.get(f"/api/audio/{audio_id}", headers={"Range": f"bytes={len(AUDIO)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(AUDIO)}"
+
+    stale = client.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert stale.status_code == 200 and stale.content == AUDIO
+
+
+def _analyze(client, monkeypatch, audio_id, **form):
+    from src.audio_store import get_audio_store
+    monkeypatch.setattr(app_module, "analyze_and_speak", lambda *args: ("Rest well.", str(get_audio_store().path(audio_id))))
+    image = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(image, format="PNG")
+    files = {"image": ("scan.png", image.getvalue(), "image/png")}
+    headers = form.pop("headers", {})
+    return client.post("/api/analyze-image", files=files, data=form, headers=headers)
+
+
+def test_choose_response_mode():
+    assert choose_response_mode(None, None) == 'reference'
+    assert choose_response_mode("INLINE", None) == 'inline'
+    assert choose_response_mode("", "multipart/mixed, application/json") == 'multipart'
+    assert choose_response_mode("bogus", "application/json") == 'reference'
+
+
+def test_inline_mode_embeds_short_audio(audio, monkeypatch):
+    client, audio_id = audio
+    data = _analyze(client, monkeypatch, audio_id, response_mode="inline").json()
+    assert data["analysis"] == "Rest well."
+    assert data["audio_inline"] is True
+    assert data["audio_media_type"] == "audio/mpeg"
+    assert base64.b64decode(data["audio_base64"]) == AUDIO
+    assert data["audio_url"] == f"/api/audio/{audio_id}"
+
+
+def test_inline_mode_references_audio_over_threshold(audio, monkeypatch):
+    client, audio_id = audio
+    monkeypatch.setattr(app_module, "INLINE_AUDIO_MAX_BYTES", len(AUDIO) - 1)
+    data = _analyze(client, monkeypatch, audio_id, response_mode="inline").json()
+    assert "audio_base64" not in data
+    assert data["audio_url"] == f"/api/audio/{audio_id}"
+
+
+def test_default_mode_is_reference(audio, monkeypatch):
+    client, audio_id = audio
+    data = _analyze(client, monkeypatch, audio_id).json()
+    assert "audio_base64" not in data and data["audio_id"] == audio_id
+    # Deprecated alias for clients of the old response
+    assert data["audio_path"] == data["audio_url"] == f"/api/audio/{audio_id}"
+
+
+def test_multipart_mode_returns_json_and_audio(audio, monkeypatch):
+    client, audio_id = audio
+    response = _analyze(client, monkeypatch, audio_id, headers={"Accept": "multipart/mixed"})
+    assert response.headers["content-type"].startswith("multipart/mixed; boundary=")
+
+    raw = b"Content-Type: " + response.headers["content-type"].encode() + b"\r\n\r\n" + response.content
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(raw)
+    json_part, audio_part = list(message.iter_parts())
+    assert json.loads(json_part.get_payload(decode=True))["audio_id"] == audio_id
+    assert audio_part.get_content_type() == "audio/mpeg"
+    assert audio_part["ETag"] == f'"{audio_id}"'
+    assert audio_part.get_payload(decode=True) == AUDIO
@@ -0,0 +1,93 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import audio_store as audio_store_module
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.audio_store import AudioStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = AudioStore(tmp_path / "audio", ttl_seconds=60, max_bytes=1000)
+    monkeypatch.setattr(audio_store_module, "_default_store", store)
+    return store
+
+
+def _age(store, audio_id, seconds):
+    path = store.path(audio_id)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_put_and_resolve_opaque_ids(store):
+    audio_id = store.put_bytes(b"\xff\xf3audio")
+    path = store.path(audio_id)
+    assert path.read_bytes() == b"\xff\xf3audio"
+    assert store.id_for_path(str(path)) == audio_id
+
+    assert store.path("../../etc/passwd") is None
+    assert store.path("not-an-id") is None
+    assert store.put_bytes(b"\xff\xf3audio") == audio_id  # content addressed
+    assert store.id_for_path("/etc/passwd") is None
+
+
+def test_sweep_removes_expired_files(store):
+    old_id = store.put_bytes(b"old")
+    new_id = store.put_bytes(b"new")
+    _age(store, old_id, 120)
+
+    assert store.sweep() == {'expired': 1, 'evicted': 0}
+    assert store.path(old_id) is None
+    assert store.path(new_id) is not None
+
+
+def test_quota_evicts_oldest_first(store):
+    ids = []
+    for age in (30, 20, 10):
+        audio_id = store.put_bytes(bytes([age]) * 400)
+        _age(store, audio_id, age)
+        ids.append(audio_id)
+
+    # Fourth file pushes the store over its 1000-byte quota
+    newest = store.put_bytes(b"y" * 400)
+
+    assert store.path(ids[0]) is None and store.path(ids[1]) is None
+    assert store.path(ids[2]) is not None and store.path(newest) is not None
+    assert store.total_bytes() <= 1000
+
+
+def test_workers_sharing_a_directory_see_each_others_files(store):
+    other_worker = AudioStore(store.root, ttl_seconds=60, max_bytes=1000)
+    audio_id = other_worker.put_bytes(b"shared")
+    assert store.path(audio_id).read_bytes() == b"shared"
+    assert store.file_count() == 1
+
+
+def test_gauges_report_store_contents(store):
+    store.put_bytes(b"x" * 10)
+    text = app_module.metrics.render_prometheus()
+    assert "audio_store_files 1" in text
+    assert "audio_store_bytes 10" in text
+
+
+def test_generated_voice_is_served_by_id(store, monkeypatch):
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: b"\xff\xf3" + text.encode())
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(store.root.parent / "tts"))
+    path = app_module.generate_voice("Drink water.", "English", "Male")
+    audio_id = store.id_for_path(path)
+    assert audio_id
+
+    client = TestClient(app_module.app)
+    response = client.get(f"/api/audio/{audio_id}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.content == b"\xff\xf3Drink water."
+
+    assert client.get(f"/api/audio/{'0' * 64}").status_code == 404
+    assert client.get("/api/audio/..%2F..%2Fetc%2Fpasswd").status_code == 404
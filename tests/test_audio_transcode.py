@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import audio_store as audio_store_module
+from src import audio_transcode
+from src import gradio_app_advanced as app_module
+from src.audio_store import AudioStore
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "gtts_testing.mp3")
+
+needs_ffmpeg = pytest.mark.skipif(not audio_transcode.ffmpeg_available(), reason="ffmpeg not installed")
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    store = AudioStore(tmp_path, ttl_seconds=60, max_bytes=0)
+    monkeypatch.setattr(audio_store_module, "_default_store", store)
+    with open(SAMPLE, 'rb') as f:
+        audio_id = store.put_bytes(f.read())
+    return TestClient(app_module.app), store, audio_id
+
+
+def test_negotiate_format():
+    assert audio_transcode.negotiate_format("opus") == "opus"
+    assert audio_transcode.negotiate_format("OGG") == "opus"
+    assert audio_transcode.negotiate_format("mp3-low") == "mp3-low"
+    assert audio_transcode.negotiate_format(None, "audio/ogg; codecs=opus, audio/mpeg") == "opus"
+    assert audio_transcode.negotiate_format(None, "audio/ogg;q=0, audio/mpeg") == "mp3"
+    assert audio_transcode.negotiate_format("flac", "*/*") == "mp3"
+    assert audio_transcode.normalize_bitrate("opus", "999k") == "16k"
+    assert audio_transcode.normalize_bitrate("opus", "12K") == "12k"
+
+
+def test_audio_url_carries_requested_format():
+    assert app_module.audio_url_for("a" * 64, "opus") == f"/api/audio/{'a' * 64}?format=opus"
+    assert app_module.audio_url_for("a" * 64, "bogus") == f"/api/audio/{'a' * 64}"
+    assert app_module.audio_url_for(None, "opus") is None
+
+
+def test_original_served_without_ffmpeg(audio, monkeypatch):
+    client, store, audio_id = audio
+    monkeypatch.setattr(audio_transcode, "ffmpeg_available", lambda: False)
+    response = client.get(f"/api/audio/{audio_id}?format=opus")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.headers["etag"] == f'"{audio_id}"'
+
+
+@needs_ffmpeg
+def test_opus_variant_is_smaller_and_cached(audio):
+    client, store, audio_id = audio
+    response = client.get(f"/api/audio/{audio_id}", headers={"Accept": "audio/ogg"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/ogg"
+    assert response.headers["vary"] == "Accept"
+    assert response.content[:4] == b"OggS"
+    assert len(response.content) < store.path(audio_id).stat().st_size
+
+    etag = response.headers["etag"]
+    assert etag != f'"{audio_id}"'
+    assert store.file_count() == 2
+
+    again = client.get(f"/api/audio/{audio_id}?format=opus", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert store.file_count() == 2
+
+
+@needs_ffmpeg
+def test_low_bitrate_mp3_variant(audio):
+    client, store, audio_id = audio
+    response = client.get(f"/api/audio/{audio_id}?format=mp3-low&bitrate=16k")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert "vary" not in response.headers
+    assert len(response.content) < store.path(audio_id).stat().st_size
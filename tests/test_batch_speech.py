@@ -0,0 +1,165 @@
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import doctor_voice
+
+
+class FakeCommunicate:
+    """Stand-in for edge_tts.Communicate that sleeps instead of calling the service"""
+    delay = 0.05
+    active = 0
+    peak = 0
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+
+    async def save(self, path):
+        FakeCommunicate.active += 1
+        FakeCommunicate.peak = max(FakeCommunicate.peak, FakeCommunicate.active)
+        try:
+            await asyncio.sleep(FakeCommunicate.delay)
+            if "FAIL" in self.text:
+                raise RuntimeError("service error")
+            with open(path, "wb") as f:
+                f.write(b"\xff\xf3" + self.text.encode("utf-8"))
+        finally:
+            FakeCommunicate.active -= 1
+
+
+def _install_fake(monkeypatch):
+    FakeCommunicate.active = 0
+    FakeCommunicate.peak = 0
+    monkeypatch.setattr(doctor_voice.edge_tts, "Communicate", FakeCommunicate)
+
+
+def test_batch_runs_concurrently_with_limit(monkeypatch, tmp_path):
+    _install_fake(monkeypatch)
+    texts = {f"item_{i}.mp3": f"Take medicine {i}" for i in range(40)}
+
+    start = time.perf_counter()
+    created = doctor_voice.batch_generate_speech(texts, output_dir=str(tmp_path), concurrency=10)
+    elapsed = time.perf_counter() - start
+
+    assert len(created) == 40
+    assert FakeCommunicate.peak == 10
+    # Sequential synthesis would take 40 * 0.05 = 2.0 seconds
+    assert elapsed < 1.0
+
+
+def test_batch_reports_per_item_results_and_progress(monkeypatch, tmp_path):
+    _install_fake(monkeypatch)
+    texts = {"a.mp3": "Drink water", "b.mp3": "FAIL here", "c.mp3": "Rest well"}
+    progress = []
+
+    results = doctor_voice.batch_generate_speech(
+        texts,
+        output_dir=str(tmp_path),
+        progress_callback=lambda done, total, result: progress.append((done, total)),
+        return_results=True
+    )
+
+    assert [r['filename'] for r in results] == ["a.mp3", "b.mp3", "c.mp3"]
+    assert [r['success'] for r in results] == [True, False, True]
+    assert results[1]['path'] is None and results[1]['error']
+    assert all(r['elapsed'] >= 0 for r in results)
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_batch_callable_from_running_event_loop(monkeypatch, tmp_path):
+    _install_fake(monkeypatch)
+
+    async def handler():
+        return doctor_voice.batch_generate_speech({"x.mp3": "Hello"}, output_dir=str(tmp_path))
+
+    created = asyncio.run(handler())
+    assert created == [os.path.join(str(tmp_path), "x.mp3")]
+
+
+# MPEG-2 Layer III, 48 kbps, 24 kHz, mono: 144-byte frames of 24 ms (Edge TTS output format)
+FRAME_HEADER = b"\xff\xf3\x64\xc0"
+FRAME_SECONDS = 0.024
+
+
+def _frame(marker):
+    return FRAME_HEADER + bytes([marker]) * 140
+
+
+class FakePackedCommunicate:
+    """Speaks each line as 0.3 s words with 0.4 s pauses; frame payloads record the line being spoken"""
+    sessions = 0
+
+    def __init__(self, text, voice, boundary="SentenceBoundary", **kwargs):
+        self.lines = text.split("\n")
+        FakePackedCommunicate.sessions += 1
+
+    async def stream(self):
+        timeline = []
+        t = 0.1
+        for index, line in enumerate(self.lines, start=1):
+            for word in line.split():
+                yield {"type": "WordBoundary", "offset": int(t * 1e7), "duration": int(0.25 * 1e7), "text": word.strip(".")}
+                timeline.append((t, t + 0.25, index))
+                t += 0.3
+            t += 0.4
+        frames = []
+        for n in range(int(t / FRAME_SECONDS) + 1):
+            mid = n * FRAME_SECONDS + FRAME_SECONDS / 2
+            marker = next((i for start, end, i in timeline if start <= mid < end), 0)
+            frames.append(_frame(marker))
+        yield {"type": "audio", "data": b"".join(frames)}
+
+
+def test_iter_mp3_frames_and_split():
+    data = b"".join(_frame(i) for i in range(10))
+    frames = list(doctor_voice.iter_mp3_frames(data))
+    assert len(frames) == 10 and frames[1] == (144, 288, FRAME_SECONDS)
+
+    parts = doctor_voice.split_mp3_at_times(data, [0.05, 0.2])
+    assert [len(p) // 144 for p in parts] == [2, 6, 2]
+    assert b"".join(parts) == data
+
+
+def test_packed_batch_splits_audio_per_item(monkeypatch, tmp_path):
+    FakePackedCommunicate.sessions = 0
+    monkeypatch.setattr(doctor_voice.edge_tts, "Communicate", FakePackedCommunicate)
+    texts = {
+        "rx_1.mp3": "Take Paracetamol 500mg twice daily",
+        "rx_2.mp3": "Apply ice pack for 15 minutes.",
+        "rx_3.mp3": "Drink plenty of water",
+    }
+
+    results = doctor_voice.batch_generate_speech(texts, output_dir=str(tmp_path), packed=True, return_results=True)
+
+    assert FakePackedCommunicate.sessions == 1
+    assert all(r['success'] for r in results)
+    for index, result in enumerate(results, start=1):
+        with open(result['path'], 'rb') as f:
+            data = f.read()
+        markers = {data[start + 4] for start, _, _ in doctor_voice.iter_mp3_frames(data)}
+        assert markers - {0} == {index}
+
+
+def test_packed_batch_respects_request_size(monkeypatch, tmp_path):
+    FakePackedCommunicate.sessions = 0
+    monkeypatch.setattr(doctor_voice.edge_tts, "Communicate", FakePackedCommunicate)
+    texts = {f"rx_{i}.mp3": "Take one tablet after food " * 6 for i in range(40)}
+
+    created = doctor_voice.batch_generate_speech(texts, output_dir=str(tmp_path), packed=True)
+
+    assert len(created) == 40
+    assert FakePackedCommunicate.sessions == len(doctor_voice._make_packs(texts.items())) > 1
+
+
+def test_packed_batch_falls_back_to_single_requests(monkeypatch, tmp_path):
+    class NoBoundaries(FakeCommunicate):
+        async def stream(self):
+            yield {"type": "audio", "data": _frame(0) * 10}
+
+    _install_fake(monkeypatch)
+    monkeypatch.setattr(doctor_voice.edge_tts, "Communicate", NoBoundaries)
+
+    created = doctor_voice.batch_generate_speech({"a.mp3": "One", "b.mp3": "Two"}, output_dir=str(tmp_path), packed=True)
+    assert len(created) == 2
@@ -0,0 +1,92 @@
+import sys
+import os
+import io
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import multiprocessing
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import cpu_pool
+from src import gradio_app_advanced as app_module
+from src.cpu_pool import DECODES, decode_image, target_size
+
+
+def _encode(image, format="PNG"):
+    out = io.BytesIO()
+    image.save(out, format=format)
+    return out.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def _shared_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+def test_target_size_keeps_aspect_ratio():
+    assert target_size((4000, 3000), 3072) == (3072, 2304)
+    assert target_size((1000, 4000), 2000) == (500, 2000)
+    assert target_size((800, 600), 3072) == (800, 600)
+    assert target_size((4000, 3000), 0) == (4000, 3000)
+
+
+def test_small_uploads_decode_inline():
+    before = DECODES.value(where="inline")
+    image = decode_image(_encode(Image.new("RGBA", (8, 6), (10, 20, 30, 255))))
+    assert image.mode == "RGB" and image.size == (8, 6)
+    assert image.getpixel((0, 0)) == (10, 20, 30)
+    assert DECODES.value(where="inline") == before + 1
+
+
+def test_pool_decode_matches_inline_and_releases_shared_memory(pool):
+    data = _encode(Image.effect_noise((300, 200), 40).convert("RGB"))
+    blocks = _shared_blocks()
+    before = DECODES.value(where="pool")
+
+    pooled = decode_image(data, max_side=150, min_bytes=0, pool=pool)
+    inline = decode_image(data, max_side=150, min_bytes=len(data) + 1)
+
+    assert pooled.size == (150, 100)
+    assert pooled.tobytes() == inline.tobytes()
+    assert DECODES.value(where="pool") == before + 1
+    assert _shared_blocks() == blocks
+
+
+def test_invalid_images_are_rejected(pool):
+    with pytest.raises(Exception):
+        decode_image(b"not an image", min_bytes=0, pool=pool)
+    with pytest.raises(Exception):
+        # A valid header with a truncated body fails in the worker
+        decode_image(_encode(Image.effect_noise((300, 200), 40), "PNG")[:400], min_bytes=0, pool=pool)
+
+
+def test_broken_pool_falls_back_to_inline_decode(monkeypatch):
+    class BrokenPool:
+        def submit(self, *args):
+            raise BrokenProcessPool("worker died")
+
+    monkeypatch.setattr(cpu_pool, "shutdown_cpu_pool", lambda: None)
+    image = decode_image(_encode(Image.new("L", (20, 10), 128)), min_bytes=0, pool=BrokenPool())
+    assert image.size == (20, 10) and image.getpixel((0, 0)) == (128, 128, 128)
+
+
+def test_analyze_endpoint_downscales_large_uploads(monkeypatch):
+    seen = []
+    monkeypatch.setattr(app_module, "decode_image", lambda data: decode_image(data, max_side=64))
+    monkeypatch.setattr(app_module, "analyze_and_speak", lambda image, *args: (seen.append(image.size) or "ok", None))
+    files = {"image": ("scan.jpg", _encode(Image.new("RGB", (256, 128)), "JPEG"), "image/jpeg")}
+    response = TestClient(app_module.app).post("/api/analyze-image", files=files)
+    assert response.status_code == 200
+    assert seen == [(64, 32)]
+    bad = TestClient(app_module.app).post("/api/analyze-image", files={"image": ("x.png", b"junk", "image/png")})
+    assert bad.status_code == 400
@@ -0,0 +1,302 @@
+import sys
+import os
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import audio_store as audio_store_module
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.admission import AdmissionController
+from src.audio_store import AudioStore
+from src.deadline import (DEADLINE_EXCEEDED, WORK_RECLAIMED, Deadline, DeadlineExceeded, call_with_timeout,
+                          stage_timeout, watch_disconnect)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, chunks, on_chunk=None):
+        self.chunks = chunks
+        self.on_chunk = on_chunk
+        self.timeouts = []
+
+    def generate_content(self, contents, generation_config=None, stream=False, request_options=None):
+        self.timeouts.append(request_options["timeout"])
+        if not stream:
+            return Chunk("".join(self.chunks))
+
+        def iterate():
+            for text in self.chunks:
+                yield Chunk(text)
+                if self.on_chunk:
+                    self.on_chunk()
+        return iterate()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_store_module, "_default_store", AudioStore(tmp_path / "audio", ttl_seconds=60))
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(app_module, "render_with_bank", lambda text, language, gender, synthesize: None)
+    return app_module
+
+
+def test_timeouts_are_the_time_left_capped_per_call():
+    clock = Clock()
+    deadline = Deadline(30, clock=clock)
+    assert deadline.timeout("analysis", cap=45) == 30
+    assert deadline.timeout("analysis", cap=10) == 10
+    clock.now += 25
+    assert deadline.timeout("speech", cap=10) == 5
+    assert stage_timeout(None, "speech", cap=12) == 12
+
+    before = DEADLINE_EXCEEDED.value(stage="speech")
+    clock.now += 5
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout("speech")
+    with pytest.raises(DeadlineExceeded):
+        deadline.check("speech")
+    assert deadline.timed_out == ["speech"]
+    assert DEADLINE_EXCEEDED.value(stage="speech") == before + 1
+
+
+def test_call_with_timeout_releases_the_caller():
+    assert call_with_timeout(lambda a, b=0: a + b, 1, 2, b=3) == 5
+    with pytest.raises(ValueError):
+        call_with_timeout(int, 1, "not a number")
+
+    hang = threading.Event()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        call_with_timeout(hang.wait, 0.05)
+    assert time.monotonic() - start < 1
+    hang.set()
+
+
+def test_provider_calls_get_the_remaining_budget(app, monkeypatch):
+    clock = Clock()
+    model = FakeModel(["Rest well."])
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: model)
+    monkeypatch.setattr(app, "PROVIDER_TIMEOUT_SECONDS", 45)
+
+    app.analyze_image(Image.new("RGB", (4, 4)), "Full Analysis", deadline=Deadline(20, clock=clock))
+    app.analyze_image(Image.new("RGB", (4, 4)), "Full Analysis")
+    assert model.timeouts[0] == 20
+    assert model.timeouts[1] > 0  # a timeout even without a deadline
+
+
+def test_expired_analysis_skips_the_provider_and_fallbacks(app, monkeypatch):
+    clock = Clock()
+    deadline = Deadline(0, clock=clock)
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: pytest.fail("provider called"))
+    monkeypatch.setattr(app, "analyze_image_free", lambda *args: pytest.fail("fallback called"))
+    text, _ = app.analyze_image(Image.new("RGB", (4, 4)), "Full Analysis", deadline=deadline)
+    assert text == app.ANALYSIS_TIMEOUT_MESSAGE
+    assert deadline.timed_out == ["analysis"]
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_speech_out_of_time_returns_text_without_audio(app, monkeypatch, pipelined):
+    clock = Clock()
+    deadline = Deadline(10, clock=clock)
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: FakeModel(["Rest well. Drink water. "]))
+
+    def slow_synthesis(text, lang, timeout=None):
+        clock.now += 30  # the TTS call uses up the rest of the budget
+        return b"\xff\xf3"
+
+    monkeypatch.setattr(app, "synthesize_speech_bytes", slow_synthesis)
+    text, audio = app.analyze_and_speak(Image.new("RGB", (4, 4)), "Full Analysis", "English", "Male",
+                                        pipelined=pipelined, deadline=deadline)
+    assert text == "Rest well. Drink water. "
+    assert audio is None
+    assert deadline.timed_out == ["speech"]
+
+
+def test_stream_stops_at_the_deadline_keeping_text(app, monkeypatch):
+    clock = Clock()
+    deadline = Deadline(10, clock=clock)
+
+    def tick():
+        clock.now += 6
+
+    model = FakeModel(["One. ", "Two. ", "Three. "], on_chunk=tick)
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: model)
+    chunks = list(app.stream_analyze_image(Image.new("RGB", (4, 4)), "Full Analysis", deadline=deadline))
+    assert chunks == ["One. ", "Two. "]
+    assert deadline.timed_out == ["analysis"]
+
+
+def _post_image(client):
+    image = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(image, format="PNG")
+    return client.post("/api/analyze-image", files={"image": ("scan.png", image.getvalue(), "image/png")})
+
+
+def test_endpoint_reports_stages_that_timed_out(monkeypatch):
+    seen = []
+
+    def analyze(*args, **kwargs):
+        deadline = args[-1]
+        seen.append(deadline.remaining())
+        deadline.record("speech")
+        return "Rest well.", None
+
+    monkeypatch.setattr(app_module, "REQUEST_DEADLINE_SECONDS", 42)
+    monkeypatch.setattr(app_module, "analyze_and_speak", analyze)
+    data = _post_image(TestClient(app_module.app)).json()
+    assert data["analysis"] == "Rest well."
+    assert data["timed_out"] == ["speech"]
+    assert 0 < seen[0] <= 42
+
+
+def test_queue_wait_is_bounded_by_the_deadline(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app_module, "admission", AdmissionController(pool, name="test-deadline-queue",
+                                                                     max_in_flight=1, max_queue=5, queue_timeout=30))
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(app_module.run_admitted("analyze-image", gate.wait))
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        with pytest.raises(HTTPException) as excinfo:
+            await app_module.run_admitted("analyze-image", gate.wait, deadline=Deadline(0.1))
+        assert excinfo.value.status_code == 503
+        assert time.monotonic() - start < 2
+        gate.set()
+        await running
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+class Client:
+    """Stand-in for Request.is_disconnected"""
+
+    def __init__(self):
+        self.gone = False
+
+    async def is_disconnected(self):
+        return self.gone
+
+
+def test_cancelled_deadline_counts_reclaimed_work():
+    deadline = Deadline(60)
+    before = (WORK_RECLAIMED.value(stage="speech"), DEADLINE_EXCEEDED.value(stage="speech"))
+    deadline.cancel()
+    assert deadline.expired() and deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check("speech")
+    assert WORK_RECLAIMED.value(stage="speech") == before[0] + 1
+    assert DEADLINE_EXCEEDED.value(stage="speech") == before[1]
+
+
+def test_watch_disconnect_cancels_the_deadline():
+    client = Client()
+    deadline = Deadline(60)
+
+    async def scenario():
+        watcher = asyncio.create_task(watch_disconnect(client.is_disconnected, deadline, poll_seconds=0.01))
+        await asyncio.sleep(0.05)
+        assert not watcher.done() and not deadline.cancelled
+        client.gone = True
+        await asyncio.wait_for(watcher, 1)
+
+    asyncio.run(scenario())
+    assert deadline.cancelled
+
+
+def test_disconnect_after_analysis_skips_speech(app, monkeypatch, tmp_path):
+    deadline = Deadline(60)
+
+    class LeavingModel(FakeModel):
+        def generate_content(self, *args, **kwargs):
+            deadline.cancel()  # the patient closes the tab while the model is writing
+            return super().generate_content(*args, **kwargs)
+
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: LeavingModel(["Rest well. Drink water. "]))
+    monkeypatch.setattr(app, "synthesize_speech_bytes", lambda *args, **kwargs: pytest.fail("speech synthesized"))
+    before = WORK_RECLAIMED.value(stage="speech")
+    text, audio = app.analyze_and_speak(Image.new("RGB", (4, 4)), "Full Analysis", "English", "Male",
+                                        pipelined=False, deadline=deadline)
+    assert text == "Rest well. Drink water. "
+    assert audio is None
+    assert WORK_RECLAIMED.value(stage="speech") == before + 1
+    assert not list((tmp_path / "audio").glob("*.mp3"))
+
+
+def test_disconnected_request_leaves_the_queue(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    controller = AdmissionController(pool, name="test-disconnect-queue", max_in_flight=1, max_queue=5)
+    monkeypatch.setattr(app_module, "admission", controller)
+    gate = threading.Event()
+    client = Client()
+    before = WORK_RECLAIMED.value(stage="queue")
+
+    async def scenario():
+        running = asyncio.create_task(app_module.run_admitted("analyze-image", gate.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.create_task(app_module.run_admitted(
+            "analyze-image", lambda: pytest.fail("abandoned work ran"), is_disconnected=client.is_disconnected))
+        await asyncio.sleep(0.05)
+        assert controller.queue_depth == 1
+        client.gone = True
+        with pytest.raises(HTTPException) as excinfo:
+            await asyncio.wait_for(waiting, 2)
+        assert excinfo.value.status_code == 499
+        assert controller.queue_depth == 0
+        gate.set()
+        await running
+
+    asyncio.run(scenario())
+    pool.shutdown()
+    assert WORK_RECLAIMED.value(stage="queue") == before + 1
+
+
+def test_disconnect_while_running_cancels_the_deadline(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    controller = AdmissionController(pool, name="test-disconnect-running", max_in_flight=1, max_queue=5)
+    monkeypatch.setattr(app_module, "admission", controller)
+    client = Client()
+    deadline = Deadline(60)
+    stopped = threading.Event()
+
+    def work(deadline):
+        while not deadline.expired():
+            time.sleep(0.005)
+        stopped.set()
+
+    async def scenario():
+        task = asyncio.create_task(app_module.run_admitted("analyze-image", work, deadline, deadline=deadline,
+                                                           is_disconnected=client.is_disconnected))
+        await asyncio.sleep(0.05)
+        client.gone = True
+        with pytest.raises(HTTPException) as excinfo:
+            await asyncio.wait_for(task, 2)
+        assert excinfo.value.status_code == 499
+
+    asyncio.run(scenario())
+    assert stopped.wait(1)
+    pool.shutdown()
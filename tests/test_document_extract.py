@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src import cpu_pool
+from src import document_extract
+from src import gradio_app_advanced as app_module
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+    return str(path)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    return write_pdf(tmp_path / "report.pdf", [f"Page {i} lab result normal" for i in range(1, 21)])
+
+
+def test_pages_are_yielded_in_order(pdf):
+    pages = list(document_extract.iter_pdf_pages(pdf, parallel=False))
+    assert len(pages) == 20
+    assert pages[0].startswith("Page 1 lab") and pages[-1].startswith("Page 20 lab")
+
+
+def test_budget_stops_parsing_early(pdf, monkeypatch):
+    parsed = []
+    original = document_extract._iter_sequential
+
+    def counting(file_path):
+        for text in original(file_path):
+            parsed.append(text)
+            yield text
+
+    monkeypatch.setattr(document_extract, "_iter_sequential", counting)
+    text = document_extract.extract_pdf_text(pdf, char_budget=60, parallel=False)
+    assert len(text.replace("\n", "")) == 60
+    assert len(parsed) < 5
+
+
+def test_parallel_matches_sequential(pdf, monkeypatch):
+    monkeypatch.setattr(document_extract, "PAGES_PER_TASK", 3)
+    try:
+        parallel = list(document_extract.iter_pdf_pages(pdf, parallel=True))
+        budgeted = document_extract.extract_pdf_text(pdf, char_budget=100, parallel=True)
+    finally:
+        cpu_pool.shutdown_cpu_pool()
+    assert parallel == list(document_extract.iter_pdf_pages(pdf, parallel=False))
+    assert budgeted == document_extract.extract_pdf_text(pdf, char_budget=100, parallel=False)
+
+
+def test_large_files_go_to_the_pool_regardless_of_page_count(pdf, monkeypatch):
+    chosen = []
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 2)
+    monkeypatch.setattr(cpu_pool, "get_cpu_pool", lambda: None)
+
+    def fake_parallel(path, count, pool, workers):
+        chosen.append("pool")
+        yield "text"
+
+    monkeypatch.setattr(document_extract, "_iter_parallel", fake_parallel)
+    monkeypatch.setattr(document_extract, "PARALLEL_MIN_BYTES", 1)
+    assert list(document_extract.iter_pdf_pages(pdf)) == ["text"]
+    monkeypatch.setattr(document_extract, "PARALLEL_MIN_BYTES", 10 ** 9)
+    assert len(list(document_extract.iter_pdf_pages(pdf))) == 20  # 20 pages stay sequential
+    assert chosen == ["pool"]
+
+
+def test_app_extractors_use_streaming_reader(pdf):
+    assert app_module.extract_text_from_pdf(pdf, char_budget=10) == "Page 1 lab"
+    sections = app_module.extract_sections_from_pdf(pdf)
+    assert sections[2][0] == "Page 3" and sections[2][1].startswith("Page 3 lab")
+    assert app_module.extract_text_from_pdf("/nonexistent.pdf").startswith("Error reading PDF")
@@ -0,0 +1,162 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import audio_store as audio_store_module
+from src import document_playlist
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.admission import AdmissionController
+from src.audio_store import AudioStore
+from src.blob_storage import LocalBlobStorage
+from src.document_playlist import PlaylistStore, split_segments
+
+PARAGRAPH = "Take the prescribed medicine after food. Drink plenty of water and rest well."
+
+
+@pytest.fixture
+def audio_store(tmp_path, monkeypatch):
+    store = AudioStore(tmp_path / "audio", ttl_seconds=3600, max_bytes=0)
+    monkeypatch.setattr(audio_store_module, "_default_store", store)
+    return store
+
+
+@pytest.fixture
+def playlists(tmp_path, monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    store = PlaylistStore(tmp_path / "playlists", executor=executor)
+    monkeypatch.setattr(document_playlist, "_default_store", store)
+    yield store
+    executor.shutdown(wait=True)
+
+
+def fake_render(audio_store, calls):
+    def render(text, language, gender):
+        calls.append(text)
+        return audio_store.put_bytes(b"\xff\xf3" + text.encode())
+    return render
+
+
+def test_split_segments_keeps_first_segment_short():
+    sections = [("Page 1", "\n\n".join([PARAGRAPH] * 20)), ("Page 2", PARAGRAPH)]
+    segments = split_segments(sections, max_chars=500, first_max_chars=200)
+    assert len(segments[0]['text']) <= 200
+    assert all(len(s['text']) <= 500 for s in segments)
+    assert segments[-1] == {'title': "Page 2", 'text': PARAGRAPH}
+    assert "".join(s['text'] for s in segments).count("Drink plenty") == 21
+
+
+def test_split_segments_breaks_long_sentences_at_words():
+    segments = split_segments([("", "word " * 300)], max_chars=100, first_max_chars=100)
+    assert all(0 < len(s['text']) <= 100 for s in segments)
+    assert sum(s['text'].count("word") for s in segments) == 300
+
+
+def test_segment_rendered_on_demand_and_next_prefetched(playlists, audio_store):
+    calls = []
+    manifest = playlists.create([("Page 1", PARAGRAPH), ("Page 2", "Second page."), ("Page 3", "Third page.")], "English", "Male")
+    assert playlists.create([("Page 1", PARAGRAPH), ("Page 2", "Second page."), ("Page 3", "Third page.")], "English", "Male")['id'] == manifest['id']
+
+    audio_id, path = playlists.segment_audio(manifest['id'], 0, fake_render(audio_store, calls), audio_store)
+    assert path.read_bytes() == b"\xff\xf3" + PARAGRAPH.encode()
+    playlists.executor.shutdown(wait=True)
+    assert calls == [PARAGRAPH, "Second page."]
+
+    # Already rendered segments are not synthesized again, even by another worker
+    other_worker = PlaylistStore(playlists.root, executor=ThreadPoolExecutor(max_workers=1))
+    assert other_worker.segment_audio(manifest['id'], 1, fake_render(audio_store, calls), audio_store, prefetch=False)[0]
+    assert calls == [PARAGRAPH, "Second page."]
+    assert other_worker.segment_audio(manifest['id'], 9, fake_render(audio_store, calls), audio_store) == (None, None)
+
+
+def test_concurrent_requests_render_a_segment_once(playlists, audio_store):
+    manifest = playlists.create([("", PARAGRAPH)], "English", "Male")
+    calls = []
+    gate = threading.Event()
+
+    def slow_render(text, language, gender):
+        calls.append(text)
+        gate.wait(5)
+        return audio_store.put_bytes(text.encode())
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(playlists.segment_audio(manifest['id'], 0, slow_render, audio_store)))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len({audio_id for audio_id, _ in results}) == 1
+
+
+def test_sweep_removes_unused_playlists(playlists):
+    manifest = playlists.create([("", PARAGRAPH)], "English", "Male")
+    assert playlists.sweep(now=time.time() + playlists.ttl_seconds + 1) == 1
+    assert playlists.load(manifest['id']) is None
+
+
+def test_document_playlist_endpoints(tmp_path, playlists, audio_store, monkeypatch):
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: b"\xff\xf3" + text.encode())
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    document = tmp_path / "discharge.txt"
+    document.write_text("\n\n".join([PARAGRAPH] * 60), encoding="utf-8")
+
+    status, playlist = app_module.process_document_to_playlist(str(document), "English", "Female")
+    assert "segments" in status
+    assert playlist['total_chars'] > 4000
+    assert len(playlist['segments']) > 3
+    assert "text" not in playlist['segments'][0]
+
+    client = TestClient(app_module.app)
+    assert client.get(f"/api/playlists/{playlist['playlist_id']}").json() == playlist
+    response = client.get(playlist['segments'][0]['url'])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert b"Drink plenty of water" in response.content
+
+    assert client.get(f"/api/playlists/{playlist['playlist_id']}/segments/999").status_code == 404
+    assert client.get(f"/api/playlists/{'0' * 64}").status_code == 404
+
+
+def test_segment_synthesis_failure_is_not_a_404(tmp_path, playlists, audio_store, monkeypatch):
+    manifest = playlists.create([("", PARAGRAPH), ("", PARAGRAPH)], "English", "Male")
+    url = f"/api/playlists/{manifest['id']}/segments/0"
+    client = TestClient(app_module.app)
+
+    def unreachable(text, lang, timeout=None):
+        raise ConnectionError("TTS unreachable")
+
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", unreachable)
+    assert client.get(url).status_code == 502
+    assert client.get(f"/api/playlists/{manifest['id']}/segments/2").status_code == 404
+    assert client.get(f"/api/playlists/{'0' * 64}/segments/0").status_code == 404
+
+    # Synthesis goes through admission control like the other heavy routes
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app_module, "admission", AdmissionController(pool, name="test-segments", max_in_flight=0, max_queue=0))
+    response = client.get(url)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    pool.shutdown()
+
+
+def test_manifest_created_on_one_instance_loads_on_another(tmp_path):
+    shared = LocalBlobStorage(tmp_path / "shared")
+    executor = ThreadPoolExecutor(max_workers=1)
+    first = PlaylistStore(tmp_path / "a", executor=executor, shared=shared)
+    second = PlaylistStore(tmp_path / "b", executor=executor, shared=shared)
+    manifest = first.create([("", PARAGRAPH)], "English", "Male")
+    assert second.load(manifest['id']) == manifest
+    assert (tmp_path / "b" / f"{manifest['id']}.json").exists()
+    assert second.load("0" * 64) is None
+    executor.shutdown(wait=True)
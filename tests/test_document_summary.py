@@ -0,0 +1,184 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src import document_summary
+from src import extraction_cache
+from src import sentence_cache
+from src import audio_store as audio_store_module
+from src import gradio_app_advanced as app_module
+from src.audio_store import AudioStore
+from src.deadline import Deadline, stage_timeout
+from src.document_summary import DocumentSummarizer, SummaryCache, chunk_sections
+
+PARAGRAPH = "Patient was treated for pneumonia. Continue amoxicillin 500 mg three times daily for 5 days."
+
+
+class FakeLLM:
+    """Records prompts; map calls return notes, merge calls return the script"""
+
+    def __init__(self, delay=0.0, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on and self.fail_on in prompt:
+                raise RuntimeError("429 quota exceeded")
+            if prompt.startswith("You are reading part"):
+                part = prompt.split("part ", 1)[1].split(" ", 1)[0]
+                return f"**Notes {part}**: pneumonia, amoxicillin 500 mg."
+            return "# You had pneumonia. Take amoxicillin three times a day."
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def long_sections(pages=8):
+    return [(f"Page {i}", "\n\n".join([f"Page {i}. {PARAGRAPH}"] * 30)) for i in range(1, pages + 1)]
+
+
+def test_chunks_respect_size_and_keep_all_text():
+    sections = long_sections(3)
+    chunks = chunk_sections(sections, max_chars=1000)
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert sum(chunk.count("amoxicillin") for chunk in chunks) == 90
+
+
+def test_summary_is_map_reduce_in_chosen_language(tmp_path):
+    llm = FakeLLM()
+    summarizer = DocumentSummarizer(llm, "fake", lambda language: f"Respond in {language}.",
+                                    executor=ThreadPoolExecutor(4), cache=SummaryCache(tmp_path), chunk_chars=3000)
+    script, chunk_count = summarizer.summarize(long_sections(), "Hindi", title="discharge.pdf")
+    assert chunk_count == len(chunk_sections(long_sections(), 3000)) > 4
+    assert script == "You had pneumonia. Take amoxicillin three times a day."
+    merge = llm.prompts[-1]
+    assert merge.startswith("Respond in Hindi.")
+    assert "Part 1: Notes 1: pneumonia" in merge
+    assert '("discharge.pdf")' in merge
+
+
+def test_chunk_notes_are_cached(tmp_path):
+    cache = SummaryCache(tmp_path)
+    first = FakeLLM()
+    DocumentSummarizer(first, "fake", executor=ThreadPoolExecutor(2), cache=cache, chunk_chars=3000).summarize(long_sections(), "English")
+    second = FakeLLM()
+    DocumentSummarizer(second, "fake", executor=ThreadPoolExecutor(2), cache=cache, chunk_chars=3000).summarize(long_sections(), "Telugu")
+    assert len(first.prompts) == len(chunk_sections(long_sections(), 3000)) + 1
+    assert len(second.prompts) == 1  # only the merge
+    third = FakeLLM()
+    DocumentSummarizer(third, "other-model", executor=ThreadPoolExecutor(2), cache=cache, chunk_chars=3000).summarize(long_sections(), "English")
+    assert len(third.prompts) == len(first.prompts)
+
+
+def test_concurrency_is_bounded_and_wall_time_tracks_chunk_latency():
+    llm = FakeLLM(delay=0.1)
+    summarizer = DocumentSummarizer(llm, "fake", executor=ThreadPoolExecutor(4), chunk_chars=1500)
+    start = time.perf_counter()
+    _, chunk_count = summarizer.summarize(long_sections(), "English")
+    elapsed = time.perf_counter() - start
+    assert chunk_count >= 12
+    assert llm.peak == 4
+    assert elapsed < 0.1 * chunk_count / 2
+
+
+def test_failed_chunks_and_merges_degrade_gracefully():
+    llm = FakeLLM(fail_on="part 2 of")
+    summarizer = DocumentSummarizer(llm, "fake", executor=ThreadPoolExecutor(2), chunk_chars=3000)
+    script, _ = summarizer.summarize(long_sections(), "English")
+    assert "Part 2: Page 1. Patient was treated for pneumonia" in llm.prompts[-1]
+    assert script.startswith("You had pneumonia")
+
+    failing = DocumentSummarizer(FakeLLM(fail_on="Notes:"), "fake", executor=ThreadPoolExecutor(2), chunk_chars=3000)
+    script, _ = failing.summarize(long_sections(2), "English")
+    assert script.startswith("Notes 1: pneumonia")
+    # English notes are not read out in another language
+    script, chunk_count = failing.summarize(long_sections(2), "Hindi")
+    assert script == "" and chunk_count > 0
+
+
+def test_many_notes_are_merged_in_groups(monkeypatch):
+    monkeypatch.setattr(document_summary, "_NOTE_GROUP_CHARS", 120)
+    llm = FakeLLM()
+    summarizer = DocumentSummarizer(llm, "fake", executor=ThreadPoolExecutor(2), chunk_chars=1500)
+    script, chunk_count = summarizer.summarize(long_sections(), "English")
+    merges = [p for p in llm.prompts if not p.startswith("You are reading part")]
+    assert len(merges) > 1
+    # Groups are condensed into notes; only the final merge writes the script
+    assert all(p.startswith("Below are notes") and "in English" in p for p in merges[:-1])
+    assert merges[-1].startswith("Respond in English.") and "read aloud" in merges[-1]
+    assert script.startswith("You had pneumonia")
+
+
+@pytest.fixture
+def app_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_store_module, "_default_store", AudioStore(tmp_path / "audio", ttl_seconds=3600, max_bytes=0))
+    monkeypatch.setattr(extraction_cache, "_default_cache", extraction_cache.ExtractionCache(tmp_path / "extract"))
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: b"\xff\xf3" + text.encode())
+    monkeypatch.setattr(document_summary, "SUMMARY_CACHE_DIR", tmp_path / "summaries")
+
+
+def test_long_documents_are_summarized_before_narration(tmp_path, app_stores, monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(app_module, "get_document_summarizer",
+                        lambda deadline=None: DocumentSummarizer(llm, "fake", executor=ThreadPoolExecutor(2), chunk_chars=3000))
+    document = tmp_path / "discharge.txt"
+    document.write_text("\n\n".join([PARAGRAPH] * 300), encoding="utf-8")
+
+    status, audio_path = app_module.process_document_to_speech(str(document), "English", "Male")
+    assert status.startswith("Summarized 28")
+    audio = open(audio_path, 'rb').read()
+    assert b"You had pneumonia." in audio and b"amoxicillin three times a day." in audio
+    assert b"Continue amoxicillin" not in audio
+
+    # Short documents are read as they are
+    short = tmp_path / "note.txt"
+    short.write_text(PARAGRAPH, encoding="utf-8")
+    status, _ = app_module.process_document_to_speech(str(short), "English", "Male")
+    assert status.startswith("Extracted")
+
+
+def test_no_summarizer_without_llm(monkeypatch):
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", None)
+    monkeypatch.setattr(app_module, "GROQ_API_KEY", None)
+    assert app_module.get_document_summarizer() is None
+
+
+def test_document_summary_stops_at_the_deadline(tmp_path, app_stores, monkeypatch):
+    now = [0.0]
+    deadline = Deadline(10, clock=lambda: now[0])
+    timeouts = []
+
+    def generate(prompt, deadline=None):
+        timeouts.append(stage_timeout(deadline, "summary"))
+        now[0] += 20
+        return "notes"
+
+    monkeypatch.setattr(app_module, "generate_summary_text", generate)
+    monkeypatch.setattr(app_module, "summary_model_name", lambda: "fake")
+    monkeypatch.setattr(app_module, "DOCUMENT_SUMMARY", True)
+    monkeypatch.setattr(app_module, "SummaryCache", lambda: SummaryCache(tmp_path / "summaries"))
+    monkeypatch.setattr(document_summary, "get_summary_executor", lambda: ThreadPoolExecutor(1))
+    document = tmp_path / "discharge.txt"
+    document.write_text("\n\n".join([PARAGRAPH] * 300), encoding="utf-8")
+
+    status, audio_path = app_module.process_document_to_speech(str(document), "English", "Male", deadline=deadline)
+    # The first part got the time left; the rest (and the speech) were not attempted
+    assert timeouts == [10]
+    assert audio_path is None
+    assert deadline.timed_out == ["summary"]
@@ -0,0 +1,114 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src import extraction_cache
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.extraction_cache import ExtractionCache, file_digest
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ExtractionCache(tmp_path / "extract", max_bytes=10_000)
+    monkeypatch.setattr(extraction_cache, "_default_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "lab_report.txt"
+    path.write_text("Haemoglobin 13.5 g/dL. Platelets normal.", encoding="utf-8")
+    return path
+
+
+def counting_extractor(calls, sections):
+    def extract(file_path, char_budget):
+        calls.append(char_budget)
+        return extraction_cache.trim_sections(sections, char_budget)
+    return extract
+
+
+def test_second_load_skips_parsing(cache, document):
+    calls = []
+    extract = counting_extractor(calls, [("Page 1", "First page."), ("Page 2", "Second page.")])
+    first = cache.load(str(document), "pdf", extract)
+    second = cache.load(str(document), "pdf", extract)
+    assert first == second == [("Page 1", "First page."), ("Page 2", "Second page.")]
+    assert calls == [None]
+
+
+def test_key_is_file_content_not_path(cache, document, tmp_path):
+    copy = tmp_path / "copy.txt"
+    copy.write_bytes(document.read_bytes())
+    assert file_digest(str(copy)) == file_digest(str(document))
+    calls = []
+    extract = counting_extractor(calls, [("", "text")])
+    cache.load(str(document), "txt", extract)
+    cache.load(str(copy), "txt", extract)
+    assert calls == [None]
+
+
+def test_extractor_version_change_invalidates(cache, document, tmp_path):
+    calls = []
+    extract = counting_extractor(calls, [("", "text")])
+    cache.load(str(document), "txt", extract)
+    upgraded = ExtractionCache(cache.root, version="2-test")
+    upgraded.load(str(document), "txt", extract)
+    assert calls == [None, None]
+
+
+def test_budgeted_entry_only_serves_smaller_budgets(cache, document):
+    calls = []
+    extract = counting_extractor(calls, [("Page 1", "a" * 50), ("Page 2", "b" * 50)])
+    assert cache.load(str(document), "pdf", extract, char_budget=60) == [("Page 1", "a" * 50), ("Page 2", "b" * 10)]
+    assert cache.load(str(document), "pdf", extract, char_budget=20) == [("Page 1", "a" * 20)]
+    assert calls == [60]
+
+    # The whole document needs a full parse, which then serves every budget
+    assert len(cache.load(str(document), "pdf", extract)) == 2
+    cache.load(str(document), "pdf", extract, char_budget=80)
+    assert calls == [60, None]
+
+
+def test_extraction_that_ignores_the_budget_is_complete(cache, document):
+    calls = []
+    # Like the DOCX extractor: every section is returned whatever the budget
+    extract = counting_extractor(calls, [("Intro", "a" * 50), ("Plan", "b" * 50)])
+    ignoring = lambda file_path, char_budget: extract(file_path, None)
+    assert cache.load(str(document), "docx", ignoring, char_budget=60) == [("Intro", "a" * 50), ("Plan", "b" * 10)]
+    assert len(cache.load(str(document), "docx", ignoring)) == 2
+    assert calls == [None]
+
+
+def test_size_cap_evicts_least_recently_used(cache, tmp_path):
+    digests = []
+    for i in range(5):
+        digest = f"{i:064x}"
+        cache.put(digest, "txt", [("", str(i) * 3000)])
+        digests.append(digest)
+    assert cache._files.scan()[1] <= cache.max_bytes
+    assert cache.get(digests[0], "txt") is None
+    assert cache.get(digests[-1], "txt") is not None
+
+
+def test_repeated_document_to_speech_parses_once(cache, document, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: b"\xff\xf3")
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    calls = []
+    original = app_module.extract_sections_from_txt
+
+    def counting(file_path, char_budget=None):
+        calls.append(file_path)
+        return original(file_path, char_budget)
+
+    monkeypatch.setitem(app_module.DOCUMENT_EXTRACTORS, '.txt', ('txt', counting))
+    for _ in range(2):
+        status, audio_file = app_module.process_document_to_speech(str(document), "English", "Male")
+        assert status == "Extracted 40 characters from document."
+        assert audio_file
+    status, playlist = app_module.process_document_to_playlist(str(document), "English", "Male")
+    assert playlist['total_chars'] == 40
+    assert len(calls) == 1
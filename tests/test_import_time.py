@@ -0,0 +1,99 @@
+import sys
+import os
+import subprocess
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import pytest
+
+from bench_import_time import ROOT, import_profile
+from src import providers
+
+# Cold-start budget for importing the app (best of three runs). The import
+# takes about 350 ms; the default is about three times that, so slow or busy
+# machines pass but eagerly imported provider SDKs (over 1.2 s) do not.
+# IMPORT_BUDGET_MS overrides it
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "1000"))
+LAZY_MODULES = ["google.generativeai", "groq", "gtts", "docx", "PyPDF2", "requests"]
+
+
+@pytest.fixture(scope="module")
+def app_imports():
+    runs = [import_profile("src.gradio_app_advanced") for _ in range(3)]
+    return min(runs, key=lambda run: run[0]["src.gradio_app_advanced"][1])
+
+
+def test_app_import_is_within_budget(app_imports):
+    profile, _ = app_imports
+    assert profile["src.gradio_app_advanced"][1] / 1000 < IMPORT_BUDGET_MS
+
+
+def test_provider_libraries_load_on_first_use(app_imports):
+    profile, _ = app_imports
+    assert [name for name in LAZY_MODULES if name in profile] == []
+
+
+def test_import_prints_nothing(app_imports):
+    _, stdout = app_imports
+    assert stdout == ""
+
+
+def test_doctor_scripts_do_no_work_at_import(tmp_path):
+    # No images.jpeg in the working directory: importing must not open it or call Gemini
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import src.doctor_brain, src.doctors_brain; "
+            "print('google.generativeai' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code, ROOT], cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False"
+
+
+def test_registry_loads_each_provider_once(monkeypatch):
+    calls = []
+    started = threading.Barrier(8)
+
+    def loader():
+        calls.append(1)
+        return object()
+
+    monkeypatch.setitem(providers._loaders, "test-once", loader)
+    results = []
+
+    def use():
+        started.wait()
+        results.append(providers.get("test-once"))
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    providers._loaded.pop("test-once", None)
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_failed_loads_are_retried(monkeypatch):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ImportError("not yet")
+        return "client"
+
+    monkeypatch.setitem(providers._loaders, "test-flaky", flaky)
+    with pytest.raises(ImportError):
+        providers.get("test-flaky")
+    assert not providers.is_loaded("test-flaky")
+    assert providers.get("test-flaky") == "client"
+    providers._loaded.pop("test-flaky", None)
+    with pytest.raises(KeyError):
+        providers.get("no-such-provider")
+
+
+def test_groq_client_needs_a_key(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.setitem(providers._loaders, "test-groq", providers._load_groq)
+    assert providers.get("test-groq") is None
+    providers._loaded.pop("test-groq", None)
@@ -0,0 +1,229 @@
+import sys
+import os
+import asyncio
+import io
+import json
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import audio_store as audio_store_module
+from src import document_playlist
+from src import extraction_cache
+from src import job_queue
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.audio_store import AudioStore
+from src.document_playlist import PlaylistStore
+from src.job_queue import JobFailed, JobQueue, job_events
+
+PARAGRAPH = "Take the prescribed medicine after food. Drink plenty of water and rest well."
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.sqlite3", tmp_path / "files", workers=0, lease_seconds=30,
+                    retry_base_seconds=10, retry_max_seconds=60)
+
+
+def test_job_runs_and_stores_result(queue):
+    queue.register("echo", lambda payload, job: {"echo": payload["text"], "attempt": job.attempt})
+    job_id = queue.submit("echo", {"text": "hello"})
+    (queue.job_dir(job_id) / "input.txt").write_text("x")
+    assert queue.depth() == 1
+
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"echo": "hello", "attempt": 1}
+    assert not (queue.files_dir / job_id).exists()
+    assert queue.depth() == 0
+    assert not queue.run_one()
+
+    with pytest.raises(ValueError):
+        queue.submit("unknown", {})
+
+
+def test_failed_attempts_retry_with_backoff(queue):
+    attempts = []
+
+    def flaky(payload, job):
+        attempts.append(job.attempt)
+        if job.attempt < 2:
+            raise RuntimeError("model timeout")
+        return "done"
+
+    queue.register("flaky", flaky)
+    job_id = queue.submit("flaky", {})
+    before = time.time()
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["error"] == "model timeout"
+    assert before + 5 <= job["run_after"] <= time.time() + 10
+
+    # Not due yet
+    assert queue.claim() is None
+    queue._execute(queue.claim(now=job["run_after"] + 1))
+    assert queue.get(job_id)["status"] == "succeeded"
+    assert attempts == [1, 2]
+    assert queue.retry_delay(10) <= 60
+
+
+def test_failures_stop_at_max_attempts(queue):
+    queue.register("broken", lambda payload, job: 1 / 0)
+    queue.register("invalid", lambda payload, job: (_ for _ in ()).throw(JobFailed("bad input")))
+    broken = queue.submit("broken", {}, max_attempts=1)
+    invalid = queue.submit("invalid", {})
+    queue.run_one()
+    queue.run_one()
+    assert queue.get(broken)["status"] == "failed"
+    assert queue.get(invalid)["status"] == "failed"
+    assert queue.get(invalid)["error"] == "bad input"
+    assert queue.get(invalid)["attempts"] == 1
+
+
+def test_cancel_queued_and_running_jobs(queue):
+    steps = []
+
+    def long_job(payload, job):
+        for step in range(5):
+            job.check_cancelled()
+            steps.append(step)
+            if step == 1:
+                queue.cancel(job.job_id)
+
+    queue.register("long", long_job)
+    queued = queue.submit("long", {})
+    assert queue.cancel(queued)
+    assert queue.get(queued)["status"] == "cancelled"
+    assert not queue.run_one()
+
+    running = queue.submit("long", {})
+    assert queue.run_one()
+    assert queue.get(running)["status"] == "cancelled"
+    assert steps == [0, 1]
+    assert not queue.cancel(running)
+    assert not queue.cancel("missing")
+
+
+def test_jobs_of_crashed_workers_are_resumed(tmp_path, queue):
+    queue.register("echo", lambda payload, job: job.attempt)
+    job_id = queue.submit("echo", {})
+    job = queue.claim()
+
+    # The worker process dies while running the job
+    queue._connect().execute("UPDATE jobs SET owner = ? WHERE id = ?", (f"{job_queue.socket.gethostname()}:999999999", job_id))
+    restarted = JobQueue(queue.db_path, queue.files_dir, workers=0)
+    restarted.register("echo", lambda payload, job: job.attempt)
+    assert restarted.recover() == 1
+    assert restarted.run_one()
+    assert restarted.get(job_id)["result"] == 2
+
+    # The lost worker's late result is ignored
+    queue._finish(job, "succeeded", result="stale")
+    assert restarted.get(job_id)["result"] == 2
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(queue):
+    queue.register("echo", lambda payload, job: "ok")
+    job_id = queue.submit("echo", {}, max_attempts=2)
+    first = queue.claim()
+    assert queue.claim() is None
+    second = queue.claim(now=first["started_at"] + 31)
+    assert second["id"] == job_id and second["attempts"] == 2
+    assert queue.claim(now=first["started_at"] + 62) is None
+    assert queue.get(job_id)["status"] == "failed"
+
+
+def test_worker_threads_run_submitted_jobs(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", tmp_path / "files", workers=2, poll_seconds=0.05)
+    queue.register("square", lambda payload, job: payload["n"] ** 2)
+    queue.start()
+    try:
+        ids = [queue.submit("square", {"n": n}) for n in range(6)]
+        deadline = time.time() + 10
+        while time.time() < deadline and any(queue.get(i)["status"] != "succeeded" for i in ids):
+            time.sleep(0.05)
+        assert [queue.get(i)["result"] for i in ids] == [0, 1, 4, 9, 16, 25]
+        assert job_queue.QUEUE_DEPTH.value() == 0
+    finally:
+        queue.stop(timeout=5)
+
+
+def test_job_events_stream_until_finished(queue):
+    queue.register("echo", lambda payload, job: "done")
+    job_id = queue.submit("echo", {})
+
+    async def collect():
+        events = []
+        async for event in job_events(queue, job_id, poll_seconds=0.01):
+            events.append(event)
+            if len(events) == 1:
+                await asyncio.to_thread(queue.run_one)
+        return events
+
+    events = asyncio.run(collect())
+    states = [json.loads(event.split("data: ", 1)[1]) for event in events]
+    assert [state["status"] for state in states] == ["queued", "succeeded"]
+    assert states[-1]["result"] == "done"
+
+
+@pytest.fixture
+def app_queue(tmp_path, monkeypatch, queue):
+    monkeypatch.setattr(job_queue, "_default_queue", queue)
+    monkeypatch.setattr(audio_store_module, "_default_store", AudioStore(tmp_path / "audio", ttl_seconds=3600, max_bytes=0))
+    monkeypatch.setattr(document_playlist, "_default_store", PlaylistStore(tmp_path / "playlists"))
+    monkeypatch.setattr(extraction_cache, "_default_cache", extraction_cache.ExtractionCache(tmp_path / "extract"))
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: b"\xff\xf3" + text.encode())
+    return queue
+
+
+def test_document_narration_job_endpoints(app_queue):
+    client = TestClient(app_module.app)
+    body = "\n\n".join([PARAGRAPH] * 40).encode()
+    response = client.post("/api/jobs/document-narration", files={"file": ("notes.txt", body, "text/plain")},
+                           data={"language": "English"})
+    assert response.status_code == 202
+    links = response.json()
+    assert client.get(links["status_url"]).json()["status"] == "queued"
+
+    assert app_queue.run_one()
+    job = client.get(links["status_url"]).json()
+    assert job["status"] == "succeeded"
+    assert job["progress"]["done"] == job["progress"]["total"] == len(job["result"]["segments"])
+    assert job["result"]["title"] == "notes.txt"
+
+    events = client.get(links["events_url"])
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert '"status": "succeeded"' in events.text
+
+    assert client.delete(links["status_url"]).status_code == 409
+    assert client.get("/api/jobs/missing").status_code == 404
+    assert client.delete("/api/jobs/missing").status_code == 404
+
+
+def test_image_analysis_job_endpoint(app_queue, monkeypatch):
+    seen = []
+
+    def fake_analysis(image_path, language, depth):
+        seen.append((Image.open(image_path).size, language, depth))
+        return "Fracture not visible. Rest well."
+
+    monkeypatch.setattr(app_module, "analyze_medical_image_advanced", fake_analysis)
+    image = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(image, format="PNG")
+    client = TestClient(app_module.app)
+    response = client.post("/api/jobs/image-analysis", files={"image": ("xray.png", image.getvalue(), "image/png")},
+                           data={"language": "Hindi"})
+    assert response.status_code == 202
+    assert client.post("/api/jobs/image-analysis", files={"image": ("x.png", b"nope", "image/png")}).status_code == 400
+
+    app_queue.run_one()
+    job = client.get(response.json()["status_url"]).json()
+    assert job["status"] == "succeeded"
+    assert seen == [((8, 8), "Hindi", "comprehensive")]
+    assert job["result"]["audio_url"].startswith("/api/audio/")
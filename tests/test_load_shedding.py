@@ -0,0 +1,127 @@
+import sys
+import os
+import io
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src import gradio_app_advanced as app_module
+from src.load_shedding import TIER_REQUESTS, QualityGovernor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def governed():
+    load = {"pressure": 0.0}
+    clock = Clock()
+    governor = QualityGovernor(lambda: load["pressure"], thresholds=(1.0, 1.5), recover_ratio=0.7,
+                               cooldown=10, clock=clock)
+    return governor, load, clock
+
+
+def test_tiers_drop_as_soon_as_pressure_rises(governed):
+    governor, load, _ = governed
+    assert governor.current() == 'full'
+    load["pressure"] = 1.0
+    assert governor.current() == 'reduced'
+    load["pressure"] = 3.0
+    assert governor.current() == 'minimal'
+
+
+def test_recovery_waits_for_a_calm_period_one_tier_at_a_time(governed):
+    governor, load, clock = governed
+    load["pressure"] = 2.0
+    assert governor.current() == 'minimal'
+
+    load["pressure"] = 0.0
+    assert governor.current() == 'minimal'
+    clock.now = 9
+    assert governor.current() == 'minimal'
+    clock.now = 10
+    assert governor.current() == 'reduced'
+    clock.now = 15
+    assert governor.current() == 'reduced'  # the next step needs its own cool-down
+    clock.now = 20
+    assert governor.current() == 'full'
+
+
+def test_pressure_near_the_threshold_does_not_flap(governed):
+    governor, load, clock = governed
+    load["pressure"] = 1.0
+    assert governor.current() == 'reduced'
+    for step in range(1, 50):
+        clock.now = step
+        load["pressure"] = 0.9 if step % 2 else 1.0
+        assert governor.current() == 'reduced'
+
+    # A spike during the calm period restarts it
+    load["pressure"] = 0.5
+    clock.now = 100
+    governor.current()
+    load["pressure"] = 0.8
+    clock.now = 105
+    governor.current()
+    load["pressure"] = 0.5
+    clock.now = 112
+    assert governor.current() == 'reduced'
+    clock.now = 122
+    assert governor.current() == 'full'
+
+
+def test_admit_counts_requests_by_tier(governed):
+    governor, load, _ = governed
+    before = TIER_REQUESTS.value(tier='minimal')
+    load["pressure"] = 5
+    assert governor.admit() == 'minimal'
+    assert TIER_REQUESTS.value(tier='minimal') == before + 1
+
+
+def test_cheaper_tiers_use_brief_prompts_and_fewer_tokens():
+    image = Image.new("RGB", (4, 4))
+    full = app_module.build_analysis_prompt(image, "Full Analysis")
+    minimal = app_module.build_analysis_prompt(image, "Full Analysis", tier='minimal')
+    assert "MEDICAL REPORT" in full and "MEDICAL REPORT" not in minimal
+    assert len(minimal) < len(full)
+    tokens = [app_module.analysis_generation_config(tier)["max_output_tokens"] for tier in ('full', 'reduced', 'minimal')]
+    assert tokens == sorted(tokens, reverse=True)
+    assert app_module.analysis_generation_config('reduced')["temperature"] == app_module.ANALYSIS_GENERATION_CONFIG["temperature"]
+
+
+def test_minimal_tier_skips_audio(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "analyze_image", lambda *args: (calls.append(args[4]) or "Rest.", None))
+    monkeypatch.setattr(app_module, "generate_voice", lambda *args: pytest.fail("audio generated"))
+    monkeypatch.setattr(app_module, "stream_analyze_image", lambda *args: pytest.fail("speech pipeline used"))
+    assert app_module.analyze_and_speak(None, "Full Analysis", "English", "Male", tier='minimal') == ("Rest.", None)
+    assert calls == ['minimal']
+
+
+def _post_image(client):
+    image = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(image, format="PNG")
+    return client.post("/api/analyze-image", files={"image": ("scan.png", image.getvalue(), "image/png")})
+
+
+def test_response_states_the_served_tier(monkeypatch):
+    tiers = []
+    monkeypatch.setattr(app_module, "quality_governor", QualityGovernor(lambda: 2.0))
+    monkeypatch.setattr(app_module, "analyze_and_speak", lambda *args, **kwargs: (tiers.append(args[6]) or "Rest.", None))
+    client = TestClient(app_module.app)
+
+    data = _post_image(client).json()
+    assert data["quality_tier"] == 'minimal' and data["degraded"] is True
+    assert data["audio_url"] is None
+
+    monkeypatch.setattr(app_module, "LOAD_SHEDDING", False)
+    data = _post_image(client).json()
+    assert data["quality_tier"] == 'full' and data["degraded"] is False
+    assert tiers == ['minimal', 'full']
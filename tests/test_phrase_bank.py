@@ -0,0 +1,113 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src import phrase_bank
+from src import gradio_app_advanced as app_module
+
+
+def _fake_render(text, language, gender):
+    return f"[{language}:{text}]".encode("utf-8")
+
+
+@pytest.fixture
+def bank_dir(tmp_path, monkeypatch):
+    stats = phrase_bank.build_bank(_fake_render, bank_dir=tmp_path, languages=['English', 'Hindi'])
+    assert stats['failed'] == 0
+    monkeypatch.setattr(phrase_bank, "BANK_DIR", tmp_path)
+    return tmp_path
+
+
+def test_build_writes_manifest_for_each_language_and_gender(bank_dir):
+    manifest = phrase_bank.load_manifest(bank_dir)
+    keys = {(e['language'], e['gender']) for e in manifest['entries']}
+    assert keys == {('English', 'Male'), ('English', 'Female'), ('Hindi', 'Male'), ('Hindi', 'Female')}
+
+    greeting = app_module.COMMON_RESPONSES['greeting']['English']
+    assert any(e['text'] == greeting for e in manifest['entries'])
+    for entry in manifest['entries']:
+        assert (bank_dir / entry['file']).exists()
+
+
+def test_canned_reply_needs_no_synthesis(bank_dir):
+    text = app_module.get_common_response('thanks', 'Hindi')
+
+    def synthesize(segment):
+        raise AssertionError(f"unexpected synthesis of {segment!r}")
+
+    audio = phrase_bank.render_with_bank(text, 'Hindi', 'Female', synthesize)
+    assert audio == _fake_render(text, 'Hindi', 'Female')
+
+
+def test_fallback_reply_splices_banked_prefix_and_suffix(bank_dir):
+    text = app_module.call_alternative_ai_service("I have a rash on my arm", language='English')
+    synthesized = []
+
+    def synthesize(segment):
+        synthesized.append(segment)
+        return b"<dynamic>"
+
+    audio = phrase_bank.render_with_bank(text, 'English', 'Male', synthesize)
+    assert synthesized == ["I have a rash on my arm"]
+    assert audio.count(b"<dynamic>") == 1
+    assert audio.startswith(b"[English:API service temporarily unavailable.")
+
+
+def test_headers_inside_analysis_are_banked(bank_dir):
+    segments = phrase_bank.plan_segments("1. SYMPTOMS: Red patch on the arm.\n2. DIAGNOSIS: Eczema.", 'English', 'Male')
+    kinds = [kind for kind, _ in segments]
+    assert kinds == ['text', 'bank', 'text', 'bank', 'text']
+    assert segments[2] == ('text', "Red patch on the arm.\n2.")
+
+
+def test_text_without_known_phrases_is_not_handled(bank_dir):
+    assert phrase_bank.render_with_bank("Take rest today.", 'English', 'Male', lambda s: b"x") is None
+
+
+def test_generate_voice_uses_bank_without_network(bank_dir, monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("gTTS must not be called for canned replies")
+
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", no_network)
+    path = app_module.generate_voice(app_module.get_common_response('greeting', 'English'), 'English', 'Male')
+    try:
+        assert path and os.path.getsize(path) > 0
+    finally:
+        if path:
+            os.unlink(path)
+
+
+def test_bank_is_complete_only_with_every_language(tmp_path, bank_dir):
+    assert not phrase_bank.bank_is_complete(bank_dir)  # built for two languages only
+    assert not phrase_bank.bank_is_complete(tmp_path / "missing")
+    phrase_bank.build_bank(_fake_render, bank_dir=bank_dir)
+    assert phrase_bank.bank_is_complete(bank_dir)
+
+
+def test_building_one_language_keeps_the_others(tmp_path):
+    phrase_bank.build_bank(_fake_render, bank_dir=tmp_path, languages=['Hindi'])
+    phrase_bank.build_bank(_fake_render, bank_dir=tmp_path, languages=['Telugu'])
+    languages = {e['language'] for e in phrase_bank.load_manifest(tmp_path)['entries']}
+    assert languages == {'Hindi', 'Telugu'}
+
+    # Rebuilding a language replaces its own entries without duplicating them
+    phrase_bank.build_bank(_fake_render, bank_dir=tmp_path, languages=['Hindi'])
+    entries = phrase_bank.load_manifest(tmp_path)['entries']
+    keys = [(e['language'], e['gender'], e['text']) for e in entries]
+    assert len(keys) == len(set(keys))
+    assert {e['language'] for e in entries} == {'Hindi', 'Telugu'}
+
+
+@pytest.mark.skipif(phrase_bank.fcntl is None, reason="needs fcntl")
+def test_only_one_process_builds_the_bank(tmp_path, monkeypatch):
+    monkeypatch.setattr(phrase_bank, "build_gtts_bank",
+                        lambda bank_dir=None: phrase_bank.build_bank(_fake_render, bank_dir=bank_dir))
+    with open(tmp_path / phrase_bank._LOCK_NAME, 'a') as held:
+        phrase_bank.fcntl.flock(held, phrase_bank.fcntl.LOCK_EX)
+        assert phrase_bank.build_gtts_bank_once(tmp_path) is None
+    stats = phrase_bank.build_gtts_bank_once(tmp_path)
+    assert stats['rendered'] > 0 and stats['failed'] == 0
+    assert phrase_bank.bank_is_complete(tmp_path)
+    assert phrase_bank.build_gtts_bank_once(tmp_path)['rendered'] == 0
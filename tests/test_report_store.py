@@ -0,0 +1,90 @@
+import sys
+import os
+import json
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src import report_store
+from src import gradio_app_advanced as app_module
+from src.report_store import ReportStore
+
+REPORT = {"analysis": "Mild dermatitis. Apply hydrocortisone 1% twice daily. " * 40, "language": "Hindi"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReportStore(tmp_path / "reports.sqlite3", ttl_seconds=3600, max_reports=100)
+
+
+def test_put_and_get_round_trip_with_compression(store):
+    store.put("large", REPORT)
+    store.put("small", {"analysis": "ok"})
+    assert store.get("large") == REPORT
+    assert store.get("small") == {"analysis": "ok"}
+    assert store.get("missing") is None
+
+    rows = dict(store._connect().execute("SELECT key, compressed FROM reports").fetchall())
+    assert rows == {"large": 1, "small": 0}
+    size = store._connect().execute("SELECT length(payload) FROM reports WHERE key = 'large'").fetchone()[0]
+    assert size < len(json.dumps(REPORT)) / 4
+    assert store.recent()["large"]["language"] == "Hindi"
+
+
+def test_expired_reports_are_hidden_and_deleted(store):
+    now = time.time()
+    store.put("old", REPORT, timestamp=now - 7200)
+    store.put("new", REPORT, timestamp=now)
+    assert store.get("old") is None
+    assert store.get("new") == REPORT
+    assert store.prune() == 1
+    assert store.count() == 1
+
+
+def test_retention_keeps_newest_reports(store):
+    now = time.time()
+    store.put_many((f"r{i}", {"i": i}, now - 1000 + i) for i in range(250))
+    assert store.count() == 100
+    assert store.get("r249") == {"i": 249}
+    assert store.get("r149") is None
+    assert store.get("r150") == {"i": 150}
+
+
+def test_writes_from_many_threads_are_not_lost(tmp_path):
+    path = tmp_path / "reports.sqlite3"
+    stores = [ReportStore(path, max_reports=10000) for _ in range(2)]  # like two gunicorn workers
+
+    def write(worker):
+        for i in range(50):
+            stores[worker % 2].put(f"w{worker}-{i}", {"worker": worker, "i": i})
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stores[0].count() == 200
+    assert stores[1].get("w3-49") == {"worker": 3, "i": 49}
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "detailed_reports.json"
+    legacy.write_text(json.dumps({
+        "a": {"data": {"analysis": "A"}, "timestamp": time.time(), "language": "English"},
+        "b": {"data": {"analysis": "B"}, "timestamp": time.time() - 10 ** 6, "language": "English"},
+    }), encoding="utf-8")
+    store = ReportStore(tmp_path / "reports.sqlite3", legacy_file=legacy)
+    assert store.get("a") == {"analysis": "A"}
+    assert store.count() == 1  # the expired report is dropped
+    assert not legacy.exists()
+    assert (tmp_path / "detailed_reports.json.imported").exists()
+
+
+def test_app_wrappers_use_store(store, monkeypatch):
+    monkeypatch.setattr(report_store, "_default_store", store)
+    app_module.save_stored_report("key", REPORT)
+    assert app_module.get_stored_report("key") == REPORT
+    assert app_module.load_stored_reports()["key"]["data"] == REPORT
+    assert app_module.get_stored_report("nope") is None
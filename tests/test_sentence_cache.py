@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.speech_script import make_speech_script
+
+
+REPORT_V1 = """SYMPTOMS: Red itchy patch on the left forearm.
+DIAGNOSIS: Mild contact dermatitis.
+TREATMENT: Apply hydrocortisone cream twice daily for 5 days. Take Cetirizine 10mg at night.
+Follow up in one week."""
+
+# Follow-up analysis: one sentence changed, one added
+REPORT_V2 = """SYMPTOMS: Red itchy patch on the left forearm.
+DIAGNOSIS: Mild contact dermatitis.
+TREATMENT: Apply hydrocortisone cream twice daily for 7 days. Take Cetirizine 10mg at night.
+Avoid the new detergent.
+Follow up in one week."""
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = sentence_cache.SentenceAudioCache(tmp_path / "tts", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(sentence_cache, "_default_cache", cache)
+    return cache
+
+
+def test_split_sentences_keeps_list_numbers_with_items():
+    assert sentence_cache.split_sentences("1. Rest well. Drink water!\n- \nयह ठीक है। हाँ") == [
+        "1. Rest well.", "Drink water!", "यह ठीक है।", "हाँ"
+    ]
+
+
+def test_only_changed_sentences_are_resynthesized(cache):
+    calls = []
+
+    def synthesize(sentence):
+        calls.append(sentence)
+        return f"<{sentence}>".encode("utf-8")
+
+    first = sentence_cache.new_request_stats()
+    audio_v1 = sentence_cache.synthesize_cached(REPORT_V1, "voice", synthesize, stats=first)
+    assert first['reused'] == 0 and first['chars_synthesized'] == first['chars_total']
+
+    calls.clear()
+    second = sentence_cache.new_request_stats()
+    audio_v2 = sentence_cache.synthesize_cached(REPORT_V2, "voice", synthesize, stats=second)
+
+    assert sorted(calls) == sorted([
+        "TREATMENT: Apply hydrocortisone cream twice daily for 7 days.",
+        "Avoid the new detergent.",
+    ])
+    assert second['reused'] == 4 and second['synthesized'] == 2
+    assert second['chars_synthesized'] == sum(len(c) for c in calls)
+    assert audio_v2.startswith(audio_v1[:20])
+    assert audio_v2.count(b"<") == 6
+
+
+def test_voice_is_part_of_cache_key(cache):
+    calls = []
+    synthesize = lambda s: calls.append(s) or b"x"
+    sentence_cache.synthesize_cached("Take rest.", "gtts_en", synthesize)
+    sentence_cache.synthesize_cached("Take rest.", "gtts_hi", synthesize)
+    assert len(calls) == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = sentence_cache.SentenceAudioCache(tmp_path, max_bytes=250)
+    keys = [cache.make_key("v", str(i)) for i in range(3)]
+    for key in keys:
+        cache.put(key, b"x" * 100)
+        os.utime(cache._path(key), (0, keys.index(key)))
+    cache.put(cache.make_key("v", "new"), b"x" * 100)
+    assert cache.get(keys[0]) is None
+    assert cache.get(cache.make_key("v", "new")) is not None
+
+
+def test_generate_voice_reports_synthesized_characters(cache, monkeypatch):
+    sent = []
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: sent.append(text) or b"\xff\xf3")
+    before = sentence_cache.CHARS_SYNTHESIZED.value()
+
+    for text in (REPORT_V1, REPORT_V2):
+        path = app_module.generate_voice(text, "English", "Female")
+        assert path and os.path.getsize(path) > 0
+        os.unlink(path)
+
+    changed = len("TREATMENT: Apply hydrocortisone cream twice daily for 7 days.") + len("Avoid the new detergent.")
+    # The first report is read as its spoken script ("10mg" -> "10 milligrams")
+    spoken_v1 = make_speech_script(REPORT_V1, "English")
+    assert sentence_cache.CHARS_SYNTHESIZED.value() - before == len("".join(sentence_cache.split_sentences(spoken_v1))) + changed
+    assert "tts_chars_synthesized_per_request_count" in app_module.metrics.render_prometheus()
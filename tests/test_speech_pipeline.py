@@ -0,0 +1,150 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from PIL import Image
+
+from src import audio_store as audio_store_module
+from src import sentence_cache
+from src import gradio_app_advanced as app_module
+from src.audio_store import AudioStore
+from src.speech_pipeline import PipelinedSpeech, split_completed
+
+REPORT_CHUNKS = [
+    "MEDICAL REPORT:\n1. SYMPT",
+    "OMS: Red rash on the forearm. Mild swell",
+    "ing.\n2. DIAGNOSIS: Contact dermatitis (80%).",
+    " 3. TREATMENT: Apply **hydrocortisone** cream twice daily.",
+]
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def generate_content(self, contents, generation_config=None, stream=False, request_options=None):
+        self.request_options = request_options
+        if not stream:
+            return Chunk("".join(self.chunks))
+
+        def iterate():
+            for i, text in enumerate(self.chunks):
+                if self.fail_after is not None and i >= self.fail_after:
+                    raise RuntimeError("stream reset")
+                yield Chunk(text)
+        return iterate()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    store = AudioStore(tmp_path / "audio", ttl_seconds=60, max_bytes=0)
+    monkeypatch.setattr(audio_store_module, "_default_store", store)
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(app_module, "render_with_bank", lambda text, language, gender, synthesize: None)
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: f"<{text}>".encode())
+    return app_module
+
+
+def test_split_completed_waits_for_whitespace_after_punctuation():
+    assert split_completed("Rest well. Drink wa") == ("Rest well.", " Drink wa")
+    assert split_completed("Take 2.5 ml") == ("", "Take 2.5 ml")
+    assert split_completed("Done.") == ("", "Done.")
+    assert split_completed("Heading\nBody") == ("Heading\n", "Body")
+
+
+def test_split_completed_keeps_list_numbers_with_their_item():
+    assert split_completed("Intro.\n1. ") == ("Intro.\n", "1. ")
+    assert split_completed("1. Rest. 2. Ice") == ("1. Rest.", " 2. Ice")
+
+
+def test_pipeline_starts_synthesis_before_finish_and_keeps_order():
+    started = []
+    release = threading.Event()
+
+    def synthesize(text):
+        started.append(text)
+        release.wait(5)
+        return text.strip().encode()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        speech = PipelinedSpeech(synthesize, executor=pool)
+        speech.feed("One. Tw")
+        speech.feed("o. Three")
+        assert speech.jobs_submitted == 2
+        release.set()
+        assert speech.finish() == b"One.Two.Three"
+    assert sorted(started) == sorted(["One.", " Two.", " Three"])
+
+
+def test_one_request_cannot_hold_the_whole_pool():
+    running = []
+    release = threading.Event()
+    second_started = threading.Event()
+
+    def slow(text):
+        running.append(text)
+        release.wait(5)
+        return text.encode()
+
+    def fast(text):
+        second_started.set()
+        return text.encode()
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        long_report = PipelinedSpeech(slow, executor=pool, max_parallel=2)
+        for i in range(5):
+            long_report.feed(f"Sentence {i}.\n")
+        time.sleep(0.05)
+        assert len(running) == 2  # the other sentences wait in the request's own queue
+
+        other = PipelinedSpeech(fast, executor=pool, max_parallel=2)
+        other.feed("First audio.\n")
+        assert second_started.wait(1)
+        release.set()
+        assert long_report.finish() == b"".join(f"Sentence {i}.\n".encode() for i in range(5))
+        assert other.finish() == b"First audio.\n"
+
+
+def test_pipeline_respects_character_cap():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        speech = PipelinedSpeech(lambda text: text.encode(), executor=pool, max_chars=8)
+        speech.feed("Rest now. Then sleep. ")
+        assert speech.finish() == b"Rest now"
+
+
+def test_pipelined_matches_sequential_output(app, monkeypatch):
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: FakeModel(REPORT_CHUNKS))
+    image = Image.new("RGB", (4, 4))
+
+    text_seq, path_seq = app.analyze_and_speak(image, "Full Analysis", "English", "Male", pipelined=False)
+    text_pipe, path_pipe = app.analyze_and_speak(image, "Full Analysis", "English", "Male", pipelined=True)
+
+    assert text_pipe == text_seq
+    assert "**" not in text_pipe
+    with open(path_seq, 'rb') as f_seq, open(path_pipe, 'rb') as f_pipe:
+        assert f_pipe.read() == f_seq.read()
+
+
+def test_stream_failure_before_text_falls_back_to_single_call(app, monkeypatch):
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: FakeModel(REPORT_CHUNKS, fail_after=0))
+    text, path = app.analyze_and_speak(Image.new("RGB", (4, 4)), "Full Analysis", "English", "Male", pipelined=True)
+    assert text == "".join(REPORT_CHUNKS).replace("*", "")
+    assert path is not None
+
+
+def test_stream_interrupted_keeps_partial_report(app, monkeypatch):
+    monkeypatch.setattr(app, "get_gemini_model", lambda name: FakeModel(REPORT_CHUNKS, fail_after=2))
+    text, path = app.analyze_and_speak(Image.new("RGB", (4, 4)), "Full Analysis", "English", "Male", pipelined=True)
+    assert text == "".join(REPORT_CHUNKS[:2])
+    assert path is not None
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import speech_script
+from src.speech_script import SpeechScriptWriter, make_speech_script
+
+REPORT = """## MEDICAL REPORT:
+1. **SYMPTOMS**: Red rash, 4-5 cm, on the forearm. Temperature 38.5°C.
+2. **TREATMENT**:
+| Medicine | Dose | Frequency |
+|---|---|---|
+| Paracetamol | 500mg | BID x 5 days |
+- Cetirizine 10 mg h.s.
+This is an AI-generated analysis. Please consult a licensed doctor before taking any medicine.
+This analysis is not a substitute for professional care.
+2. **TREATMENT**:
+Confidence 80%."""
+
+
+def test_markup_tables_and_abbreviations_are_spoken_in_english():
+    script = make_speech_script(REPORT, "English")
+    assert script.splitlines() == [
+        "MEDICAL REPORT:",
+        "SYMPTOMS: Red rash, 4 to 5 cm, on the forearm. Temperature 38.5 degrees Celsius.",
+        "TREATMENT:",
+        "Paracetamol, 500 milligrams, twice daily for 5 days.",
+        "Cetirizine 10 milligrams at bedtime",
+        "This is an AI-generated analysis. Please consult a licensed doctor before taking any medicine.",
+        "Confidence 80 percent.",
+    ]
+    assert len(script) < len(REPORT)
+
+
+def test_language_specific_rules():
+    hindi = make_speech_script("Paracetamol 500mg BID x 3 days.", "Hindi")
+    assert hindi == "Paracetamol 500 मिलीग्राम दिन में दो बार 3 दिन तक."
+    telugu = make_speech_script("Paracetamol 500mg TID, 2-3 days.", "Telugu")
+    assert telugu == "Paracetamol 500 మిల్లీగ్రాములు రోజుకు మూడుసార్లు, 2 నుండి 3 days."
+    hinglish = make_speech_script("Cetirizine 10mg OD, e.g. raat ko.", "Hinglish")
+    assert hinglish == "Cetirizine 10 milligram din mein ek baar, jaise raat ko."
+    # Chhattisgarhi follows the Hindi rules
+    assert make_speech_script("50% better.", "Chhattisgarhi") == "50 प्रतिशत better."
+
+
+def test_lowercase_words_are_not_taken_for_frequencies():
+    assert make_speech_script("Apply it when needed, od or not.", "English") == "Apply it when needed, od or not."
+
+
+def test_duration_cap_keeps_whole_sentences_and_adds_closing():
+    text = " ".join(f"Sentence number {i} about care." for i in range(100))
+    script = make_speech_script(text, "English", max_seconds=10)
+    lines = script.split(". ")
+    assert script.endswith(speech_script.LANGUAGE_RULES['English']['closing'])
+    assert speech_script.estimate_seconds(script) <= 10 + 3
+    assert all(line.startswith("Sentence number") for line in lines[:-1])
+    assert make_speech_script(text, "English", max_seconds=0).count("Sentence number") == 100
+
+
+def test_incremental_writer_matches_one_shot_and_dedupes_across_pieces():
+    pieces = ["MEDICAL REPORT:\n", "1. SYMPTOMS: Rash.", " Take 5ml syrup.\n", "MEDICAL REPORT:\n", "Rest."]
+    writer = SpeechScriptWriter("English")
+    out = [writer.process(piece, final=(i == len(pieces) - 1)) for i, piece in enumerate(pieces)]
+    assert [o for o in out if o] == ["MEDICAL REPORT:", "SYMPTOMS: Rash.", "Take 5 millilitres syrup.", "Rest."]
+    assert writer.chars_in == sum(len(p) for p in pieces)
+    assert writer.chars_out < writer.chars_in
+
+
+def test_metrics_record_characters_before_and_after():
+    before_in = speech_script.SCRIPT_CHARS_IN.value()
+    before_out = speech_script.SCRIPT_CHARS_OUT.value()
+    script = make_speech_script(REPORT, "English")
+    assert speech_script.SCRIPT_CHARS_IN.value() - before_in == len(REPORT)
+    assert speech_script.SCRIPT_CHARS_OUT.value() - before_out == len(script)
+
+
+def test_instructions_shared_by_two_medicines_are_both_spoken():
+    text = ("TREATMENT:\nAmoxicillin 500mg. Take twice daily after food.\n"
+            "TREATMENT:\nIbuprofen 400mg. Take twice daily after food.")
+    script = make_speech_script(text, "English")
+    assert script.count("Take twice daily after food.") == 2
+    assert script.count("TREATMENT:") == 1
+
+    # Repeated headings are still dropped across streamed pieces, and markdown headings count too
+    writer = SpeechScriptWriter("English")
+    pieces = ["## Medical report\n", "Rest.\n", "## Medical report\n", "Rest.\n"]
+    assert [writer.process(piece) for piece in pieces] == ["Medical report", "Rest.", "", "Rest."]
+
+
+def test_dates_and_ids_are_not_read_as_ranges():
+    assert make_speech_script("Seen on 2024-01-15.", "English") == "Seen on 2024-01-15."
+    assert make_speech_script("Sample A12-34, call 555-0134-22.", "English") == "Sample A12-34, call 555-0134-22."
+    assert make_speech_script("Take 1-2 tablets for 3–5 days.", "English") == "Take 1 to 2 tablets for 3 to 5 days."
+    assert make_speech_script("Dose 0.5-1.5 ml.", "English") == "Dose 0.5 to 1.5 millilitres."
+
+
+def test_single_letter_units_are_case_sensitive():
+    assert make_speech_script("Use 2 g of powder daily.", "English") == "Use 2 grams of powder daily."
+    assert make_speech_script("Take 500 MG tablets.", "English") == "Take 500 milligrams tablets."
+    assert make_speech_script("Video visits need a 5G connection.", "English") == "Video visits need a 5G connection."
@@ -0,0 +1,147 @@
+import sys
+import os
+import asyncio
+import hashlib
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import audio_store as audio_store_module
+from src import document_playlist
+from src import extraction_cache
+from src import sentence_cache
+from src import upload_spool
+from src import gradio_app_advanced as app_module
+from src.audio_store import AudioStore
+from src.document_playlist import PlaylistStore
+from src.upload_spool import UploadTooLarge, spool_upload
+
+BOUNDARY = "----testboundary"
+PARAGRAPH = "Take the prescribed medicine after food. Drink plenty of water and rest well."
+
+
+class StreamedRequest:
+    """Minimal stand-in for a Starlette request with a chunked multipart body"""
+
+    def __init__(self, parts, content_length=None):
+        self.headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+        if content_length is not None:
+            self.headers["content-length"] = str(content_length)
+        self.parts = parts
+
+    async def stream(self):
+        for name, filename, chunks in self.parts:
+            disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+            yield f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+            for chunk in chunks:
+                yield chunk
+            yield b"\r\n"
+        yield f"--{BOUNDARY}--\r\n".encode()
+
+
+def repeated(chunk, count):
+    for _ in range(count):
+        yield chunk
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    path = tmp_path / "uploads"
+    path.mkdir()
+    monkeypatch.setattr(upload_spool, "UPLOAD_SPOOL_DIR", path)
+    return path
+
+
+def test_spool_writes_file_and_digest(spool_dir):
+    request = StreamedRequest([("language", None, [b"Hindi"]), ("file", "Report.PDF", [b"%PDF-", b"body"])])
+    upload, fields = asyncio.run(spool_upload(request, spool_dir=spool_dir))
+    try:
+        assert fields == {"language": "Hindi"}
+        assert upload.filename == "Report.PDF" and upload.suffix == ".pdf"
+        assert open(upload.path, 'rb').read() == b"%PDF-body"
+        assert upload.digest == hashlib.sha256(b"%PDF-body").hexdigest()
+        assert upload.size == 9
+    finally:
+        upload.discard()
+    assert not os.listdir(spool_dir)
+
+
+def test_spool_memory_stays_flat(spool_dir):
+    chunk = b"x" * 64 * 1024
+    request = StreamedRequest([("file", "big.txt", repeated(chunk, 320))])  # 20 MiB
+    tracemalloc.start()
+    upload, _ = asyncio.run(spool_upload(request, spool_dir=spool_dir))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    try:
+        assert upload.size == 320 * len(chunk)
+        assert os.path.getsize(upload.path) == upload.size
+        assert peak < 4 * 1024 * 1024
+    finally:
+        upload.discard()
+
+
+def test_spool_rejects_oversized_upload_and_cleans_up(spool_dir):
+    request = StreamedRequest([("file", "big.pdf", repeated(b"x" * 1024, 100))])
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_upload(request, max_bytes=10 * 1024, spool_dir=spool_dir))
+    assert not os.listdir(spool_dir)
+
+    # A declared body far over the limit is refused before reading
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_upload(StreamedRequest([], content_length=10 ** 9), max_bytes=1024, spool_dir=spool_dir))
+
+
+def test_spool_requires_file_field(spool_dir):
+    with pytest.raises(ValueError):
+        asyncio.run(spool_upload(StreamedRequest([("language", None, [b"English"])]), spool_dir=spool_dir))
+    assert not os.listdir(spool_dir)
+
+
+@pytest.fixture
+def app_stores(tmp_path, spool_dir, monkeypatch):
+    store = AudioStore(tmp_path / "audio", ttl_seconds=3600, max_bytes=0)
+    monkeypatch.setattr(audio_store_module, "_default_store", store)
+    monkeypatch.setattr(document_playlist, "_default_store", PlaylistStore(tmp_path / "playlists"))
+    cache = extraction_cache.ExtractionCache(tmp_path / "extract")
+    monkeypatch.setattr(extraction_cache, "_default_cache", cache)
+    monkeypatch.setattr(sentence_cache, "_default_cache", sentence_cache.SentenceAudioCache(tmp_path / "tts"))
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang, timeout=None: b"\xff\xf3" + text.encode())
+    return cache
+
+
+def test_document_to_speech_endpoint(app_stores, spool_dir, monkeypatch):
+    body = "\n\n".join([PARAGRAPH] * 10).encode()
+    client = TestClient(app_module.app)
+
+    response = client.post("/api/document-to-speech", files={"file": ("discharge.txt", body, "text/plain")},
+                           data={"language": "English", "gender": "Female"})
+    assert response.status_code == 200
+    playlist = response.json()["playlist"]
+    assert playlist["title"] == "discharge.txt"
+    assert playlist["segments"]
+
+    # The streamed digest keys the extraction cache, so the repeat upload is a hit
+    calls = []
+    monkeypatch.setattr(extraction_cache, "file_digest", lambda path: calls.append(path))
+    response = client.post("/api/document-to-speech", files={"file": ("discharge.txt", body, "text/plain")},
+                           data={"mode": "audio", "audio_format": "mp3"})
+    assert response.status_code == 200
+    assert response.json()["audio_url"].endswith("?format=mp3")
+    assert b"Drink plenty of water" in client.get(response.json()["audio_url"].split("?")[0]).content
+    assert calls == []
+    assert app_stores.get(hashlib.sha256(body).hexdigest(), "txt") is not None
+    assert not os.listdir(spool_dir)
+
+
+def test_document_to_speech_errors(app_stores, spool_dir, monkeypatch):
+    client = TestClient(app_module.app)
+    assert client.post("/api/document-to-speech", files={"file": ("scan.png", b"png", "image/png")}).status_code == 415
+    assert client.post("/api/document-to-speech", data={"language": "English"}).status_code == 400
+
+    monkeypatch.setattr(upload_spool, "DOCUMENT_UPLOAD_MAX_BYTES", 1024)
+    response = client.post("/api/document-to-speech", files={"file": ("big.txt", b"x" * 4096, "text/plain")})
+    assert response.status_code == 413
+    assert not os.listdir(spool_dir)
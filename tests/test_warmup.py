@@ -0,0 +1,170 @@
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import gradio_app_advanced as app_module
+from src.warmup import STEP_FAILURES, StepDegraded, Warmup
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ready_after_blocking_steps_in_order():
+    order = []
+    warmup = Warmup(timeout=60)
+    warmup.step("clients", lambda: order.append("clients"))
+    warmup.step("models", lambda: order.append("models"))
+    assert not warmup.ready()
+    warmup.run()
+    assert order == ["clients", "models"]
+    status = warmup.status()
+    assert status['ready'] is True
+    assert status['steps']['models']['state'] == 'done'
+    assert status['steps']['models']['seconds'] >= 0
+
+
+def test_background_steps_do_not_delay_readiness():
+    release = threading.Event()
+    warmup = Warmup(timeout=60)
+    warmup.step("clients", lambda: None)
+    warmup.step("phrase_bank", release.wait, blocking=False)
+    warmup.start()
+    assert warmup.wait(2)
+    assert warmup.status()['steps']['phrase_bank']['state'] == 'running'
+    release.set()
+
+
+def test_failed_step_is_reported_and_does_not_block():
+    def fail():
+        raise ConnectionError("no route to host")
+
+    before = STEP_FAILURES.value(step="test-connections")
+    warmup = Warmup(timeout=60)
+    warmup.step("test-connections", fail)
+    warmup.step("models", lambda: None)
+    warmup.run()
+    status = warmup.status()
+    assert status['ready'] is True
+    assert status['steps']['test-connections']['state'] == 'failed'
+    assert "no route to host" in status['steps']['test-connections']['error']
+    assert status['steps']['models']['state'] == 'done'
+    assert STEP_FAILURES.value(step="test-connections") == before + 1
+
+
+def test_ready_anyway_after_the_timeout():
+    clock = Clock()
+    hang = threading.Event()
+    warmup = Warmup(timeout=30, clock=clock)
+    warmup.step("connections", hang.wait)
+    warmup.start()
+    assert not warmup.ready()
+    clock.now = 30
+    assert warmup.ready()
+    hang.set()
+
+
+def test_skipped_steps_do_not_run():
+    warmup = Warmup(timeout=60, skip={"local_models"})
+    warmup.step("local_models", lambda: pytest.fail("skipped step ran"))
+    warmup.run()
+    assert warmup.status()['steps']['local_models']['state'] == 'skipped'
+
+
+def test_healthz_and_readyz(monkeypatch):
+    warmup = Warmup(timeout=60)
+    warmup.step("clients", lambda: None)
+    monkeypatch.setattr(app_module, "warmup", warmup)
+    client = TestClient(app_module.app)
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming"
+
+    warmup.run()
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["steps"]["clients"]["state"] == "done"
+
+
+def test_app_steps(monkeypatch):
+    monkeypatch.setattr(app_module, "WARMUP", True)
+    monkeypatch.setattr(app_module, "WARMUP_LOCAL_MODELS", False)
+    steps = app_module.create_warmup().status()['steps']
+    assert list(steps) == ["clients", "models", "connections", "phrase_bank"]
+    assert steps['phrase_bank']['blocking'] is False
+
+    monkeypatch.setattr(app_module, "WARMUP", False)
+    warmup = app_module.create_warmup()
+    warmup.run()
+    assert warmup.status() == {'ready': True, 'steps': {}}
+
+
+def test_connections_reuse_the_groq_client(monkeypatch):
+    calls = []
+
+    class Models:
+        def list(self, timeout=None):
+            calls.append(timeout)
+
+    class FakeGroq:
+        models = Models()
+
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", None)
+    monkeypatch.setattr(app_module, "get_groq_client", lambda: FakeGroq())
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang_code: b"")
+    app_module.warm_connections()
+    assert calls == [app_module.PROVIDER_TIMEOUT_SECONDS]
+
+
+def test_connections_warm_the_generate_and_speech_paths(monkeypatch):
+    calls = []
+
+    class FakeModel:
+        def generate_content(self, prompt, generation_config=None, request_options=None):
+            calls.append(("generate", generation_config["max_output_tokens"], request_options["timeout"]))
+
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(app_module, "get_gemini_model", lambda name: FakeModel())
+    monkeypatch.setattr(app_module, "get_groq_client", lambda: None)
+    monkeypatch.setattr(app_module, "synthesize_speech_bytes", lambda text, lang_code: calls.append(("tts", lang_code)))
+    app_module.warm_connections()
+    assert calls == [("generate", 1, app_module.PROVIDER_TIMEOUT_SECONDS), ("tts", "en")]
+
+
+def test_complete_phrase_bank_is_not_rebuilt(monkeypatch):
+    monkeypatch.setattr(app_module, "bank_is_complete", lambda: True)
+    monkeypatch.setattr(app_module, "WARMUP_RENDER_PHRASE_BANK", True)
+    monkeypatch.setattr(app_module, "build_gtts_bank_once", lambda: pytest.fail("bank rebuilt"))
+    app_module.warm_phrase_bank()
+
+
+def test_incomplete_phrase_bank_degrades_without_rendering(monkeypatch):
+    monkeypatch.setattr(app_module, "bank_is_complete", lambda: False)
+    monkeypatch.setattr(app_module, "WARMUP_RENDER_PHRASE_BANK", False)
+    monkeypatch.setattr(app_module, "build_gtts_bank_once", lambda: pytest.fail("bank rendered at startup"))
+    warmup = Warmup(timeout=60)
+    warmup.step("clients", lambda: None)
+    warmup.step("phrase_bank", app_module.warm_phrase_bank, blocking=False)
+    monkeypatch.setattr(app_module, "warmup", warmup)
+    warmup.run()
+
+    response = TestClient(app_module.app).get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["steps"]["phrase_bank"]["state"] == "degraded"
+
+    # With rendering enabled, a worker that finds the build lock taken does not wait for it
+    monkeypatch.setattr(app_module, "WARMUP_RENDER_PHRASE_BANK", True)
+    monkeypatch.setattr(app_module, "build_gtts_bank_once", lambda: None)
+    with pytest.raises(StepDegraded):
+        app_module.warm_phrase_bank()